@@ -1,6 +1,12 @@
-import random
+from functools import partial
+
 import numpy as np
-import matplotlib.pyplot as plt
+
+from gachasim.exact import pmf_max, pmf_mean, pmf_min, pmf_percentile
+from gachasim.kernel import compile_banner, copies_report, interval_report, run_banner, solve_banner
+from gachasim.plots import line_chart, render
+from gachasim.sensitivity import sensitivities, sensitivity_report
+from gachasim.spec import BannerSpec, pity_curve
 
 # --------------------
 # Constants
@@ -11,64 +17,119 @@ SOFT_PITY_INCREMENT = 0.02  # +2% per pull after 50
 GUARANTEED_FIRST_RATE_UP = 150  # First guaranteed rate-up
 TARGET_RATE_UPS = 6       # max potential
 EXPERIMENTS = 10000
+SEED = None  # set an int for reproducible results
+WORKERS = None  # None = one worker per CPU core
+ENGINE = "skip"  # "per-pull", "skip" (skip-ahead), "batch" (vectorized) or "exact"
+TOLERANCES = None  # e.g. {"mean": 1.0, 95: 0.5}: run until these 95% CI half-widths
+CACHE = True  # reuse the results of an identical seeded run (see gachasim.cache)
+STORE = None  # a directory: write per-experiment results to a memory-mapped store (see gachasim.store)
+TRACE = None  # a directory: record every pull (per-pull engine) for replay (see gachasim.trace)
+METRICS = None  # a .json file: count rule firings and time run phases into it (see gachasim.metrics)
+PLOTS = "show"  # "show", "png" / "svg" (saved to PLOT_DIR) or None
+PLOT_DIR = "plots"
+SENSITIVITY = False  # instead of simulating, report how the exact results move with each constant
+SENSITIVITY_STEPS = {"base_rate": 0.001, "soft_pity_start": 1, "soft_pity_increment": 0.001, "guaranteed_first_rate_up": 1}
+SENSITIVITY_EFFECTS = {"guaranteed_first_rate_up": None}  # constants replaced outright
 
 # --------------------
-# Run a single experiment
+# 6★ chance function with soft pity
 # --------------------
-def run_experiment():
-    pulls = 0
-    rate_up_count = 0
-    first_rate_up_pull = None
-    pulls_since_last_6_star = 0
-    guarantee_first_rate_up = True  # 150-pull protection available
-
-    while rate_up_count < TARGET_RATE_UPS:
-        pulls += 1
-        pulls_since_last_6_star += 1
-
-        # Calculate 6★ chance with soft pity
-        if pulls_since_last_6_star <= SOFT_PITY_START:
-            six_star_chance = BASE_RATE
-        else:
-            six_star_chance = BASE_RATE + (pulls_since_last_6_star - SOFT_PITY_START) * SOFT_PITY_INCREMENT
-            six_star_chance = min(six_star_chance, 1.0)
-
-        # Roll for 6★
-        if random.random() < six_star_chance:
-            pulls_since_last_6_star = 0  # reset soft pity counter
-
-            # Determine if this is a rate-up
-            if guarantee_first_rate_up and pulls >= GUARANTEED_FIRST_RATE_UP:
-                is_rate_up = True
-                guarantee_first_rate_up = False  # consume guarantee
-            else:
-                is_rate_up = random.random() < 0.5  # 50/50 chance
-
-            if is_rate_up:
-                rate_up_count += 1
-                if first_rate_up_pull is None:
-                    first_rate_up_pull = pulls
-            # Off-banner 6★s do not count toward TARGET_RATE_UPS
-
-    return pulls, first_rate_up_pull
+def six_star_chance(pity, base_rate=BASE_RATE, soft_pity_start=SOFT_PITY_START, increment=SOFT_PITY_INCREMENT):
+    if pity <= soft_pity_start:
+        return base_rate
+    return min(1.0, base_rate + (pity - soft_pity_start) * increment)
+
+# --------------------
+# Banner rules: the first 6★ from pull 150 on is the rate-up
+# --------------------
+def make_banner(
+    base_rate=BASE_RATE,
+    soft_pity_start=SOFT_PITY_START,
+    soft_pity_increment=SOFT_PITY_INCREMENT,
+    guaranteed_first_rate_up=GUARANTEED_FIRST_RATE_UP,
+):
+    """BannerSpec for these constants (the ones above by default)."""
+    chance = partial(
+        six_star_chance, base_rate=base_rate, soft_pity_start=soft_pity_start, increment=soft_pity_increment
+    )
+    return BannerSpec(
+        "arknights-character",
+        pity_curve(chance),
+        TARGET_RATE_UPS,
+        rate_up_chance=0.5,
+        first_rate_up_at=guaranteed_first_rate_up,
+        first_rate_up_forced=False,
+    )
+
+BANNER = make_banner()
+KERNEL = compile_banner(BANNER)
+
+# --------------------
+# Exact distributions and their sensitivity to the constants
+# --------------------
+def main_exact():
+    result = solve_banner(KERNEL)
+    pulls_pmf = result.pulls_pmf
+    first_pmf = result.first_on_rate_pmf
+
+    print("========== EXACT RESULTS ==========")
+    print(f"Minimum pulls to max potential: {pmf_min(pulls_pmf)}")
+    print(f"Maximum pulls to max potential: {pmf_max(pulls_pmf)} (tail cut below 1e-15)")
+    print(f"Average pulls to max potential: {pmf_mean(pulls_pmf):.2f}")
+    print(f"5th percentile pulls: {pmf_percentile(pulls_pmf, 5)}")
+    print(f"95th percentile pulls: {pmf_percentile(pulls_pmf, 95)}")
+    print()
+    print(f"Average pulls to first on-rate: {pmf_mean(first_pmf):.2f}")
+    print(f"5th percentile first rate-up: {pmf_percentile(first_pmf, 5)}")
+    print(f"95th percentile first rate-up: {pmf_percentile(first_pmf, 95)}")
+    print(f"Probability that the {GUARANTEED_FIRST_RATE_UP} guarantee decides a pull: {result.guarantee_probability:.4f}")
+
+    render([
+        line_chart(
+            "arknights-character-exact-pulls", "Pulls Needed for 6 Rate-Ups (Max Potential, Exact)",
+            "Total Pulls", "Probability", pulls_pmf, linewidth=2,
+        ),
+        line_chart(
+            "arknights-character-exact-first-rate-up", "Pulls Needed for First Rate-Up (Max Potential, Exact)",
+            "Pulls to First Rate-Up", "Probability", first_pmf,
+            markers=[(GUARANTEED_FIRST_RATE_UP, dict(linestyle="--", color="red", label="Guaranteed Rate-Up at 150"))],
+            linewidth=2, color="orange",
+        ),
+    ], PLOTS, PLOT_DIR, WORKERS)
+
+def main_sensitivity():
+    base, rows = sensitivities(make_banner, SENSITIVITY_STEPS, SENSITIVITY_EFFECTS)
+
+    print("========== SENSITIVITY (EXACT) ==========")
+    print("Pulls to max potential at the defaults, then the change per step of each constant")
+    print("(central difference) or with a constant replaced:")
+    print("\n".join(sensitivity_report(base, rows)))
 
 # --------------------
 # Main simulation
 # --------------------
+def simulate():
+    """Run EXPERIMENTS with ENGINE; returns an Experiment of result columns."""
+    return run_banner(KERNEL, ENGINE, EXPERIMENTS, SEED, WORKERS, TOLERANCES, CACHE, STORE, TRACE, METRICS)
+
 def main():
-    total_pulls_list = []
-    first_rate_up_pulls = []
+    if SENSITIVITY:
+        main_sensitivity()
+        return
+    if ENGINE == "exact":
+        main_exact()
+        return
 
-    for _ in range(EXPERIMENTS):
-        pulls_needed, first_pull = run_experiment()
-        total_pulls_list.append(pulls_needed)
-        first_rate_up_pulls.append(first_pull)
+    columns = simulate()
+    total_pulls_list, first_rate_up_pulls = columns.pulls, columns.first_rate_up
 
     # --------------------
     # Stats
     # --------------------
     print("========== RESULTS ==========")
-    print(f"Experiments run: {EXPERIMENTS}")
+    print(f"Experiments run: {len(total_pulls_list)}")
+    if TOLERANCES:
+        print("\n".join(interval_report(total_pulls_list, TOLERANCES)))
     print(f"Minimum pulls to max potential: {min(total_pulls_list)}")
     print(f"Maximum pulls to max potential: {max(total_pulls_list)}")
     print(f"Average pulls to max potential: {np.mean(total_pulls_list):.2f}")
@@ -79,33 +140,24 @@ def main():
     print(f"5th percentile first rate-up: {np.percentile(first_rate_up_pulls,5):.0f}")
     print(f"95th percentile first rate-up: {np.percentile(first_rate_up_pulls,95):.0f}")
 
-    # --------------------
-    # Smooth integer-based line: total pulls
-    # --------------------
-    counts_total = np.bincount(total_pulls_list)
-    x_total = np.arange(len(counts_total))
-    plt.figure(figsize=(10,6))
-    plt.plot(x_total, counts_total, linewidth=2)
-    plt.xlabel("Total Pulls")
-    plt.ylabel("Frequency")
-    plt.title("Pulls Needed for 6 Rate-Ups (Max Potential)")
-    plt.grid(True)
-    plt.show()
+    print("\nPulls to reach each rate-up copy count:")
+    print("\n".join(copies_report(columns.copy_pulls)))
 
     # --------------------
-    # Smooth integer-based line: first rate-up
+    # Smooth integer-based lines: total pulls and first rate-up
     # --------------------
-    counts_first = np.bincount(first_rate_up_pulls)
-    x_first = np.arange(len(counts_first))
-    plt.figure(figsize=(10,6))
-    plt.plot(x_first, counts_first, linewidth=2, color='orange')
-    plt.axvline(GUARANTEED_FIRST_RATE_UP, linestyle="--", color="red", label="Guaranteed Rate-Up at 150")
-    plt.xlabel("Pulls to First Rate-Up")
-    plt.ylabel("Frequency")
-    plt.title("Pulls Needed for First Rate-Up (Max Potential)")
-    plt.legend()
-    plt.grid(True)
-    plt.show()
+    render([
+        line_chart(
+            "arknights-character-pulls", "Pulls Needed for 6 Rate-Ups (Max Potential)",
+            "Total Pulls", "Frequency", np.bincount(total_pulls_list), linewidth=2,
+        ),
+        line_chart(
+            "arknights-character-first-rate-up", "Pulls Needed for First Rate-Up (Max Potential)",
+            "Pulls to First Rate-Up", "Frequency", np.bincount(first_rate_up_pulls),
+            markers=[(GUARANTEED_FIRST_RATE_UP, dict(linestyle="--", color="red", label="Guaranteed Rate-Up at 150"))],
+            linewidth=2, color="orange",
+        ),
+    ], PLOTS, PLOT_DIR, WORKERS)
 
 
 if __name__ == "__main__":
@@ -1,7 +1,12 @@
-import random
-import statistics
+import math
+
 import numpy as np
-import matplotlib.pyplot as plt
+
+from gachasim.exact import pmf_max, pmf_mean, pmf_min, pmf_percentile
+from gachasim.kernel import compile_banner, copies_report, interval_report, run_banner_summary, solve_banner
+from gachasim.plots import line_chart, render
+from gachasim.spec import BannerSpec, TicketIncome, load_curve, pity_curve
+from gachasim.stats import IntHistogram, JointHistogram, LogSketch, Mean
 
 # --------------------
 # Base rates and constants
@@ -15,6 +20,7 @@ GUARANTEE_120 = 120
 RATE_UP_240 = 240
 
 BASE_FIVE_STAR_RATE = 0.08
+FIVE_STAR_PITY = 10
 BASE_FOUR_STAR_RATE = 0.912
 
 # --------------------
@@ -29,6 +35,18 @@ TICKETS_FOUR_STAR = 20
 # --------------------
 TARGET_RATE_UPS = 6
 EXPERIMENTS = 10000
+SEED = None  # set an int for reproducible results
+WORKERS = None  # None = one worker per CPU core
+ENGINE = "batch"  # "per-pull", "skip" (skip-ahead), "batch" (vectorized) or "exact"
+TOLERANCES = None  # e.g. {"mean": 1.0, 95: 0.5}: run until these 95% CI half-widths
+CACHE = True  # reuse the results of an identical seeded run (see gachasim.cache)
+STORE = None  # a directory: write per-experiment results to a memory-mapped store (see gachasim.store)
+TRACE = None  # a directory: record every pull (per-pull engine) for replay (see gachasim.trace)
+METRICS = None  # a .json file: count rule firings and time run phases into it (see gachasim.metrics)
+PLOTS = "show"  # "show", "png" / "svg" (saved to PLOT_DIR) or None
+PLOT_DIR = "plots"
+CURVE_FILE = None  # a fitted 6★ curve (python -m gachasim.fit) to use instead of six_star_chance()
+TICKET_BIN = 20  # arsenal ticket bin width of the joint histograms
 
 # --------------------
 # 6★ chance function with pity
@@ -39,178 +57,198 @@ def six_star_chance(pity):
     return min(1.0, BASE_SIX_STAR_RATE + (pity - 65) * PITY_INCREMENT)
 
 # --------------------
-# Run a single experiment
+# 5★ chance on a pull that missed the 6★, guaranteed every 10 pulls
+# --------------------
+def five_star_chance(pity):
+    return BASE_FIVE_STAR_RATE
+
+# --------------------
+# Banner rules: hard pity, then every 240th pull is a free rate-up (no
+# tickets), then pull 120 is the rate-up if none was won yet
 # --------------------
-def run_experiment():
-    pulls = 0
-    six_star_pity = 0
-    five_star_pity = 0
-    rate_up_count = 0
-    tickets_total = 0
-
-    first_rate_up_pull = None
-    tickets_at_first_rate_up = None
-    off_banner_before_first = 0
-    hit_120_guarantee = False
-
-    while rate_up_count < TARGET_RATE_UPS:
-        pulls += 1
-        if pulls == 120:
-            tickets_at_120 = tickets_total
-        six_star_pity += 1
-        five_star_pity += 1
-
-        current_six_star_rate = six_star_chance(six_star_pity)
-        remaining_rate = 1.0 - current_six_star_rate
-        current_five_star_rate = BASE_FIVE_STAR_RATE * remaining_rate
-
-        guaranteed_5_star = five_star_pity == 10
-        roll = random.random()
-
-        # --- Hard pity ---
-        if six_star_pity >= MAX_PITY:
-            six_star_pity = 0
-            five_star_pity = 0
-            tickets_total += TICKETS_SIX_STAR
-            if random.random() < 0.5:
-                rate_up_count += 1
-                if first_rate_up_pull is None:
-                    first_rate_up_pull = pulls
-                    tickets_at_first_rate_up = tickets_total
-            else:
-                if first_rate_up_pull is None:
-                    off_banner_before_first += 1
-            continue
-
-        # --- 240 guaranteed ---
-        if pulls % RATE_UP_240 == 0:
-            rate_up_count += 1
-            tickets_total += 0 # NO TICKETS GAINED FOR POTENTIAL TOKEN
-            six_star_pity = 0
-            five_star_pity = 0
-            if first_rate_up_pull is None:
-                first_rate_up_pull = pulls
-                tickets_at_first_rate_up = tickets_total
-            continue
-
-        # --- 120 guaranteed first ---
-        if pulls >= GUARANTEE_120 and rate_up_count == 0:
-            rate_up_count += 1
-            tickets_total += TICKETS_SIX_STAR
-            six_star_pity = 0
-            five_star_pity = 0
-            first_rate_up_pull = pulls
-            tickets_at_first_rate_up = tickets_total
-            hit_120_guarantee = True
-            continue
-
-        # --- Normal roll ---
-        if roll < current_six_star_rate:
-            six_star_pity = 0
-            five_star_pity = 0
-            tickets_total += TICKETS_SIX_STAR
-            if random.random() < 0.5:
-                rate_up_count += 1
-                if first_rate_up_pull is None:
-                    first_rate_up_pull = pulls
-                    tickets_at_first_rate_up = tickets_total
-            else:
-                if first_rate_up_pull is None:
-                    off_banner_before_first += 1
-
-        elif roll < current_six_star_rate + current_five_star_rate or guaranteed_5_star:
-            five_star_pity = 0
-            tickets_total += TICKETS_FIVE_STAR
-        else:
-            tickets_total += TICKETS_FOUR_STAR
-
-    return pulls, tickets_total, first_rate_up_pull, tickets_at_first_rate_up, off_banner_before_first, hit_120_guarantee, tickets_at_120
+BANNER = BannerSpec(
+    "endfield-character",
+    load_curve(CURVE_FILE) if CURVE_FILE else pity_curve(six_star_chance, MAX_PITY),
+    TARGET_RATE_UPS,
+    rate_up_chance=0.5,
+    first_rate_up_at=GUARANTEE_120,
+    first_rate_up_forced=True,
+    free_rate_up_every=RATE_UP_240,
+    hard_pity_first=True,
+    tickets=TicketIncome(
+        TICKETS_SIX_STAR, TICKETS_FIVE_STAR, TICKETS_FOUR_STAR,
+        pity_curve(five_star_chance, FIVE_STAR_PITY),
+    ),
+)
+KERNEL = compile_banner(BANNER)
+
+# --------------------
+# Streaming summary of experiments
+# --------------------
+def new_summary():
+    """Joint histograms pair total pulls, and the first rate-up pull, with
+    the arsenal tickets held at that point."""
+    return {
+        "pulls": IntHistogram(),
+        "tickets": LogSketch(),
+        "pulls_tickets": JointHistogram(TICKET_BIN),
+        "first_rate_up": IntHistogram(),
+        "first_rate_up_tickets": JointHistogram(TICKET_BIN),
+        "off_banner": IntHistogram(),
+        "tickets_at_120": Mean(),
+        "copy_pulls": JointHistogram(),
+    }
+
+def record(summary, columns):
+    summary["pulls"].add_many(columns.pulls)
+    summary["tickets"].add_many(columns.tickets)
+    summary["pulls_tickets"].add_many(columns.pulls, columns.tickets)
+    summary["first_rate_up"].add_many(columns.first_rate_up)
+    summary["first_rate_up_tickets"].add_many(columns.first_rate_up, columns.tickets_at_first_rate_up)
+    summary["off_banner"].add_many(columns.off_banner)
+    summary["tickets_at_120"].add_many(columns.tickets_at_guarantee[columns.hit_guarantee.astype(bool)])
+    copies = np.broadcast_to(np.arange(1, TARGET_RATE_UPS + 1), columns.copy_pulls.shape)
+    summary["copy_pulls"].add_many(copies.ravel(), columns.copy_pulls.ravel())
+
+def simulate():
+    """Run EXPERIMENTS with ENGINE; returns the merged summary."""
+    return run_banner_summary(KERNEL, ENGINE, new_summary, record, EXPERIMENTS, SEED, WORKERS, TOLERANCES, CACHE, STORE, TRACE, METRICS)
+
+# --------------------
+# Arsenal tickets to weapon rolls
+# --------------------
+def weapon_rolls(tickets):
+    return tickets / 1980 * 10
+
+def format_tickets(tickets):
+    """Tickets and weapon rolls, or n/a when no experiment ended on that pull."""
+    if math.isnan(tickets):
+        return "n/a"
+    return f"{tickets:.2f} ({weapon_rolls(tickets):.2f} weapon rolls)"
+
+# --------------------
+# Exact distributions (no sampling)
+# --------------------
+def main_exact():
+    result = solve_banner(KERNEL)
+    pulls_pmf = result.pulls_pmf
+    first_pmf = result.first_on_rate_pmf
+    median_pulls = pmf_percentile(pulls_pmf, 50)
+    median_first_rate_up = pmf_percentile(first_pmf, 50)
+
+    print("========== EXACT RESULTS ==========")
+    print(f"Best Luck Scenario (minimum pulls): {pmf_min(pulls_pmf)}")
+    print(f"Worst Luck Scenario (maximum pulls): {pmf_max(pulls_pmf)}")
+    print(f"Average pulls needed for 6 rate-ups: {pmf_mean(pulls_pmf):.2f}")
+    print(f"Median pulls for 6 rate-ups: {median_pulls}")
+    print(f"5th percentile pulls: {pmf_percentile(pulls_pmf, 5)}")
+    print(f"95th percentile pulls: {pmf_percentile(pulls_pmf, 95)}")
+    print(f"Arsenal tickets at median pulls for 6 rate-ups: {format_tickets(result.tickets_at_pulls[median_pulls])}")
+    print(f"Average arsenal tickets at 6 rate-ups: {np.nansum(result.tickets_at_pulls * pulls_pmf):.0f}")
+    for label, q in (("5th percentile", 5), ("95th percentile", 95)):
+        print(f"  Tickets at {label} pulls: {format_tickets(result.tickets_at_pulls[pmf_percentile(pulls_pmf, q)])}")
+
+    print(f"\nAverage pulls for FIRST rate-up: {pmf_mean(first_pmf):.2f}")
+    print(f"Median pulls for FIRST rate-up: {median_first_rate_up}")
+    print(f"Arsenal tickets for median FIRST rate-up: {format_tickets(result.tickets_at_first_rate_up[median_first_rate_up])}")
+    print(f"Probability of hitting 120-pull guarantee: {result.guarantee_probability:.4f}")
+    print(f"Average arsenal tickets when hitting 120-pull guarantee: {result.tickets_at_guarantee:.2f}")
+    print(f"Number of weapon rolls possible at average (120 guarantee): {weapon_rolls(result.tickets_at_guarantee):.2f}")
+    print(f"Probability of at least one rate-up within 80 pulls: {first_pmf[:81].sum():.4f}")
+
+    render([
+        line_chart(
+            "endfield-character-exact-pulls", "Distribution of Total Pulls Needed for 6 Rate-Ups (Exact)",
+            "Total Pulls", "Probability", pulls_pmf,
+            markers=[
+                (milestone, dict(linestyle=":", linewidth=2, label=f"{milestone} pulls"))
+                for milestone in [240, 480, 720]
+            ],
+            label="Probability",
+        ),
+        line_chart(
+            "endfield-character-exact-tickets", "Expected Arsenal Tickets by Pulls Needed for 6 Rate-Ups (Exact)",
+            "Total Pulls", "Arsenal Tickets", result.tickets_at_pulls,
+        ),
+        line_chart(
+            "endfield-character-exact-first-rate-up", "Distribution of Pulls Needed for First Featured Unit (Exact)",
+            "Pulls", "Probability", first_pmf,
+            markers=[(120, dict(linestyle="--", label="120 Guarantee"))],
+        ),
+    ], PLOTS, PLOT_DIR, WORKERS)
 
 # --------------------
 # Main simulation
 # --------------------
 def main():
-    pulls_list = []
-    tickets_list = []
-    first_rate_up_pulls = []
-    first_rate_up_tickets = []
-    off_banner_counts = []
-    count_120_guarantee = 0
-    tickets_at_120_guarantee = []
-
-    for _ in range(EXPERIMENTS):
-        p, t, fr, fr_t, off, g120, t120 = run_experiment()
-        pulls_list.append(p)
-        tickets_list.append(t)
-        first_rate_up_pulls.append(fr)
-        first_rate_up_tickets.append(fr_t)
-        off_banner_counts.append(off)
-        if g120:
-            count_120_guarantee += 1
-            tickets_at_120_guarantee.append(t120)
+    if ENGINE == "exact":
+        main_exact()
+        return
+
+    summary = simulate()
+    pulls = summary["pulls"]
+    first_rate_up = summary["first_rate_up"]
+    off_banner = summary["off_banner"]
 
     # --------------------
     # Core statistics
     # --------------------
-    best = min(pulls_list)
-    worst = max(pulls_list)
-    avg = sum(pulls_list) / len(pulls_list)
-    median_pulls = statistics.median(pulls_list)
-    p5 = int(np.percentile(pulls_list, 5))
-    p95 = int(np.percentile(pulls_list, 95))
+    best = pulls.min()
+    worst = pulls.max()
+    avg = pulls.mean()
+    median_pulls = pulls.median()
+    p5 = int(pulls.percentile(5))
+    p95 = int(pulls.percentile(95))
+    median_tickets = summary["tickets"].percentile(50)
 
     median_pulls_int = int(median_pulls)
-    tickets_at_median_6_rateups = [
-        tickets
-        for pull, tickets in zip(pulls_list, tickets_list)
-        if pull == median_pulls_int
-    ]
-    median_6_rateup_tickets = sum(tickets_at_median_6_rateups) / len(tickets_at_median_6_rateups)
-
-    avg_first_rate_up = sum(first_rate_up_pulls) / len(first_rate_up_pulls)
-    at_most_80_first_rate_up = sum(
-        1 for x in first_rate_up_pulls if x <= 80
+    median_6_rateup_tickets = summary["pulls_tickets"].mean(median_pulls_int)
+    tickets_at = {
+        label: summary["pulls_tickets"].mean(int(pulls.percentile(q)))
+        for label, q in (("5th percentile", 5), ("95th percentile", 95))
+    }
+
+    avg_first_rate_up = first_rate_up.mean()
+    at_most_80_first_rate_up = first_rate_up.count_in(0, 80)
+
+    median_first_rate_up_pulls = int(first_rate_up.median())
+    median_first_rate_up_tickets = summary["first_rate_up_tickets"].mean(
+        median_first_rate_up_pulls
     )
 
-    median_first_rate_up_pulls = int(statistics.median(first_rate_up_pulls))
-    tickets_at_median_first_rate_up = [
-        tickets
-        for pull, tickets in zip(first_rate_up_pulls, first_rate_up_tickets)
-        if pull == median_first_rate_up_pulls
-    ]
-    median_first_rate_up_tickets = sum(tickets_at_median_first_rate_up) / len(tickets_at_median_first_rate_up)
-
-    avg_tickets_120 = (
-        sum(tickets_at_120_guarantee) / len(tickets_at_120_guarantee)
-        if tickets_at_120_guarantee else 0
-    )
+    count_120_guarantee = summary["tickets_at_120"].count
+    avg_tickets_120 = summary["tickets_at_120"].mean()
 
     # Off-banner stats
-    first_hit = sum(1 for x in off_banner_counts if x == 0)
-    one = sum(1 for x in off_banner_counts if x == 1)
-    two = sum(1 for x in off_banner_counts if x == 2)
-    three_plus = sum(1 for x in off_banner_counts if x >= 3)
+    first_hit = off_banner.frequency(0)
+    one = off_banner.frequency(1)
+    two = off_banner.frequency(2)
+    three_plus = off_banner.count_in(3)
 
     # --------------------
     # Print results
     # --------------------
     print("========== RESULTS ==========")
+    print(f"Experiments run: {pulls.count}")
+    if TOLERANCES:
+        print("\n".join(interval_report(pulls, TOLERANCES)))
     print(f"Best Luck Scenario (minimum pulls): {best}")
     print(f"Worst Luck Scenario (maximum pulls): {worst}")
     print(f"Average pulls needed for 6 rate-ups: {avg:.2f}")
     print(f"Median pulls for 6 rate-ups: {median_pulls}")
     print(f"5th percentile pulls: {p5}")
     print(f"95th percentile pulls: {p95}")
-    print(f"Arsenal tickets at median pulls for 6 rate-ups: {median_6_rateup_tickets}")
-    print(f"Number of weapon rolls possible at median: {median_6_rateup_tickets/1980*10:.2f}")
+    print(f"Arsenal tickets at median pulls for 6 rate-ups: {format_tickets(median_6_rateup_tickets)}")
+    print(f"Median arsenal tickets at 6 rate-ups: {median_tickets:.0f}")
+    for label, tickets in tickets_at.items():
+        print(f"  Tickets at {label} pulls: {format_tickets(tickets)}")
 
     print(f"\nAverage pulls for FIRST rate-up: {avg_first_rate_up:.2f}")
     print(f"Median pulls for FIRST rate-up: {median_first_rate_up_pulls}")
-    print(f"Arsenal tickets for median FIRST rate-up: {median_first_rate_up_tickets}")
-    print(f"Number of weapon rolls possible at median: {median_first_rate_up_tickets/1980*10:.2f}")
+    print(f"Arsenal tickets for median FIRST rate-up: {format_tickets(median_first_rate_up_tickets)}")
     print(f"Number of experiments hitting 120-pull guarantee: {count_120_guarantee}")
     print(f"Average arsenal tickets when hitting 120-pull guarantee: {avg_tickets_120:.2f}")
-    print(f"Number of weapon rolls possible at average (120 guarantee): {avg_tickets_120/1980*10:.2f}")
+    print(f"Number of weapon rolls possible at average (120 guarantee): {weapon_rolls(avg_tickets_120):.2f}")
     print(f"Number of experiments using at most 80 pulls to get at least one rate-up: {at_most_80_first_rate_up}")
 
     print("\nOff-banner statistics before first rate-up:")
@@ -219,44 +257,29 @@ def main():
     print(f"  2 off-banners before first rate-up: {two}")
     print(f"  3 or more off-banners before first rate-up: {three_plus}")
 
+    print("\nPulls to reach each rate-up copy count:")
+    print("\n".join(copies_report(summary["copy_pulls"])))
+
     # --------------------
     # SMOOTH LINE GRAPHS (per integer)
     # --------------------
-    counts = np.bincount(pulls_list)
-    x = np.arange(len(counts))
-
-    plt.figure(figsize=(10,6))
-    plt.plot(x, counts, label="Frequency")
-
-    # --- Dotted milestone lines ---
-    for milestone in [240, 480, 720]:
-        plt.axvline(
-            milestone,
-            linestyle=":",
-            linewidth=2,
-            label=f"{milestone} pulls"
-        )
-
-    plt.xlabel("Total Pulls")
-    plt.ylabel("Frequency")
-    plt.title("Distribution of Total Pulls Needed for 6 Rate-Ups (Per Pull)")
-    plt.legend()
-    plt.grid(True)
-    plt.show()
-
-
-    counts = np.bincount(first_rate_up_pulls)
-    x = np.arange(len(counts))
-
-    plt.figure(figsize=(10,6))
-    plt.plot(x, counts)
-    plt.axvline(120, linestyle='--', label='120 Guarantee')
-    plt.xlabel("Pulls")
-    plt.ylabel("Frequency")
-    plt.title("Distribution of Pulls Needed for First Featured Unit")
-    plt.legend()
-    plt.grid(True)
-    plt.show()
+    render([
+        line_chart(
+            "endfield-character-pulls", "Distribution of Total Pulls Needed for 6 Rate-Ups (Per Pull)",
+            "Total Pulls", "Frequency", pulls.trimmed(),
+            # --- Dotted milestone lines ---
+            markers=[
+                (milestone, dict(linestyle=":", linewidth=2, label=f"{milestone} pulls"))
+                for milestone in [240, 480, 720]
+            ],
+            label="Frequency",
+        ),
+        line_chart(
+            "endfield-character-first-rate-up", "Distribution of Pulls Needed for First Featured Unit",
+            "Pulls", "Frequency", first_rate_up.trimmed(),
+            markers=[(120, dict(linestyle="--", label="120 Guarantee"))],
+        ),
+    ], PLOTS, PLOT_DIR, WORKERS)
 
 
 if __name__ == "__main__":
@@ -1,6 +1,8 @@
-import random
 import numpy as np
-import matplotlib.pyplot as plt
+
+from gachasim.kernel import compile_banner, copies_report, interval_report, run_banner
+from gachasim.plots import binned, line_chart, render
+from gachasim.spec import BannerSpec, pity_curve
 
 # --------------------
 # Constants
@@ -16,74 +18,49 @@ EXTRA_RATE_UPS = [180, 340, 500, 660, 820]
 
 TARGET_RATE_UPS = 6
 EXPERIMENTS = 10000
+SEED = None  # set an int for reproducible results
+WORKERS = None  # None = one worker per CPU core
+ENGINE = "batch"  # "per-pull", "skip" (skip-ahead) or "batch" (vectorized); no "exact": bonus rate-ups have no exact solver
+TOLERANCES = None  # e.g. {"mean": 1.0, 95: 0.5}: run until these 95% CI half-widths
+CACHE = True  # reuse the results of an identical seeded run (see gachasim.cache)
+STORE = None  # a directory: write per-experiment results to a memory-mapped store (see gachasim.store)
+TRACE = None  # a directory: record every pull (per-pull engine) for replay (see gachasim.trace)
+METRICS = None  # a .json file: count rule firings and time run phases into it (see gachasim.metrics)
+PLOTS = "show"  # "show", "png" / "svg" (saved to PLOT_DIR) or None
+PLOT_DIR = "plots"
 
 # --------------------
-# Run a single experiment
+# 6★ chance function: flat rate, guaranteed within GUARANTEED_6_START–GUARANTEED_6_END
 # --------------------
-def run_experiment():
-    pulls = 0
-    rate_up_count = 0
-    six_star_counter = 0
-    first_rate_up_obtained = False
-    first_rate_up_pull = None
-    extra_rate_up_schedule = EXTRA_RATE_UPS.copy()
-
-    while rate_up_count < TARGET_RATE_UPS:
-        for _ in range(PULLS_PER_SET):
-            pulls += 1
-            six_star_counter += 1
-            got_six_star = False
-
-            # --- Guaranteed first rate-up (71–80) ---
-            if not first_rate_up_obtained and pulls == FIRST_RATE_UP_PITY_END:
-                first_rate_up_obtained = True
-                rate_up_count += 1
-                first_rate_up_pull = pulls
-                six_star_counter = 0
-
-            else:
-                # --- Guaranteed 6★ between 31–40 ---
-                if six_star_counter >= GUARANTEED_6_START:
-                    if six_star_counter >= GUARANTEED_6_END:
-                        got_six_star = True
-                        six_star_counter = 0
-                    elif random.random() < SIX_STAR_CHANCE:
-                        got_six_star = True
-                        six_star_counter = 0
-                elif random.random() < SIX_STAR_CHANCE:
-                    got_six_star = True
-                    six_star_counter = 0
-
-                # --- Rate-up check ---
-                if got_six_star:
-                    if random.random() < RATE_UP_CHANCE:
-                        rate_up_count += 1
-                        if not first_rate_up_obtained:
-                            first_rate_up_obtained = True
-                            first_rate_up_pull = pulls
-
-            # --- Extra scheduled rate-ups ---
-            for extra_pull in extra_rate_up_schedule[:]:
-                if pulls == extra_pull:
-                    rate_up_count += 1
-                    extra_rate_up_schedule.remove(extra_pull)
-
-            if rate_up_count >= TARGET_RATE_UPS:
-                break
+def six_star_chance(counter):
+    return SIX_STAR_CHANCE
 
-    return pulls, first_rate_up_pull
+# --------------------
+# Banner rules: pull 80 is the rate-up if none was won yet (even at hard
+# pity), and every EXTRA_RATE_UPS pull adds one on top of its own roll
+# --------------------
+BANNER = BannerSpec(
+    "endfield-weapon",
+    pity_curve(six_star_chance, GUARANTEED_6_END),
+    TARGET_RATE_UPS,
+    rate_up_chance=RATE_UP_CHANCE,
+    first_rate_up_at=FIRST_RATE_UP_PITY_END,
+    first_rate_up_forced=True,
+    bonus_rate_ups=tuple(EXTRA_RATE_UPS),
+    hard_pity_first=False,
+)
+KERNEL = compile_banner(BANNER)
 
 # --------------------
 # Main simulation
 # --------------------
-def main():
-    results = []
-    first_rate_up_pulls = []
+def simulate():
+    """Run EXPERIMENTS with ENGINE; returns an Experiment of result columns."""
+    return run_banner(KERNEL, ENGINE, EXPERIMENTS, SEED, WORKERS, TOLERANCES, CACHE, STORE, TRACE, METRICS)
 
-    for _ in range(EXPERIMENTS):
-        total_pulls, first_pull = run_experiment()
-        results.append(total_pulls)
-        first_rate_up_pulls.append(first_pull)
+def main():
+    columns = simulate()
+    results, first_rate_up_pulls = columns.pulls, columns.first_rate_up
 
     # ---------- Statistics ----------
     best_luck = np.min(results)
@@ -103,7 +80,9 @@ def main():
     perc_95_first_rounded = int(np.ceil(perc_95_first / 10) * 10)
 
     print("========== RESULTS ==========")
-    print(f"Experiments run: {EXPERIMENTS}")
+    print(f"Experiments run: {len(results)}")
+    if TOLERANCES:
+        print("\n".join(interval_report(results, TOLERANCES)))
     print(f"Best Luck Scenario (minimum pulls): {best_luck}")
     print(f"Worst Luck Scenario (maximum pulls): {worst_luck}")
     print(f"Average pulls needed for 6 rate-ups: {avg_pulls_6:.2f}")
@@ -114,35 +93,31 @@ def main():
     print(f"5th percentile first rate-up: {perc_5_first_rounded}")
     print(f"95th percentile first rate-up: {perc_95_first_rounded}")
 
-    # ---------- Distribution plots ----------
-    # 6 rate-ups
-    bins = np.arange(PULLS_PER_SET, max(results)+PULLS_PER_SET, PULLS_PER_SET)
-    counts, _ = np.histogram(results, bins=bins)
-    bin_x = bins[:-1]
-    plt.figure(figsize=(10,6))
-    plt.plot(bin_x, counts, linewidth=2)
-    for milestone in [180, 340, 500, 660]:
-        plt.axvline(milestone, linestyle=":", linewidth=2, label=f"{milestone} pulls")
-    plt.xlabel("Total Pulls")
-    plt.ylabel("Frequency")
-    plt.title("Total Pulls Needed for 6 Rate-Ups (Binned by 10)")
-    plt.legend()
-    plt.grid(True)
-    plt.show()
+    print("\nPulls to reach each rate-up copy count:")
+    print("\n".join(copies_report(columns.copy_pulls)))
 
-    # First rate-up
-    bins_first = np.arange(PULLS_PER_SET, max(first_rate_up_pulls)+PULLS_PER_SET*2, PULLS_PER_SET)
-    counts_first, _ = np.histogram(first_rate_up_pulls, bins=bins_first)
-    bin_x_first = bins_first[:-1]
-    plt.figure(figsize=(10,6))
-    plt.plot(bin_x_first, counts_first, linewidth=2)
-    plt.axvline(80, linestyle="--", linewidth=2, label="80 Pull Cap")
-    plt.xlabel("Pulls to First Rate-Up")
-    plt.ylabel("Frequency")
-    plt.title("Pulls Needed for First Rate-Up (Binned by 10)")
-    plt.legend()
-    plt.grid(True)
-    plt.show()
+    # ---------- Distribution plots ----------
+    bin_x, counts = binned(np.bincount(results), PULLS_PER_SET, PULLS_PER_SET)
+    bin_x_first, counts_first = binned(np.bincount(first_rate_up_pulls), PULLS_PER_SET, PULLS_PER_SET)
+    render([
+        # 6 rate-ups
+        line_chart(
+            "endfield-weapon-pulls", "Total Pulls Needed for 6 Rate-Ups (Binned by 10)",
+            "Total Pulls", "Frequency", counts, bin_x,
+            markers=[
+                (milestone, dict(linestyle=":", linewidth=2, label=f"{milestone} pulls"))
+                for milestone in [180, 340, 500, 660]
+            ],
+            linewidth=2,
+        ),
+        # First rate-up
+        line_chart(
+            "endfield-weapon-first-rate-up", "Pulls Needed for First Rate-Up (Binned by 10)",
+            "Pulls to First Rate-Up", "Frequency", counts_first, bin_x_first,
+            markers=[(80, dict(linestyle="--", linewidth=2, label="80 Pull Cap"))],
+            linewidth=2,
+        ),
+    ], PLOTS, PLOT_DIR, WORKERS)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1 @@
+"""Shared engines for the gacha simulator scripts."""
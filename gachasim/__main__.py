@@ -0,0 +1,3 @@
+from gachasim.cli import main
+
+main()
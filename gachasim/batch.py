@@ -0,0 +1,222 @@
+"""Vectorized batch engine.
+
+Every experiment is a lane in a set of NumPy arrays. All live lanes take
+their next pull together, and lanes that reach the target are retired, so
+the Python-level loop runs once per pull index rather than once per pull.
+Rules tied to a pull number (free, forced and bonus rate-ups, the ticket
+snapshot) are scalar checks on that index; only top-rarity hits, a few
+percent of the lanes, are resolved lane by lane.
+"""
+import numpy as np
+
+from gachasim.spec import Experiment
+from gachasim.trace import (
+    BONUS, CARRIED, CERTAIN, FORCED, FREE, FRESH, HARD_PITY, NEXT_HIT, RATE_UP, ROLL, RULE_SHIFT, TOP,
+)
+
+CHUNK_SIZE = 1 << 18  # lanes simulated together; bounds working memory
+
+
+def run_banner_batch(banner, experiments, rng=None, sink=None, metrics=None):
+    """Vectorized gachasim.kernel.run_experiment() for a CompiledBanner.
+
+    Finished lanes are handed to `sink(columns)` as an Experiment of
+    arrays as they retire. Without a sink, returns the Experiment columns
+    of every experiment (in retirement order). With `metrics`, top-rarity
+    pulls are counted and the steps of each pull index timed into it.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    finished = []
+    emit = finished.append if sink is None else sink
+    for start in range(0, experiments, CHUNK_SIZE):
+        _banner_chunk(banner, min(CHUNK_SIZE, experiments - start), rng, emit, metrics)
+    if sink is not None:
+        return None
+    if not finished:
+        empty = [np.zeros(0, dtype=np.int64) for _ in Experiment._fields[:-1]]
+        return Experiment(*empty, np.zeros((0, banner.spec.target), dtype=np.int64))
+    return Experiment(*(np.concatenate(column) for column in zip(*finished)))
+
+
+def _banner_chunk(banner, size, rng, emit, metrics=None):
+    spec = banner.spec
+    hazard = banner.table.hazard
+    hard_pity = banner.table.hard_pity
+    target = spec.target
+    chance = spec.rate_up_chance
+    carry = spec.carry_guarantee
+    first_at = spec.first_rate_up_at
+    forced_first = first_at is not None and spec.first_rate_up_forced
+    next_hit_guarantee = first_at is not None and not spec.first_rate_up_forced
+    free_every = spec.free_rate_up_every
+    income = spec.tickets
+    bonus = np.bincount(banner.bonus) if banner.bonus else np.zeros(0, dtype=np.int64)
+    counts = metrics.hits if metrics is not None else None
+    mark = metrics.mark if metrics is not None else None
+
+    lanes = {
+        "pity": np.zeros(size, dtype=np.int32),
+        "rate_up_count": np.zeros(size, dtype=np.int32),
+        "guarantee": np.zeros(size, dtype=bool),
+        "first_guarantee_open": np.ones(size, dtype=bool),
+        "rolled_before": np.zeros(size, dtype=bool),
+        "first_rate_up": np.zeros(size, dtype=np.int32),
+        "lost_first": np.zeros(size, dtype=bool),
+        "off_banner": np.zeros(size, dtype=np.int32),
+        "hit_guarantee": np.zeros(size, dtype=bool),
+        "tickets": np.zeros(size, dtype=np.int64),
+        "tickets_at_first_rate_up": np.zeros(size, dtype=np.int64),
+        "tickets_at_guarantee": np.zeros(size, dtype=np.int64),
+        "copy_pulls": np.zeros((size, target), dtype=np.int32),
+        "secondary_pity": np.zeros(size, dtype=np.int32),
+    }
+    waiting_for_first = forced_first
+
+    pulls = 0
+    if mark:
+        mark()
+    while size:
+        pulls += 1
+        pity = lanes["pity"]
+        first_rate_up = lanes["first_rate_up"]
+        tickets = lanes["tickets"]
+        pity += 1
+        rate = hazard[pity]
+        roll = rng.random(size)
+        hit_mask = roll < rate  # hard pity has rate 1.0
+
+        # --- Free and forced first rate-ups take the whole pull ---
+        free = bool(free_every) and pulls % free_every == 0
+        forced = None
+        if free or (waiting_for_first and pulls >= first_at):
+            candidates = np.ones(size, dtype=bool) if free else lanes["rate_up_count"] == 0
+            if not free and not candidates.any():
+                waiting_for_first = False
+            if spec.hard_pity_first:
+                candidates &= pity < hard_pity
+            forced = np.flatnonzero(candidates)
+            hit_mask[forced] = False
+        hits = np.flatnonzero(hit_mask)
+        if mark:
+            mark("batch.draw")
+
+        # --- Ticket income, before pity resets ---
+        if income:
+            secondary_pity = lanes["secondary_pity"]
+            secondary_pity += 1
+            if pulls == first_at:
+                lanes["tickets_at_guarantee"][:] = tickets
+            missed = ~hit_mask
+            if forced is not None:
+                missed[forced] = False
+            secondary = missed & (
+                roll < rate + banner.secondary.hazard[secondary_pity] * (1.0 - rate)
+            )
+            tickets += income.secondary * secondary + income.common * (missed & ~secondary)
+            tickets[hits] += income.top
+            secondary_pity[secondary] = 0
+            secondary_pity[hits] = 0
+            if forced is not None:
+                secondary_pity[forced] = 0
+                if not free:
+                    tickets[forced] += income.top
+            if mark:
+                mark("batch.tickets")
+
+        # --- Rate-up or off-banner for every top-rarity hit ---
+        winners = hits[:0]
+        if len(hits):
+            hard = pity[hits] >= hard_pity
+            rolled_before = lanes["rolled_before"][hits]
+            guarantee = lanes["guarantee"][hits]
+            won = np.zeros(len(hits), dtype=bool)
+            decided = np.zeros(len(hits), dtype=bool)
+            u = rng.random(len(hits)) if chance < 1.0 else np.zeros(len(hits))
+            if counts is not None:
+                rule = np.full(len(hits), CERTAIN if chance >= 1.0 else ROLL)
+            if spec.first_hit_fresh:
+                fresh = ~hard & ~rolled_before
+                won[fresh] = u[fresh] < chance  # a win keeps the carried guarantee
+                guarantee |= fresh & ~won & carry
+                decided |= fresh
+                if counts is not None:
+                    rule[fresh] = FRESH
+            if next_hit_guarantee and pulls >= first_at:
+                opened = ~decided & lanes["first_guarantee_open"][hits]
+                won |= opened
+                decided |= opened
+                lanes["first_guarantee_open"][hits[opened]] = False
+                if counts is not None:
+                    rule[opened] = NEXT_HIT
+            if carry:
+                guaranteed = ~decided & guarantee
+                won |= guaranteed
+                decided |= guaranteed
+                guarantee &= ~guaranteed
+                if counts is not None:
+                    rule[guaranteed] = CARRIED
+            rest = ~decided
+            if chance >= 1.0:
+                won |= rest
+            else:
+                rest_won = rest & (u < chance)
+                won |= rest_won
+                if carry:
+                    guarantee |= rest & ~rest_won
+            lanes["guarantee"][hits] = guarantee
+
+            first_rolled = ~hard & ~rolled_before
+            lanes["lost_first"][hits[first_rolled]] = ~won[first_rolled]
+            lanes["rolled_before"][hits[~hard]] = True
+            lanes["off_banner"][hits[~won & (first_rate_up[hits] == 0)]] += 1
+            if counts is not None:
+                codes = TOP | rule << RULE_SHIFT | RATE_UP * won | HARD_PITY * hard
+                np.add.at(counts, (codes, pity[hits]), 1)
+            pity[hits] = 0
+            winners = hits[won]
+
+        if forced is not None and len(forced):
+            if counts is not None:
+                np.add.at(counts, (TOP | (FREE if free else FORCED) << RULE_SHIFT | RATE_UP, pity[forced]), 1)
+            pity[forced] = 0
+            if not free:
+                lanes["hit_guarantee"][forced] = True
+            winners = np.concatenate([winners, forced])
+
+        rate_up_count = lanes["rate_up_count"]
+        new_first = winners[first_rate_up[winners] == 0]
+        first_rate_up[new_first] = pulls
+        lanes["tickets_at_first_rate_up"][new_first] = tickets[new_first]
+        lanes["copy_pulls"][winners, rate_up_count[winners]] = pulls
+        rate_up_count[winners] += 1
+        if mark:
+            mark("batch.hits")
+
+        # --- Bonus rate-ups, then retire finished lanes ---
+        if pulls < len(bonus) and bonus[pulls]:
+            for _ in range(bonus[pulls]):
+                open_lanes = np.flatnonzero(rate_up_count < target)
+                lanes["copy_pulls"][open_lanes, rate_up_count[open_lanes]] = pulls
+                rate_up_count[open_lanes] += 1
+                if counts is not None:
+                    counts[BONUS, 0] += len(open_lanes)
+            finished = rate_up_count >= target
+        else:
+            finished = np.zeros(size, dtype=bool)
+            finished[winners[rate_up_count[winners] >= target]] = True
+        block = None
+        if finished.any():
+            block = Experiment(
+                np.full(np.count_nonzero(finished), pulls, dtype=np.int32),
+                *(lanes[name][finished] for name in Experiment._fields[1:]),
+            )
+            keep = ~finished
+            lanes = {name: lane[keep] for name, lane in lanes.items()}
+            size = len(lanes["pity"])
+        if mark:
+            mark("batch.retire")
+        if block is not None:
+            emit(block)
+            if mark:
+                mark("batch.emit")
@@ -0,0 +1,231 @@
+"""Throughput benchmarks for every simulator script and engine.
+
+    python -m gachasim.bench                      # all cases, print a table
+    python -m gachasim.bench -o bench.json        # also save the results
+    python -m gachasim.bench --compare old.json   # speed-up against a saved run
+    python -m gachasim.bench -k weapon -k skip    # only cases matching all filters
+
+Every case runs in a fresh interpreter at a fixed seed and experiment
+count on one worker, so peak RSS and timings are not polluted by other
+cases. Startup is the wall time of an interpreter that only imports the
+script (numpy, hazard tables, ...). Exact engines have no experiments;
+they report only the solve time.
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPTS = {
+    "hoyo-character": ("per-pull", "skip", "batch", "exact"),
+    "wuwa-character": ("per-pull", "skip", "batch", "exact"),
+    "genshin-weapon": ("per-pull", "skip", "batch", "exact"),
+    "hsr-weapon": ("per-pull", "skip", "batch", "exact"),
+    "wuwa-weapon": ("per-pull", "skip", "batch", "exact"),
+    "arknights-character": ("per-pull", "skip", "batch", "exact"),
+    "endfield-weapon": ("per-pull", "skip", "batch"),
+    "endfield-character": ("per-pull", "skip", "batch", "exact"),
+}
+
+# Experiments per case, sized so every case runs for roughly a second
+EXPERIMENTS = {"per-pull": 20000, "skip": 50000, "batch": 500000}
+SEED = 12345
+
+
+def load_script(name):
+    """Import `<name>-simulator.py` from the repository root as a module."""
+    path = os.path.join(ROOT, f"{name}-simulator.py")
+    spec = importlib.util.spec_from_file_location(name.replace("-", "_"), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def total_pulls(result):
+    """Pulls simulated, from whatever shape the script's simulate() returns."""
+    if isinstance(result, dict):
+        pulls = result["pulls"]
+        return round(pulls.mean() * pulls.count)
+    return int(result.pulls.sum())  # Experiment columns
+
+
+def peak_rss():
+    """Peak resident set size in bytes of this process and its children."""
+    scale = 1 if sys.platform == "darwin" else 1024
+    return scale * max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+
+
+# --------------------
+# One case (runs in the child interpreter)
+# --------------------
+def run_case(name, engine, experiments, seed):
+    module = load_script(name)
+    module.ENGINE = engine
+    module.EXPERIMENTS = experiments
+    module.SEED = seed
+    module.WORKERS = 1
+    module.PLOTS = None
+    module.CACHE = False
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if engine == "exact":
+            module.main_exact()
+            result = None
+        else:
+            result = module.simulate()
+    seconds = time.perf_counter() - start
+
+    record = {"script": name, "engine": engine, "seconds": seconds}
+    if result is None:
+        record.update(experiments=None, pulls=None, experiments_per_sec=None, pulls_per_sec=None)
+    else:
+        pulls = total_pulls(result)
+        record.update(
+            experiments=experiments,
+            pulls=pulls,
+            experiments_per_sec=experiments / seconds,
+            pulls_per_sec=pulls / seconds,
+        )
+    record["peak_rss_bytes"] = peak_rss()
+    return record
+
+
+# --------------------
+# Driver
+# --------------------
+def _child(*args):
+    command = [sys.executable, "-m", "gachasim.bench", *args]
+    start = time.perf_counter()
+    output = subprocess.run(command, cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return output, time.perf_counter() - start
+
+
+def startup_time(name, repeat):
+    """Best wall time of a fresh interpreter importing the script."""
+    return min(_child("--import-only", name)[1] for _ in range(repeat))
+
+
+def cases(filters):
+    for name, engines in SCRIPTS.items():
+        for engine in engines:
+            if all(word in f"{name}:{engine}" for word in filters):
+                yield name, engine
+
+
+def run_all(filters=(), scale=1.0, seed=SEED, repeat=1):
+    """Benchmark every matching case; keeps the fastest of `repeat` runs."""
+    results = []
+    startups = {}
+    for name, engine in cases(filters):
+        if name not in startups:
+            startups[name] = startup_time(name, repeat)
+        experiments = max(1, int(EXPERIMENTS.get(engine, 0) * scale))
+        runs = [
+            json.loads(_child("--case", name, engine, str(experiments), str(seed))[0])
+            for _ in range(repeat)
+        ]
+        record = min(runs, key=lambda run: run["seconds"])
+        record["startup_seconds"] = startups[name]
+        results.append(record)
+        print(format_row(record), file=sys.stderr)
+    return {"environment": environment(), "seed": seed, "results": results}
+
+
+def environment():
+    import numpy as np
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def _rate(value):
+    return f"{value:>12,.0f}" if value is not None else f"{'-':>12}"
+
+
+def format_row(record):
+    return (
+        f"{record['script']:<20} {record['engine']:<12} {_rate(record['experiments_per_sec'])} "
+        f"{_rate(record['pulls_per_sec'])} {record['seconds']:>8.3f} "
+        f"{record['peak_rss_bytes'] / 2**20:>8.1f} {record['startup_seconds']:>8.3f}"
+    )
+
+
+HEADER = (
+    f"{'script':<20} {'engine':<12} {'exps/s':>12} {'pulls/s':>12} "
+    f"{'seconds':>8} {'rss MiB':>8} {'startup':>8}"
+)
+
+
+def compare(current, baseline):
+    """Lines of per-case speed-up (experiments/s, or solve time for exact)."""
+    old = {(r["script"], r["engine"]): r for r in baseline["results"]}
+    lines = []
+    for record in current["results"]:
+        before = old.get((record["script"], record["engine"]))
+        if before is None:
+            continue
+        if record["experiments_per_sec"] and before["experiments_per_sec"]:
+            ratio = record["experiments_per_sec"] / before["experiments_per_sec"]
+        else:
+            ratio = before["seconds"] / record["seconds"]
+        lines.append(f"{record['script']:<20} {record['engine']:<12} {ratio:>7.2f}x")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m gachasim.bench", description=__doc__.split("\n")[0]
+    )
+    parser.add_argument(
+        "-k", dest="filters", action="append", default=[], help="only cases containing this text"
+    )
+    parser.add_argument("-o", "--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON file of an earlier run to compare against")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every experiment count")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case; the fastest is kept")
+    parser.add_argument(
+        "--case", nargs=4, metavar=("SCRIPT", "ENGINE", "EXPERIMENTS", "SEED"), help=argparse.SUPPRESS
+    )
+    parser.add_argument("--import-only", metavar="SCRIPT", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.import_only:
+        load_script(args.import_only)
+        return
+    if args.case:
+        name, engine, experiments, seed = args.case
+        print(json.dumps(run_case(name, engine, int(experiments), int(seed))))
+        return
+
+    print(HEADER, file=sys.stderr)
+    report = run_all(args.filters, args.scale, args.seed, args.repeat)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        print("\nSpeed-up against", args.compare)
+        print("\n".join(compare(report, baseline)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Content-addressed on-disk cache of seeded simulation results.
+
+A run is fully determined by the banner spec, engine, experiment count,
+seed, worker count and convergence tolerances, plus the engine code
+itself (gachasim.sources.source_key()). cache_key() hashes all of them,
+so a changed constant or an edited engine is a different key and stale
+entries are simply never read again. Unseeded runs are never cached.
+
+Each entry is one uncompressed .npz file: Experiment columns, or a
+summary's accumulators as their (sparse) histogram arrays from
+gachasim.stats.summary_arrays, each in the smallest integer type that
+holds it. Reading an
+entry refreshes its modification time, and writing one evicts the
+least recently used entries until the directory is under its size
+bound.
+"""
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+from gachasim.spec import Experiment
+from gachasim.stats import summary_arrays, summary_from_arrays
+
+CACHE_DIR = os.environ.get(
+    "GACHASIM_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "gachasim")
+)
+MAX_BYTES = 256 * 2**20
+
+
+def cache_key(*parts):
+    """SHA-256 of the reprs of `parts` (specs, tuples, numbers, strings)."""
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+
+def function_key(function):
+    """Identity of a function's code and the plain constants it reads.
+
+    An edited record(), or a changed module constant such as a bin width
+    that it uses, is a new key.
+    """
+    code = function.__code__
+    constants = {
+        name: function.__globals__[name]
+        for name in code.co_names
+        if isinstance(function.__globals__.get(name), (bool, int, float, str, tuple))
+    }
+    return (
+        function.__module__, function.__qualname__, code.co_code.hex(),
+        repr(code.co_consts), sorted(constants.items()),
+    )
+
+
+def _compact(array):
+    array = np.asarray(array)
+    if array.dtype.kind not in "biu" or not array.size:
+        return array
+    return array.astype(np.result_type(np.min_scalar_type(array.min()), np.min_scalar_type(array.max())))
+
+
+def _encode(value):
+    if isinstance(value, Experiment):
+        return {f"experiment/{field}": _compact(column) for field, column in zip(Experiment._fields, value)}
+    return {f"summary/{key}": _compact(array) for key, array in summary_arrays(value).items()}
+
+
+def _decode(arrays):
+    if arrays and next(iter(arrays)).startswith("experiment/"):
+        return Experiment(*(arrays[f"experiment/{field}"].astype(np.int64) for field in Experiment._fields))
+    return summary_from_arrays({key.partition("/")[2]: array for key, array in arrays.items()})
+
+
+class ResultCache:
+    """Directory of cached results, at most `max_bytes` in total."""
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key):
+        """Cached Experiment columns or summary, or None on a miss."""
+        path = self._path(key)
+        try:
+            with np.load(path) as entry:
+                arrays = {name: entry[name] for name in entry.files}
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)  # most recently used
+        except OSError:
+            pass
+        return _decode(arrays)
+
+    def put(self, key, value):
+        os.makedirs(self.directory, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(handle, "wb") as file:
+            np.savez(file, **_encode(value))
+        os.replace(temporary, self._path(key))
+        self.evict()
+
+    def entries(self):
+        """(mtime, size, path) of every entry, least recently used first."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz"):
+                path = os.path.join(self.directory, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.remove(path)
+
+
+def cached(cache, parts, compute):
+    """`compute()`, or its cached value under cache_key(*parts).
+
+    `cache` is a ResultCache, True for the default one, or None/False to
+    always compute.
+    """
+    if not cache:
+        return compute()
+    if cache is True:
+        cache = ResultCache()
+    key = cache_key(*parts)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.put(key, value)
+    return value
@@ -0,0 +1,291 @@
+"""One command line for every simulator, with JSON output.
+
+    python -m gachasim hoyo-character
+    python -m gachasim wuwa-weapon --target 3 -n 200000 --seed 1 --engine batch --workers 4
+    python -m gachasim arknights-character --engine exact
+    python -m gachasim endfield-character --set first_rate_up_at=100 --seed 7
+    python -m gachasim --jobs jobs.jsonl > results.jsonl
+
+A job runs a simulator script's BANNER (with BannerSpec fields overridden
+by --target and --set) with the given engine, experiments, seed and
+workers in place of the script's constants, and prints one JSON line:
+total pulls, first rate-up pull and the pulls of every copy count (mean,
+min, max and percentiles). --jobs runs a JSON-lines file of jobs, objects
+with the keys of JOB_KEYS ("set" being an object of overrides), in one
+process, so imports and script set-up are paid once; a failing job
+prints {"error": ...} and the others still run.
+
+Only the standard library is imported up front. The output of a seeded
+or exact job is kept as a small JSON file keyed on the job and on the
+source of its script and of gachasim, so repeating the job reads one
+file and never imports numpy or the engines. Everything else is imported
+on first use, and seeded simulations also go through gachasim.cache.
+"""
+import argparse
+import ast
+import hashlib
+import json
+import os
+import sys
+import time
+
+from gachasim.bench import ROOT, SCRIPTS
+from gachasim.sources import source_key, update_digest
+
+CACHE_DIR = os.path.join(
+    os.environ.get("GACHASIM_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "gachasim")), "cli"
+)
+JOB_KEYS = ("game", "target", "experiments", "seed", "engine", "workers", "set")
+PERCENTILES = (5, 25, 50, 75, 95)
+
+_scripts = {}
+
+
+# --------------------
+# Jobs
+# --------------------
+def parse_override(text):
+    """'field=value' -> (field, value), the value as a Python literal."""
+    field, separator, value = text.partition("=")
+    if not separator:
+        raise ValueError(f"expected field=value, got {text!r}")
+    return field.strip(), ast.literal_eval(value.strip())
+
+
+def check_job(job):
+    unknown = set(job) - set(JOB_KEYS)
+    if unknown:
+        raise ValueError(f"unknown job keys {sorted(unknown)}; expected some of {list(JOB_KEYS)}")
+    if job.get("game") not in SCRIPTS:
+        raise ValueError(f"unknown game {job.get('game')!r}; expected one of {list(SCRIPTS)}")
+    for key in ("experiments", "workers"):
+        value = job.get(key)
+        if value is not None and (type(value) is not int or value < 1):
+            raise ValueError(f"{key} must be a positive integer, got {value!r}")
+    return job
+
+
+def _script(name):
+    if name not in _scripts:
+        from gachasim.bench import load_script
+
+        _scripts[name] = load_script(name)
+    return _scripts[name]
+
+
+def _new_summary():
+    from gachasim.stats import IntHistogram, JointHistogram
+
+    return {"pulls": IntHistogram(), "first_rate_up": IntHistogram(), "copy_pulls": JointHistogram()}
+
+
+def _record(summary, columns):
+    import numpy as np
+
+    summary["pulls"].add_many(columns.pulls)
+    summary["first_rate_up"].add_many(columns.first_rate_up)
+    copies = np.broadcast_to(np.arange(1, columns.copy_pulls.shape[1] + 1), columns.copy_pulls.shape)
+    summary["copy_pulls"].add_many(copies.ravel(), columns.copy_pulls.ravel())
+
+
+def _histogram_stats(histogram):
+    return dict(
+        mean=histogram.mean(), min=histogram.min(), max=histogram.max(),
+        **{f"p{q}": float(histogram.percentile(q)) for q in PERCENTILES},
+    )
+
+
+def _pmf_stats(pmf):
+    from gachasim.exact import pmf_max, pmf_mean, pmf_min, pmf_percentile
+
+    return dict(
+        mean=pmf_mean(pmf), min=pmf_min(pmf), max=pmf_max(pmf),
+        **{f"p{q}": float(pmf_percentile(pmf, q)) for q in PERCENTILES},
+    )
+
+
+def summary_output(summary, target):
+    """Output statistics of a run's merged summary (see _new_summary())."""
+    from gachasim.stats import IntHistogram
+
+    # copy_pulls has bin width 1, so its row k counts the pulls of copy k
+    copies = summary["copy_pulls"].bins
+    return {
+        "pulls": _histogram_stats(summary["pulls"]),
+        "first_rate_up": _histogram_stats(summary["first_rate_up"]),
+        "copies": [
+            dict(copies=k, **_histogram_stats(IntHistogram.from_arrays({"counts": copies[k]})))
+            for k in range(1, target + 1)
+        ],
+    }
+
+
+def _simulated(spec, engine, experiments, seed, workers, cache):
+    from gachasim.kernel import compile_banner, run_banner_summary
+
+    summary = run_banner_summary(
+        compile_banner(spec), engine, _new_summary, _record, experiments, seed, workers, cache=cache or None
+    )
+    return summary_output(summary, spec.target)
+
+
+def _exact(spec):
+    from gachasim.kernel import compile_banner, solve_banner
+
+    result = solve_banner(compile_banner(spec))
+    copies = [
+        solve_banner(compile_banner(spec._replace(target=k))).pulls_pmf if k < spec.target else result.pulls_pmf
+        for k in range(1, spec.target + 1)
+    ]
+    return {
+        "pulls": _pmf_stats(result.pulls_pmf),
+        "first_rate_up": _pmf_stats(result.first_on_rate_pmf),
+        "copies": [dict(copies=k, **_pmf_stats(pmf)) for k, pmf in enumerate(copies, 1)],
+    }
+
+
+def banner_fields(job):
+    """BannerSpec overrides of a job: its "set" object plus its target."""
+    fields = dict(job.get("set") or {})
+    if job.get("target") is not None:
+        fields["target"] = job["target"]
+    return fields
+
+
+def job_spec(game, fields):
+    """The script's BANNER with `fields` overridden."""
+    spec = _script(game).BANNER
+    unknown = set(fields) - set(spec._fields)
+    if unknown:
+        raise ValueError(f"unknown BannerSpec fields {sorted(unknown)}")
+    return spec._replace(**fields)
+
+
+def resolve_job(job):
+    """Output header of a job: every unset key takes the script's constant.
+
+    An exact job has no experiments, seed or workers.
+    """
+    check_job(job)
+    script = _script(job["game"])
+    spec = job_spec(job["game"], banner_fields(job))
+    engine = job.get("engine") or script.ENGINE
+    header = {"game": job["game"], "engine": engine, "target": spec.target, "set": job.get("set") or {}}
+    if engine == "exact":
+        return dict(header, experiments=None, seed=None, workers=None)
+    return dict(
+        header,
+        experiments=job["experiments"] if job.get("experiments") is not None else script.EXPERIMENTS,
+        seed=job["seed"] if job.get("seed") is not None else script.SEED,
+        workers=job["workers"] if job.get("workers") is not None else script.WORKERS,
+    )
+
+
+def run_job(job, cache=True):
+    """Output dict of one job; unset keys take the script's constants."""
+    header = resolve_job(job)
+    spec = job_spec(job["game"], banner_fields(job))
+    if header["engine"] == "exact":
+        return dict(header, **_exact(spec))
+    return dict(header, **_simulated(
+        spec, header["engine"], header["experiments"], header["seed"], header["workers"], cache
+    ))
+
+
+# --------------------
+# Output cache
+# --------------------
+def job_key(job):
+    """SHA-256 of the job and the source of its script and of gachasim."""
+    digest = hashlib.sha256(json.dumps(job, sort_keys=True).encode())
+    update_digest(digest, [os.path.join(ROOT, f"{job['game']}-simulator.py")])
+    digest.update(source_key().encode())
+    return digest.hexdigest()
+
+
+def deterministic(header):
+    """Whether a resolved job always gives the same output (exact or seeded)."""
+    return header["engine"] == "exact" or header["seed"] is not None
+
+
+def cache_path(job):
+    return os.path.join(CACHE_DIR, job_key(job) + ".json")
+
+
+def load_output(path):
+    """A cached output, or None."""
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def save_output(path, output):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as file:
+        json.dump(output, file)
+    os.replace(temporary, path)
+
+
+def cached_job(job, cache=True):
+    """run_job() output, from the output cache when the same job ran before."""
+    start = time.perf_counter()
+    check_job(job)
+    path = cache_path(job) if cache else None
+    output = load_output(path) if path else None
+    if output is not None:
+        return dict(output, cached=True, seconds=time.perf_counter() - start)
+    output = run_job(job, cache)
+    if path and deterministic(output):
+        save_output(path, output)
+    return dict(output, cached=False, seconds=time.perf_counter() - start)
+
+
+def read_jobs(path):
+    """Jobs of a JSON-lines file (blank lines and lines starting with # skipped)."""
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip() and not line.lstrip().startswith("#")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m gachasim", description=__doc__.split("\n")[0])
+    parser.add_argument("game", nargs="?", choices=list(SCRIPTS), help="simulator name")
+    parser.add_argument("--target", type=int, help="rate-up copies to pull for (the script's TARGET_*)")
+    parser.add_argument("-n", "--experiments", type=int)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--engine", help='"per-pull", "skip", "batch" or "exact"')
+    parser.add_argument("--workers", type=int)
+    parser.add_argument(
+        "--set", action="append", default=[], metavar="FIELD=VALUE", help="override a BannerSpec field"
+    )
+    parser.add_argument("--jobs", metavar="FILE", help="JSON-lines file of jobs to run in one process")
+    parser.add_argument("--no-cache", action="store_true", help="neither read nor write cached results")
+    args = parser.parse_args(argv)
+
+    if args.jobs:
+        if args.game:
+            parser.error("give either a game or --jobs")
+        for job in read_jobs(args.jobs):
+            try:
+                output = cached_job(job, not args.no_cache)
+            except (ValueError, TypeError, KeyError, OverflowError) as error:
+                output = {"job": job, "error": str(error)}
+            print(json.dumps(output), flush=True)
+        return
+    if not args.game:
+        parser.error("give a game or --jobs")
+    try:
+        overrides = dict(parse_override(text) for text in args.set)
+    except (ValueError, SyntaxError) as error:
+        parser.error(str(error))
+    job = {key: getattr(args, key) for key in JOB_KEYS[:-1] if getattr(args, key) is not None}
+    if overrides:
+        job["set"] = overrides
+    try:
+        output = cached_job(job, not args.no_cache)
+    except (ValueError, TypeError, KeyError, OverflowError) as error:
+        print(json.dumps({"job": job, "error": str(error)}))
+        sys.exit(1)
+    print(json.dumps(output))
@@ -0,0 +1,312 @@
+"""Exact distribution solvers.
+
+Instead of sampling experiments, these propagate the probability mass of
+every reachable banner state one pull at a time, so the returned PMFs are
+exact (up to float rounding) and need no EXPERIMENTS count. Rules tied to
+a pull number (forced first rate-up, free rate-ups) make the transition
+depend on the pull index, which the forward propagation gets for free:
+solve_timed_banner() simply applies that pull's rules.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+MAX_PULLS = 100_000  # cut-off for runs without a carried guarantee
+TAIL_MASS = 1e-15
+PRUNE_MASS = 1e-18  # drained rate-up counts below this are dropped
+
+ExactResult = namedtuple(
+    "ExactResult", ["pulls_pmf", "first_on_rate_pmf", "lost_first_5050"]
+)
+TimedResult = namedtuple(
+    "TimedResult",
+    ExactResult._fields + (
+        "guarantee_probability", "tickets_at_pulls", "tickets_at_first_rate_up", "tickets_at_guarantee",
+    ),
+)
+TimedResult.__doc__ = """ExactResult of solve_timed_banner(), plus:
+
+guarantee_probability     P(the first_rate_up_at guarantee decides a pull)
+tickets_at_pulls          tickets_at_pulls[n] = E[tickets | target reached on pull n]
+tickets_at_first_rate_up  the same for the first rate-up pull
+tickets_at_guarantee      E[tickets before pull first_rate_up_at | forced pull]
+                          (NaN without a forced pull or tickets)
+
+Ticket arrays are NaN where the matching PMF is 0.
+"""
+
+
+# --------------------
+# Character banners (hoyo / wuwa rules)
+# --------------------
+def solve_character_banner(
+    table, target, rate_up_chance=0.5, carry_guarantee=True, first_hit_fresh=True
+):
+    """Exact distributions for the hoyo/wuwa character banner and its kin.
+
+    `table` is the module's compiled five_star_chance() curve. The state is
+    (on_rate_count, guarantee_on_rate, first_5star_obtained, pity), the
+    same variables run_experiment() keeps, and every rule is mirrored:
+    hard pity does not mark the first 5★ as obtained, and the first
+    normal 5★ is always a fresh 50/50. The first on-rate pull is the pull
+    on which on_rate_count goes 0 -> 1. Without `first_hit_fresh` every
+    5★ follows the guarantee (weapon banners), and without
+    `carry_guarantee` a lost 50/50 guarantees nothing.
+
+    Returns an ExactResult with the PMF of total pulls, the PMF of the
+    first on-rate pull (both indexed by pull number) and the probability
+    that the first normal 5★ is off-banner (Experiment.lost_first).
+    """
+    hard_pity = table.hard_pity
+    rates = table.hazard[1:hard_pity]
+
+    # mass[count, guarantee, first_obtained, pity]
+    mass = np.zeros((target, 2, 2, hard_pity))
+    mass[0, 0, 0, 0] = 1.0
+    lost = 1 if carry_guarantee else 0  # guarantee after a lost 50/50
+
+    # A carried guarantee bounds the run at 2 * target hits; without one
+    # the tail is geometric and is cut once its mass is negligible
+    bounded = carry_guarantee or rate_up_chance >= 1.0
+    max_pulls = (2 * target + 1) * hard_pity if bounded else MAX_PULLS
+    pulls_pmf = np.zeros(max_pulls + 1)
+    first_pmf = np.zeros(max_pulls + 1)
+    lost_first_5050 = 0.0
+    win, lose = rate_up_chance, 1.0 - rate_up_chance
+
+    for pull in range(1, max_pulls + 1):
+        moving = mass[..., :-1]
+        normal_hits = moving * rates
+        hard_hits = mass[..., -1]
+
+        new_mass = np.zeros_like(mass)
+        new_mass[..., 1:] = moving - normal_hits
+        normal_hits = normal_hits.sum(axis=-1)
+
+        # on_rate[count] collects mass that gains an on-rate this pull
+        on_rate = np.zeros(target)
+        reset = new_mass[..., 0]
+
+        # First normal 5★: fresh 50/50, guarantee ignored on a win (or,
+        # without first_hit_fresh, a 50/50 unless guaranteed)
+        for g in (0, 1):
+            hits = normal_hits[:, g, 0]
+            if g and not first_hit_fresh:
+                on_rate += hits
+                reset[1:, 0, 1] += hits[:-1]
+                continue
+            lost_first_5050 += hits.sum() * lose
+            reset[:, lost, 1] += hits * lose
+            on_rate += hits * win
+            reset[1:, g, 1] += hits[:-1] * win
+
+        # Later normal 5★s and every hard pity 5★ follow the guarantee
+        for f in (0, 1):
+            hits = hard_hits[:, :, f]
+            if f == 1:
+                hits = hits + normal_hits[:, :, 1]
+            on_rate += hits[:, 1] + hits[:, 0] * win
+            reset[:, lost, f] += hits[:, 0] * lose
+            reset[1:, 0, f] += hits[:-1, 1] + hits[:-1, 0] * win
+
+        pulls_pmf[pull] = on_rate[-1]
+        first_pmf[pull] = on_rate[0]
+        mass = new_mass
+        if not mass.any() or (not bounded and mass.sum() < TAIL_MASS):
+            break
+
+    return ExactResult(_trim(pulls_pmf), _trim(first_pmf), lost_first_5050)
+
+
+# --------------------
+# Banners with pull-indexed rules (endfield and arknights character)
+# --------------------
+def solve_timed_banner(
+    table, target, rate_up_chance=0.5, first_rate_up_at=None, first_rate_up_forced=True,
+    free_rate_up_every=None, hard_pity_first=True, income=None, secondary=None,
+):
+    """Exact distributions for banners whose rules depend on the pull number.
+
+    Mirrors run_experiment() for banners without a carried guarantee: a
+    rate-up from pull `first_rate_up_at` (forced while none was won, or
+    without `first_rate_up_forced` the first hit from then on), a free
+    rate-up every `free_rate_up_every` pulls, hard pity before or after
+    them, and TicketIncome `income` with its compiled `secondary`
+    PityTable. The state is (rate_up_count, rolled_before, pity,
+    secondary_pity); next to its probability mass the solver carries the
+    first moment of the tickets held, so expected tickets come out per
+    pull count without adding tickets to the state. Whether a next-hit
+    guarantee is still open needs no state either: on pull t it is for
+    exactly the pities of at least t - first_rate_up_at.
+
+    Only live state is propagated. Counts open up as mass arrives, and
+    the lowest count, which only drains, is dropped once it holds less
+    than PRUNE_MASS; so is the rolled_before=False layer once it does.
+    The ticket snapshot for the forced pull only exists while count 0
+    does. Propagation stops once the mass still running is below
+    TAIL_MASS.
+
+    Returns a TimedResult.
+    """
+    hard_pity = table.hard_pity
+    rates = table.hazard[1:hard_pity, None]
+    levels = secondary.hard_pity if income else 1
+    secondary_rates = secondary.hazard[1:] if income else None
+    forced_first = first_rate_up_at is not None and first_rate_up_forced
+    next_hit = first_rate_up_at is not None and not first_rate_up_forced
+    win, lose = rate_up_chance, 1.0 - rate_up_chance
+
+    # state[moment, count, rolled_before, pity, secondary_pity]; moment 0 is
+    # the mass, 1 the tickets held and 2 (from a forced pull's) the
+    # tickets before that pull. Once its False layer is dropped,
+    # rolled_before has the True layer only.
+    state = np.zeros((2, target, 2, hard_pity, levels))
+    state[0, 0, 0, 0, 0] = 1.0
+
+    pulls_pmf = np.zeros(MAX_PULLS + 1)
+    first_pmf = np.zeros(MAX_PULLS + 1)
+    pulls_tickets = np.zeros(MAX_PULLS + 1)
+    first_tickets = np.zeros(MAX_PULLS + 1)
+    lost_first_5050 = guarantee = guarantee_tickets = 0.0
+
+    low, high = 0, 1  # window of counts holding mass
+    for pull in range(1, MAX_PULLS + 1):
+        if forced_first and income and pull == first_rate_up_at and low == 0:
+            state = np.concatenate([state, state[1:]])
+        free = bool(free_rate_up_every) and pull % free_rate_up_every == 0
+        # forced only applies to count 0, the first row of the window if live
+        forcing = forced_first and pull >= first_rate_up_at and low == 0
+        # the next-hit guarantee is open for pities from `opened` on
+        opened = pull - first_rate_up_at if next_hit and pull >= first_rate_up_at else hard_pity
+
+        live = state[:, low:high]
+        new_state = np.zeros_like(state)
+        hits = np.zeros(live.shape[:3])  # unrolled top-rarity hits [moment, count, rolled_before]
+        rolled = np.zeros(live.shape[:3])
+        sure = np.zeros(live.shape[:3])  # hits the next-hit guarantee makes rate-ups
+        frees = np.zeros(live.shape[:3])
+        forced = np.zeros(live.shape[:1] + live.shape[2:3])
+
+        # --- Hard pity ---
+        hard = live[:, :, :, -1].sum(axis=-1)
+        if hard_pity_first or not (free or forcing):
+            if opened < hard_pity:
+                sure += hard
+            else:
+                hits += hard
+        elif free:
+            frees += hard
+        else:
+            forced += hard[:, 0]
+            hits[:, 1:] += hard[:, 1:]
+
+        # --- Free or forced rate-ups, else the roll ---
+        soft = live[:, :, :, :-1]
+        if free:
+            frees += soft.sum(axis=(-2, -1))
+        else:
+            skip = 0
+            if forcing:
+                forced += soft[:, 0].sum(axis=(-2, -1))
+                skip = 1
+            rolling = soft[:, skip:]
+            hit = rolling * rates
+            rolled[:, skip:] += hit[..., :opened, :].sum(axis=(-2, -1))
+            sure[:, skip:, -1] += hit[..., opened:, :].sum(axis=(-3, -2, -1))
+            miss = rolling - hit
+            rows = slice(low + skip, high)
+            if income:
+                secondary_hit = miss * secondary_rates
+                common = (miss - secondary_hit)[..., :-1]  # the last level always hits
+                new_state[:, rows, :, 1:, 0] = secondary_hit.sum(axis=-1)
+                new_state[:, rows, :, 1:, 1:] = common
+                new_state[1, rows, :, 1:, 0] += income.secondary * secondary_hit[0].sum(axis=-1)
+                new_state[1, rows, :, 1:, 1:] += income.common * common[0]
+            else:
+                new_state[:, rows, :, 1:, 0] = miss[..., 0]
+
+        if income:
+            hits[1] += income.top * hits[0]
+            rolled[1] += income.top * rolled[0]
+            sure[1] += income.top * sure[0]
+            forced[1] += income.top * forced[0]
+
+        # --- Rate-up or off-banner; every event resets both pities ---
+        if state.shape[2] == 2:
+            lost_first_5050 += rolled[0, :, 0].sum() * lose
+        hits[:, :, -1] += rolled.sum(axis=2)
+        new_state[:, low:high, :, 0, 0] += hits * lose
+        gained = hits * win + sure + frees
+        gained[:, 0] += forced
+        if high == target:
+            pulls_pmf[pull] = gained[0, -1].sum()
+            pulls_tickets[pull] = gained[1, -1].sum()
+            gained = gained[:, :-1]
+        new_state[:, low + 1 : low + 1 + gained.shape[1], :, 0, 0] += gained
+        if low == 0:
+            first_pmf[pull] = gained[0, 0].sum() if gained.shape[1] else pulls_pmf[pull]
+            first_tickets[pull] = gained[1, 0].sum() if gained.shape[1] else pulls_tickets[pull]
+        guarantee += forced[0].sum() + sure[0].sum()
+        if len(forced) == 3:
+            guarantee_tickets += forced[2].sum()
+
+        state = new_state
+        if high < target and state[0, high].any():
+            high += 1
+        while low < high - 1 and state[0, low].sum() < PRUNE_MASS:
+            state[:, low] = 0.0
+            low += 1
+        if low and len(state) == 3:
+            state = state[:2]
+        if state.shape[2] == 2 and state[0, :, 0].sum() < PRUNE_MASS:
+            state = state[:, :, 1:].copy()
+        if state[0].sum() < TAIL_MASS:
+            break
+
+    pulls_pmf, first_pmf = _trim(pulls_pmf), _trim(first_pmf)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        tickets_at_pulls = pulls_tickets[: len(pulls_pmf)] / pulls_pmf
+        tickets_at_first = first_tickets[: len(first_pmf)] / first_pmf
+    return TimedResult(
+        pulls_pmf, first_pmf, lost_first_5050, guarantee,
+        tickets_at_pulls, tickets_at_first,
+        guarantee_tickets / guarantee if guarantee else float("nan"),
+    )
+
+
+# --------------------
+# PMF statistics
+# --------------------
+def _trim(pmf):
+    nonzero = np.flatnonzero(pmf)
+    return pmf[: nonzero[-1] + 1] if len(nonzero) else pmf[:1]
+
+
+def pmf_min(pmf):
+    """Smallest pull count with non-zero probability."""
+    return int(np.flatnonzero(pmf)[0])
+
+
+def pmf_max(pmf):
+    """Largest pull count with non-zero probability."""
+    return int(np.flatnonzero(pmf)[-1])
+
+
+def pmf_mean(pmf):
+    return float(np.dot(np.arange(len(pmf)), pmf) / pmf.sum())
+
+
+def pmf_percentile(pmf, q):
+    """Smallest pull count whose CDF reaches q percent."""
+    cdf = np.cumsum(pmf) / pmf.sum()
+    return int(np.searchsorted(cdf, q / 100.0 - 1e-12))
+
+
+def pmf_quantile(pmf, q):
+    """Pull count where the CDF, linear between pull counts, reaches q percent.
+
+    Unlike pmf_percentile() it moves continuously with the PMF, so small
+    parameter changes show up in it.
+    """
+    cdf = np.cumsum(pmf) / pmf.sum()
+    return float(np.interp(q / 100.0, cdf, np.arange(len(cdf))))
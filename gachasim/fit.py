@@ -0,0 +1,234 @@
+"""Fit a top-rarity pity curve from real pull logs.
+
+    python -m gachasim.fit pulls.csv -o wuwa.curve.json
+    python -m gachasim.fit logs/*.npy -o wuwa.curve.json --compare wuwa-character
+    python -m gachasim.fit export.csv --hit-column rarity --rarity 5 -o curve.json
+
+Every record is one pull: its pity (pulls since the last top-rarity hit,
+counting this one, as the engines count it) and whether it was a
+top-rarity hit. The hazard at pity p is hits / trials over the pulls made
+at pity p, which only needs two counts per pity, so the logs are reduced
+chunk by chunk in parallel and memory is bounded by the chunk size, not
+the log size.
+
+Inputs are CSV files with a header row (integer columns, by default
+`pity` and `hit`) or .npy files, memory-mapped: a structured array with
+those fields, or a two-column integer array of (pity, hit). The output
+is JSON with the curve in pity_curve() form plus the counts and Wilson
+confidence bands; gachasim.spec.load_curve() reads it back for a
+BannerSpec.
+"""
+import argparse
+import io
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from gachasim.bench import load_script
+from gachasim.spec import CURVE_VERSION
+from gachasim.stats import z_score
+
+CHUNK_BYTES = 32 * 2**20  # CSV bytes parsed at a time by one worker
+CHUNK_ROWS = 4 * 2**20  # .npy rows reduced at a time by one worker
+CONFIDENCE = 0.95
+
+
+# --------------------
+# Chunk reduction
+# --------------------
+def _counts(pity, hit):
+    """(trials, hits) indexed by pity."""
+    pity = np.asarray(pity, dtype=np.int64)
+    trials = np.bincount(pity)
+    return trials, np.bincount(pity[np.asarray(hit, dtype=bool)], minlength=len(trials))
+
+
+def _add(total, counts):
+    trials, hits = counts
+    size = max(len(total[0]), len(trials))
+    return tuple(
+        np.pad(a, (0, size - len(a))) + np.pad(b, (0, size - len(b)))
+        for a, b in zip(total, (trials, hits))
+    )
+
+
+def _csv_chunk(path, start, end, columns, rarity):
+    """Counts of the lines that start within bytes [start, end)."""
+    with open(path, "rb") as file:
+        file.seek(max(start - 1, 0))
+        if start and file.read(1) != b"\n":
+            file.readline()  # the partial line belongs to the previous chunk
+        data = file.read(max(end - file.tell(), 0))
+        if data and not data.endswith(b"\n"):
+            data += file.readline()
+    if not data.strip():
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    records = np.loadtxt(io.BytesIO(data), delimiter=",", usecols=columns, dtype=np.int64, ndmin=2)
+    hit = records[:, 1] >= rarity if rarity is not None else records[:, 1]
+    return _counts(records[:, 0], hit)
+
+
+def _npy_chunk(path, start, end, columns, rarity):
+    records = np.load(path, mmap_mode="r")[start:end]
+    if records.dtype.names:
+        pity, hit = records[columns[0]], records[columns[1]]
+    else:
+        pity, hit = records[:, 0], records[:, 1]
+    return _counts(pity, hit >= rarity if rarity is not None else hit)
+
+
+def _csv_tasks(path, names):
+    with open(path, "rb") as file:
+        header = file.readline()
+    fields = [field.strip() for field in header.decode().split(",")]
+    try:
+        columns = tuple(fields.index(name) for name in names)
+    except ValueError:
+        raise ValueError(f"{path} has columns {fields}, expected {list(names)}") from None
+    size = os.path.getsize(path)
+    return [
+        (_csv_chunk, path, start, min(start + CHUNK_BYTES, size), columns)
+        for start in range(len(header), size, CHUNK_BYTES)
+    ]
+
+
+def _npy_tasks(path, names):
+    rows = len(np.load(path, mmap_mode="r"))
+    return [
+        (_npy_chunk, path, start, min(start + CHUNK_ROWS, rows), names)
+        for start in range(0, rows, CHUNK_ROWS)
+    ]
+
+
+def _run_task(rarity, task):
+    reduce, *arguments = task
+    return reduce(*arguments, rarity)
+
+
+def count_pulls(paths, pity_column="pity", hit_column="hit", rarity=None, workers=None):
+    """(trials, hits) by pity over every record of `paths`.
+
+    With `rarity`, the hit column holds a rarity and a hit is any value of
+    at least `rarity`. Chunks are reduced on `workers` processes (one per
+    CPU core by default; in-process with one).
+    """
+    names = (pity_column, hit_column)
+    tasks = [
+        task
+        for path in paths
+        for task in (_npy_tasks(path, names) if path.endswith(".npy") else _csv_tasks(path, names))
+    ]
+    workers = workers or os.cpu_count() or 1
+    reduce = partial(_run_task, rarity)
+    total = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+    if workers == 1 or len(tasks) <= 1:
+        for task in tasks:
+            total = _add(total, reduce(task))
+        return total
+    with ProcessPoolExecutor(min(workers, len(tasks))) as pool:
+        for counts in pool.map(reduce, tasks):
+            total = _add(total, counts)
+    return total
+
+
+# --------------------
+# Curve estimate
+# --------------------
+def wilson_interval(hits, trials, confidence=CONFIDENCE):
+    """Wilson score bounds of hits / trials, elementwise (0..1 without trials)."""
+    hits = np.asarray(hits, dtype=float)
+    trials = np.asarray(trials, dtype=float)
+    z2 = z_score(confidence) ** 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rate = np.where(trials > 0, hits / trials, 0.0)
+        center = (hits + z2 / 2) / (trials + z2)
+        half = np.sqrt(z2) * np.sqrt(rate * (1 - rate) * trials + z2 / 4) / (trials + z2)
+    lower = np.where(trials > 0, np.maximum(center - half, 0.0), 0.0)
+    upper = np.where(trials > 0, np.minimum(center + half, 1.0), 1.0)
+    return lower, upper
+
+
+def fit_curve(trials, hits, confidence=CONFIDENCE, hard_pity=None):
+    """Curve description (a dict, as written by save_curve()).
+
+    The hard pity is the largest pity observed unless given. Pities
+    without trials take the estimate interpolated between their observed
+    neighbours; past the last observed pity the last estimate is kept.
+    """
+    observed = np.flatnonzero(trials)
+    if not len(observed) or observed[-1] < 1:
+        raise ValueError("no pulls with a pity of at least 1")
+    records = int(np.sum(trials))
+    hard_pity = hard_pity or int(observed[-1])
+    size = hard_pity + 1
+    trials = np.pad(trials, (0, max(size - len(trials), 0)))[:size]
+    hits = np.pad(hits, (0, max(size - len(hits), 0)))[:size]
+    observed = np.flatnonzero(trials[1:]) + 1
+    hazard = np.interp(np.arange(size), observed, hits[observed] / trials[observed])
+    lower, upper = wilson_interval(hits, trials, confidence)
+    curve = [0.0, *(float(rate) for rate in hazard[1:hard_pity]), 1.0]
+    return {
+        "version": CURVE_VERSION,
+        "hard_pity": hard_pity,
+        "confidence": confidence,
+        "records": records,
+        "curve": curve,
+        "lower": [float(value) for value in lower],
+        "upper": [float(value) for value in upper],
+        "trials": [int(value) for value in trials],
+        "hits": [int(value) for value in hits],
+    }
+
+
+def save_curve(path, fitted):
+    with open(path, "w") as file:
+        json.dump(fitted, file, indent=1)
+
+
+def compare_lines(fitted, curve):
+    """Printable table of the fit against a script's curve.
+
+    Pities where the script's chance is outside the confidence band are
+    marked with "*".
+    """
+    lines = [f"{'pity':>4} {'trials':>10} {'fitted':>8} {'lower':>8} {'upper':>8} {'script':>8}"]
+    for pity in range(1, max(len(fitted["curve"]), len(curve))):
+        trials = fitted["trials"][pity] if pity < len(fitted["trials"]) else 0
+        rate = fitted["curve"][pity] if pity < len(fitted["curve"]) else math.nan
+        lower = fitted["lower"][pity] if pity < len(fitted["lower"]) else 0.0
+        upper = fitted["upper"][pity] if pity < len(fitted["upper"]) else 1.0
+        script = curve[pity] if pity < len(curve) else math.nan
+        flag = " *" if trials and not lower <= script <= upper else ""
+        lines.append(f"{pity:>4} {trials:>10} {rate:>8.4f} {lower:>8.4f} {upper:>8.4f} {script:>8.4f}{flag}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m gachasim.fit", description=__doc__.split("\n")[0])
+    parser.add_argument("logs", nargs="+", help="CSV or .npy pull logs")
+    parser.add_argument("-o", "--output", help="fitted curve file (JSON)")
+    parser.add_argument("--pity-column", default="pity")
+    parser.add_argument("--hit-column", default="hit")
+    parser.add_argument("--rarity", type=int, help="the hit column is a rarity; hits are at least this")
+    parser.add_argument("--hard-pity", type=int, help="default: the largest pity in the logs")
+    parser.add_argument("--confidence", type=float, default=CONFIDENCE)
+    parser.add_argument("--compare", metavar="SCRIPT", help="print the fit against a simulator's curve")
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args(argv)
+
+    trials, hits = count_pulls(args.logs, args.pity_column, args.hit_column, args.rarity, args.workers)
+    fitted = fit_curve(trials, hits, args.confidence, args.hard_pity)
+    print(f"Pulls: {fitted['records']}, top-rarity hits: {sum(fitted['hits'])}, hard pity: {fitted['hard_pity']}")
+    if args.compare:
+        print("\n".join(compare_lines(fitted, load_script(args.compare).BANNER.curve)))
+    if args.output:
+        save_curve(args.output, fitted)
+        print(f"Saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Pity hazard tables.
+
+A banner's rate curve is compiled once into a table indexed by pity (the
+pull count since the last top-rarity hit, 1-based). Per-pull loops index
+`rates`, vectorized engines index `hazard`, and exact solvers and
+skip-ahead samplers use the derived survival function and distribution
+of pulls to the next hit.
+"""
+from bisect import bisect_right
+from collections import namedtuple
+
+import numpy as np
+
+from gachasim.spec import certain_pity
+
+PityTable = namedtuple(
+    "PityTable",
+    ["hard_pity", "rates", "hazard", "survival", "gap_pmf", "gap_cdf", "cdf"],
+)
+PityTable.__doc__ = """Rate curve compiled by compile_curve().
+
+hard_pity  pity at which a hit is forced
+rates      tuple of hit chances indexed by pity (index 0 unused)
+hazard     the same chances as a float array
+survival   survival[p] = P(no hit in the first p pulls)
+gap_pmf    gap_pmf[k] = P(next hit is exactly k pulls away)
+gap_cdf    cumulative gap_pmf, ending at exactly 1.0
+cdf        gap_cdf as a tuple, for bisect in per-pull loops
+"""
+
+
+def compile_curve(chance, hard_pity=None):
+    """Compile `chance(pity)` into a PityTable.
+
+    The chance is forced to 1.0 at `hard_pity`. Without one, the table
+    ends at the first pity whose chance reaches 1.0.
+    """
+    if hard_pity is None:
+        hard_pity = certain_pity(chance)
+
+    hazard = np.zeros(hard_pity + 1)
+    hazard[1:hard_pity] = [chance(pity) for pity in range(1, hard_pity)]
+    hazard[hard_pity] = 1.0
+    np.clip(hazard, 0.0, 1.0, out=hazard)
+
+    survival = np.cumprod(1.0 - hazard)
+    gap_pmf = np.zeros_like(hazard)
+    gap_pmf[1:] = survival[:-1] * hazard[1:]
+    gap_cdf = 1.0 - survival
+    return PityTable(
+        hard_pity,
+        tuple(hazard.tolist()),
+        hazard,
+        survival,
+        gap_pmf,
+        gap_cdf,
+        tuple(gap_cdf.tolist()),
+    )
+
+
+def draw_gap(table, u, pity=0):
+    """Pulls until the next hit, drawn by inverse CDF from one uniform `u`.
+
+    `pity` is the number of hitless pulls already made; the draw is
+    conditioned on them. A result equal to `table.hard_pity - pity` is
+    the forced hard pity hit.
+    """
+    if pity:
+        start = table.cdf[pity]
+        u = start + u * (1.0 - start)
+    return bisect_right(table.cdf, u) - pity
@@ -0,0 +1,100 @@
+"""Build budget query indexes for gachasim.query.
+
+    python -m gachasim.index hoyo-character arknights-character endfield-weapon
+    python -m gachasim.index genshin-weapon -o indexes -n 2000000 --seed 1
+
+For every banner, the table P(at least k rate-ups within B pulls) is
+built for k = 1..target and every budget B until all k are certain.
+Banners the exact solver covers get exact tables (one solve per copy
+count); the others are simulated with the batch engine and the table
+ends at the largest pull count observed.
+"""
+import argparse
+import os
+
+import numpy as np
+
+from gachasim.bench import load_script
+from gachasim.kernel import compile_banner, run_banner_summary, solve_banner
+from gachasim.query import HEADER, MAGIC, SUFFIX, VERSION
+from gachasim.stats import JointHistogram
+
+EXPERIMENTS = 1_000_000
+
+
+def _new_summary():
+    return {"copy_pulls": JointHistogram()}
+
+
+def _record(summary, columns):
+    copies = np.broadcast_to(np.arange(1, columns.copy_pulls.shape[1] + 1), columns.copy_pulls.shape)
+    summary["copy_pulls"].add_many(copies.ravel(), columns.copy_pulls.ravel())
+
+
+def exact_table(spec):
+    """(budgets, copies) CDF from one exact solve per copy count.
+
+    Raises ValueError when the exact solver does not cover the banner.
+    """
+    pmfs = [solve_banner(compile_banner(spec._replace(target=copies))).pulls_pmf
+            for copies in range(1, spec.target + 1)]
+    table = np.zeros((max(len(pmf) for pmf in pmfs), spec.target))
+    for column, pmf in enumerate(pmfs):
+        table[: len(pmf), column] = np.cumsum(pmf)
+        table[len(pmf):, column] = table[len(pmf) - 1, column]
+    return table
+
+
+def simulated_table(spec, experiments=EXPERIMENTS, seed=None, workers=None):
+    """(budgets, copies) empirical CDF from a batch run."""
+    summary = run_banner_summary(
+        compile_banner(spec), "batch", _new_summary, _record, experiments, seed, workers
+    )
+    bins = summary["copy_pulls"].bins[1 : spec.target + 1]
+    budgets = np.flatnonzero(bins.any(axis=0))[-1] + 1
+    return np.cumsum(bins[:, :budgets], axis=1).T / experiments
+
+
+def build_table(spec, experiments=EXPERIMENTS, seed=None, workers=None):
+    """(table, experiments) with experiments 0 for an exact table."""
+    try:
+        return exact_table(spec), 0
+    except ValueError:
+        return simulated_table(spec, experiments, seed, workers), experiments
+
+
+def write_index(path, name, table, experiments):
+    """Write `table` [budget, copies] as a memory-mappable index file."""
+    table = np.ascontiguousarray(table, dtype="<f8")
+    budgets, copies = table.shape
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, budgets, copies, 0, experiments, name.encode()))
+        table.tofile(file)
+
+
+def build(name, directory, experiments=EXPERIMENTS, seed=None, workers=None):
+    """Build `<directory>/<name>.cdf` from a script's BANNER; returns the path."""
+    spec = load_script(name).BANNER
+    table, used = build_table(spec, experiments, seed, workers)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name + SUFFIX)
+    write_index(path, name, table, used)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m gachasim.index", description=__doc__.split("\n")[0]
+    )
+    parser.add_argument("scripts", nargs="+", help="simulator names, e.g. hoyo-character")
+    parser.add_argument("-o", "--output", default="indexes", help="directory for the index files")
+    parser.add_argument("-n", "--experiments", type=int, default=EXPERIMENTS)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args(argv)
+    for name in args.scripts:
+        print(f"Saved {build(name, args.output, args.experiments, args.seed, args.workers)}")
+
+
+if __name__ == "__main__":
+    main()
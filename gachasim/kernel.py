@@ -0,0 +1,803 @@
+"""One implementation of every engine, driven by a BannerSpec.
+
+compile_banner() turns a spec into a CompiledBanner (the spec plus its
+hazard tables). The per-pull loop below is the reference semantics; the
+skip-ahead sampler, the vectorized batch engine (gachasim.batch) and the
+exact solver (gachasim.exact) reproduce it. Rule precedence on a pull:
+
+    hard pity (if hard_pity_first), free rate-up, forced first rate-up,
+    hard pity, then the roll; bonus rate-ups are added after the pull.
+
+Engines are module-level functions of the compiled banner, so they can
+be handed to worker processes. Given `tolerances`, run_banner() and
+run_banner_summary() simulate in rounds until the confidence intervals
+of the total pulls are that narrow; given a `cache`, they reuse the
+result of an identical seeded run (gachasim.cache). Given a `store`,
+both write the results into a memory-mapped result store
+(gachasim.store) as they finish, and run_banner() returns its columns;
+given a `trace`, both run the per-pull loop and record every pull into a trace
+directory (gachasim.trace). Given `metrics`, they count rule firings and
+time the run's phases into a JSON file (gachasim.metrics).
+"""
+import math
+import os
+import random
+from collections import namedtuple
+from functools import partial
+
+import numpy as np
+
+from gachasim.batch import run_banner_batch
+from gachasim.cache import cached, function_key
+from gachasim.exact import solve_character_banner, solve_timed_banner
+from gachasim.hazard import compile_curve, draw_gap
+from gachasim.metrics import Metrics, save_metrics
+from gachasim.runner import run_batches, run_experiments, run_sharded
+from gachasim.sources import source_key
+from gachasim.spec import Experiment
+from gachasim.stats import IntHistogram, JointHistogram, merge_summaries
+from gachasim.store import StoreWriter, create_store, finish_store, open_store
+from gachasim.trace import (
+    BONUS, CARRIED, CERTAIN, FORCED, FREE, FRESH, HARD_PITY, NEXT_HIT, RATE_UP, ROLL,
+    RULE_SHIFT, SECONDARY, TOP, TraceWriter, create_trace, finish_trace, record_event,
+)
+
+ENGINES = ("per-pull", "skip", "batch", "exact")
+ALIASES = {"monte-carlo": "per-pull"}
+BLOCK_SIZE = 4096  # per-pull experiments recorded into a summary at a time
+COPY_PERCENTILES = (5, 25, 50, 75, 95)
+CONFIDENCE = 0.95
+MAX_EXPERIMENTS = 10_000_000  # convergence runs stop here even if not converged
+
+CompiledBanner = namedtuple("CompiledBanner", ["spec", "table", "secondary", "bonus"])
+CompiledBanner.__doc__ = """BannerSpec with its compiled PityTables.
+
+table      top-rarity PityTable
+secondary  secondary-rarity PityTable (None without tickets)
+bonus      sorted bonus rate-up pulls
+"""
+
+
+def _compile(curve):
+    return compile_curve(curve.__getitem__, len(curve) - 1)
+
+
+def compile_banner(spec):
+    """Compile a BannerSpec once; every engine takes the result."""
+    secondary = _compile(spec.tickets.secondary_curve) if spec.tickets else None
+    return CompiledBanner(spec, _compile(spec.curve), secondary, tuple(sorted(spec.bonus_rate_ups)))
+
+
+# --------------------
+# Per-pull reference loop
+# --------------------
+def run_experiment(banner, rng=random, trace=None, metrics=None):
+    """One experiment, pull by pull; returns an Experiment.
+
+    With a `trace` bytearray, the pulls where something happened are
+    recorded into it as gachasim.trace codes. With `metrics`, top-rarity
+    pulls are counted into its hits by code and pity.
+    """
+    spec = banner.spec
+    rates = banner.table.rates
+    hard_pity = banner.table.hard_pity
+    target = spec.target
+    chance = spec.rate_up_chance
+    carry = spec.carry_guarantee
+    fresh = spec.first_hit_fresh
+    first_at = spec.first_rate_up_at
+    forced_first = first_at is not None and spec.first_rate_up_forced
+    next_hit_guarantee = first_at is not None and not spec.first_rate_up_forced
+    free_every = spec.free_rate_up_every
+    hard_first = spec.hard_pity_first
+    bonus = banner.bonus
+    income = spec.tickets
+    secondary_rates = banner.secondary.rates if income else None
+    counts = metrics.hits if metrics is not None else None
+
+    pulls = 0
+    pity = 0
+    secondary_pity = 0
+    rate_up_count = 0
+    guarantee = False
+    first_guarantee_open = True
+    rolled_before = False
+    next_bonus = 0
+    tickets = 0
+    copy_pulls = []
+    result = dict.fromkeys(Experiment._fields, 0)
+
+    while rate_up_count < target:
+        pulls += 1
+        pity += 1
+        if income:
+            secondary_pity += 1
+            if pulls == first_at:
+                result["tickets_at_guarantee"] = tickets
+
+        # --- Which rule takes this pull ---
+        hard = pity >= hard_pity
+        rolled = False
+        if hard and hard_first:
+            event = "hit"
+        elif free_every and pulls % free_every == 0:
+            event = "free"
+        elif forced_first and not rate_up_count and pulls >= first_at:
+            event = "forced"
+        elif hard:
+            event = "hit"
+        else:
+            roll = rng.random()
+            rate = rates[pity]
+            if roll < rate:
+                event = "hit"
+                rolled = True
+            else:
+                event = None
+                if income:
+                    if roll < rate + secondary_rates[secondary_pity] * (1.0 - rate):
+                        tickets += income.secondary
+                        secondary_pity = 0
+                        if trace is not None:
+                            record_event(trace, pulls, SECONDARY)
+                    else:
+                        tickets += income.common
+
+        if event is not None:
+            if event == "free":
+                won = True
+                rule = FREE
+            elif event == "forced":
+                tickets += income.top if income else 0
+                result["hit_guarantee"] = True
+                won = True
+                rule = FORCED
+            else:
+                tickets += income.top if income else 0
+                # --- Rate-up or off-banner ---
+                if fresh and rolled and not rolled_before:
+                    won = rng.random() < chance  # a win keeps the carried guarantee
+                    guarantee = guarantee or (carry and not won)
+                    rule = FRESH
+                elif next_hit_guarantee and first_guarantee_open and pulls >= first_at:
+                    won = True
+                    first_guarantee_open = False
+                    rule = NEXT_HIT
+                elif guarantee:
+                    won = True
+                    guarantee = False
+                    rule = CARRIED
+                elif chance >= 1.0:
+                    won = True
+                    rule = CERTAIN
+                else:
+                    won = rng.random() < chance
+                    guarantee = carry and not won
+                    rule = ROLL
+                if rolled and not rolled_before:
+                    rolled_before = True
+                    result["lost_first"] = not won
+
+            if won:
+                rate_up_count += 1
+                copy_pulls.append(pulls)
+                if not result["first_rate_up"]:
+                    result["first_rate_up"] = pulls
+                    result["tickets_at_first_rate_up"] = tickets
+            elif not result["first_rate_up"]:
+                result["off_banner"] += 1
+            if trace is not None or counts is not None:
+                code = TOP | rule << RULE_SHIFT | RATE_UP * won | HARD_PITY * (event == "hit" and not rolled)
+                if trace is not None:
+                    record_event(trace, pulls, code)
+                if counts is not None:
+                    counts[code, pity] += 1
+            pity = 0
+            secondary_pity = 0
+
+        # --- Bonus rate-ups on top of this pull, while copies are missing ---
+        while next_bonus < len(bonus) and bonus[next_bonus] == pulls and rate_up_count < target:
+            next_bonus += 1
+            rate_up_count += 1
+            copy_pulls.append(pulls)
+            if trace is not None:
+                record_event(trace, pulls, BONUS)
+            if counts is not None:
+                counts[BONUS, 0] += 1
+
+    result["pulls"] = pulls
+    result["tickets"] = tickets
+    result["copy_pulls"] = tuple(copy_pulls[:target])
+    return Experiment(**result)
+
+
+# --------------------
+# Skip-ahead sampler: jump between top-rarity hits and forced pulls
+# --------------------
+def _secondary_tickets(banner, count, pity, rng):
+    """Tickets from `count` pulls that miss the top rarity; returns (tickets, pity)."""
+    income = banner.spec.tickets
+    hits = 0
+    position = 0
+    while True:
+        gap = draw_gap(banner.secondary, rng.random(), pity)
+        if position + gap > count:
+            break
+        position += gap
+        hits += 1
+        pity = 0
+    tickets = hits * income.secondary + (count - hits) * income.common
+    return tickets, pity + count - position
+
+
+def _fill_tickets(banner, start, end, pity, rng):
+    """Tickets from pulls start+1..end, split at first_rate_up_at.
+
+    Returns (tickets, tickets before pull first_rate_up_at or None, pity).
+    """
+    snapshot = banner.spec.first_rate_up_at
+    if snapshot is not None and start < snapshot <= end + 1:
+        before, pity = _secondary_tickets(banner, snapshot - 1 - start, pity, rng)
+        after, pity = _secondary_tickets(banner, end + 1 - snapshot, pity, rng)
+        return before + after, before, pity
+    tickets, pity = _secondary_tickets(banner, end - start, pity, rng)
+    return tickets, None, pity
+
+
+def run_experiment_skip(banner, rng=random, metrics=None):
+    """run_experiment() that draws the pulls to each top-rarity hit in one step."""
+    spec = banner.spec
+    table = banner.table
+    target = spec.target
+    chance = spec.rate_up_chance
+    carry = spec.carry_guarantee
+    fresh = spec.first_hit_fresh
+    first_at = spec.first_rate_up_at
+    forced_first = first_at is not None and spec.first_rate_up_forced
+    next_hit_guarantee = first_at is not None and not spec.first_rate_up_forced
+    free_every = spec.free_rate_up_every
+    hard_first = spec.hard_pity_first
+    bonus = banner.bonus
+    income = spec.tickets
+    counts = metrics.hits if metrics is not None else None
+
+    pulls = 0
+    secondary_pity = 0
+    rate_up_count = 0
+    guarantee = False
+    first_guarantee_open = True
+    rolled_before = False
+    next_bonus = 0
+    tickets = 0
+    copy_pulls = []
+    result = dict.fromkeys(Experiment._fields, 0)
+
+    while rate_up_count < target:
+        gap = draw_gap(table, rng.random())
+        hit_pull = pulls + gap
+        hard = gap >= table.hard_pity
+
+        # --- Next free / forced first rate-up; hard pity may take its pull ---
+        forced_pull = None
+        if free_every:
+            forced_pull = (pulls // free_every + 1) * free_every
+        if forced_first and not rate_up_count:
+            first_pull = max(pulls + 1, first_at)
+            if forced_pull is None or first_pull < forced_pull:
+                forced_pull = first_pull
+        forced = forced_pull is not None and (
+            forced_pull < hit_pull or (forced_pull == hit_pull and not (hard and hard_first))
+        )
+        stop = forced_pull if forced else hit_pull
+
+        # --- Bonus rate-ups before `stop` ---
+        while next_bonus < len(bonus) and bonus[next_bonus] < stop:
+            rate_up_count += 1
+            copy_pulls.append(bonus[next_bonus])
+            if counts is not None:
+                counts[BONUS, 0] += 1
+            if rate_up_count >= target:
+                end = bonus[next_bonus]
+                if income:
+                    gained, _, secondary_pity = _fill_tickets(banner, pulls, end, secondary_pity, rng)
+                    tickets += gained
+                result["pulls"] = end
+                result["tickets"] = tickets
+                result["copy_pulls"] = tuple(copy_pulls)
+                return Experiment(**result)
+            next_bonus += 1
+
+        # --- Pulls before `stop` only give secondary tickets ---
+        if income:
+            gained, before, secondary_pity = _fill_tickets(banner, pulls, stop - 1, secondary_pity, rng)
+            if before is not None:
+                result["tickets_at_guarantee"] = tickets + before
+            tickets += gained
+        pity = stop - pulls
+        pulls = stop
+        secondary_pity = 0
+
+        rolled = False
+        if forced and free_every and pulls % free_every == 0:
+            won = True
+            rule = FREE
+        elif forced:
+            tickets += income.top if income else 0
+            result["hit_guarantee"] = True
+            won = True
+            rule = FORCED
+        else:
+            tickets += income.top if income else 0
+            rolled = not hard
+            # --- Rate-up or off-banner ---
+            if fresh and rolled and not rolled_before:
+                won = rng.random() < chance  # a win keeps the carried guarantee
+                guarantee = guarantee or (carry and not won)
+                rule = FRESH
+            elif next_hit_guarantee and first_guarantee_open and pulls >= first_at:
+                won = True
+                first_guarantee_open = False
+                rule = NEXT_HIT
+            elif guarantee:
+                won = True
+                guarantee = False
+                rule = CARRIED
+            elif chance >= 1.0:
+                won = True
+                rule = CERTAIN
+            else:
+                won = rng.random() < chance
+                guarantee = carry and not won
+                rule = ROLL
+            if rolled and not rolled_before:
+                rolled_before = True
+                result["lost_first"] = not won
+
+        if won:
+            rate_up_count += 1
+            copy_pulls.append(pulls)
+            if not result["first_rate_up"]:
+                result["first_rate_up"] = pulls
+                result["tickets_at_first_rate_up"] = tickets
+        elif not result["first_rate_up"]:
+            result["off_banner"] += 1
+        if counts is not None:
+            counts[TOP | rule << RULE_SHIFT | RATE_UP * won | HARD_PITY * (not forced and not rolled), pity] += 1
+
+        # --- Bonus rate-ups on the same pull, while copies are missing ---
+        while next_bonus < len(bonus) and bonus[next_bonus] == pulls and rate_up_count < target:
+            next_bonus += 1
+            rate_up_count += 1
+            copy_pulls.append(pulls)
+            if counts is not None:
+                counts[BONUS, 0] += 1
+
+    result["pulls"] = pulls
+    result["tickets"] = tickets
+    result["copy_pulls"] = tuple(copy_pulls[:target])
+    return Experiment(**result)
+
+
+LOOPS = {"per-pull": run_experiment, "skip": run_experiment_skip}
+
+
+# --------------------
+# Sharded runs
+# --------------------
+def normalize_engine(name):
+    """The engine `name` stands for (see ALIASES); ValueError if there is none."""
+    name = ALIASES.get(name, name)
+    if name not in ENGINES:
+        raise ValueError(f"unknown engine {name!r}; expected one of {ENGINES}")
+    return name
+
+
+def columns(experiments, target=0):
+    """Experiment of int64 columns from a list of Experiment results.
+
+    copy_pulls becomes an (experiments, target) array.
+    """
+    if not experiments:
+        empty = [np.zeros(0, dtype=np.int64) for _ in Experiment._fields[:-1]]
+        return Experiment(*empty, np.zeros((0, target), dtype=np.int64))
+    scalars = np.array([experiment[:-1] for experiment in experiments], dtype=np.int64)
+    copy_pulls = np.array([experiment.copy_pulls for experiment in experiments], dtype=np.int64)
+    return Experiment(*scalars.T, copy_pulls)
+
+
+def _run_columns(banner, engine, experiments, seed, workers):
+    if engine == "batch":
+        return Experiment(*run_batches(partial(run_banner_batch, banner), experiments, seed, workers))
+    results = run_experiments(partial(LOOPS[engine], banner), experiments, seed, workers)
+    return columns(results, banner.spec.target)
+
+
+def _cache_parts(kind, banner, engine, experiments, seed, workers, tolerances):
+    tolerances = tuple(sorted(tolerances.items(), key=str)) if tolerances else None
+    return (source_key(), kind, banner.spec, engine, experiments, seed,
+            workers or os.cpu_count() or 1, tolerances)
+
+
+def run_banner(
+    banner, engine, experiments, seed=None, workers=None, tolerances=None, cache=None, store=None,
+    trace=None, metrics=None,
+):
+    """Sharded run of `experiments`; returns an Experiment of result columns.
+
+    With `tolerances`, `experiments` is the first round of a convergence
+    run (see run_converged()). `cache` (a ResultCache, or True for the
+    default one) is used for seeded runs only. With a `store` directory
+    the results go to disk instead (see run_store()). With a `trace`
+    directory, every pull is recorded there and the per-pull loop runs
+    whatever the engine. With a `metrics` path, the run is metered
+    (see run_metered()).
+    """
+    engine = normalize_engine(engine)
+    if engine == "exact":
+        raise ValueError("the exact engine returns distributions; use solve_banner()")
+    if (store or trace or metrics) and tolerances:
+        raise ValueError("stores, traces and metrics need a fixed number of experiments")
+    if sum(map(bool, (store, trace, metrics))) > 1:
+        raise ValueError("a run writes one of a result store, a trace or metrics")
+    if metrics:
+        shards = run_metered(banner, engine, metrics, list, list.append, experiments, seed, workers)
+        blocks = [block for shard in shards for block in shard]
+        return Experiment(*(np.concatenate(column) for column in zip(*blocks)))
+    if store:
+        return run_store(banner, engine, store, experiments, seed, workers)
+    if trace:
+        shards = _run_traced(banner, trace, partial(_trace_shard, banner, trace), experiments, seed, workers)
+        return Experiment(*(np.concatenate(column) for column in zip(*shards)))
+    parts = _cache_parts("columns", banner, engine, experiments, seed, workers, tolerances)
+    run = partial(_run_banner, banner, engine, experiments, seed, workers, tolerances)
+    return cached(cache if seed is not None else None, parts, run)
+
+
+def _run_banner(banner, engine, experiments, seed, workers, tolerances):
+    if tolerances:
+        def run_round(count, seed):
+            result = _run_columns(banner, engine, count, seed, workers)
+            return result, result.pulls
+
+        rounds = run_converged(run_round, tolerances, experiments, seed)
+        return Experiment(*(np.concatenate(column) for column in zip(*rounds)))
+    return _run_columns(banner, engine, experiments, seed, workers)
+
+
+def _store_shard(banner, engine, directory, new_summary, record, count, rng, start):
+    """Write a shard's results into the store; returns its summary (None without new_summary)."""
+    writer = StoreWriter(directory, start)
+    summary = new_summary() if new_summary else None
+
+    def write(block):
+        writer.write(block)
+        if summary is not None:
+            record(summary, block)
+
+    if engine == "batch":
+        run_banner_batch(banner, count, rng, write)
+    else:
+        experiment = LOOPS[engine]
+        for block in range(0, count, BLOCK_SIZE):
+            results = [experiment(banner, rng) for _ in range(min(BLOCK_SIZE, count - block))]
+            write(columns(results, banner.spec.target))
+    writer.close()
+    return summary
+
+
+def _run_store(banner, engine, directory, shard, experiments, seed, workers):
+    """Shard results of a run written into a result store in `directory`."""
+    engine = normalize_engine(engine)
+    if engine == "exact":
+        raise ValueError("the exact engine returns distributions; use solve_banner()")
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    create_store(
+        directory, experiments, banner.spec.target,
+        banner=banner.spec.name, engine=engine, seed=seed, workers=workers or os.cpu_count() or 1,
+    )
+    stream = "numpy" if engine == "batch" else "python"
+    shards = run_sharded(shard, experiments, seed, workers, stream, positioned=True)
+    finish_store(directory)
+    return shards
+
+
+def run_store(banner, engine, directory, experiments, seed=None, workers=None):
+    """Sharded run written into a result store in `directory`.
+
+    Every shard fills its own range of rows block by block, so memory
+    stays bounded however many experiments are run. Returns the store's
+    memory-mapped columns (rows in shard order; the batch engine writes
+    each shard's experiments in the order they finish).
+    """
+    engine = normalize_engine(engine)
+    shard = partial(_store_shard, banner, engine, directory, None, None)
+    _run_store(banner, engine, directory, shard, experiments, seed, workers)
+    return open_store(directory)
+
+
+def _traced_blocks(banner, directory, count, rng, start):
+    """Columns of per-pull experiments in blocks, each pull traced to `directory`."""
+    writer = TraceWriter(directory, start)
+    for block in range(0, count, BLOCK_SIZE):
+        results = []
+        for _ in range(min(BLOCK_SIZE, count - block)):
+            trace = bytearray()
+            result = run_experiment(banner, rng, trace)
+            writer.add(trace, result.pulls)
+            results.append(result)
+        yield columns(results, banner.spec.target)
+    writer.close()
+
+
+def _trace_shard(banner, directory, count, rng, start):
+    blocks = list(_traced_blocks(banner, directory, count, rng, start))
+    return Experiment(*(np.concatenate(column) for column in zip(*blocks)))
+
+
+def _traced_summary_shard(banner, directory, new_summary, record, count, rng, start):
+    summary = new_summary()
+    for block in _traced_blocks(banner, directory, count, rng, start):
+        record(summary, block)
+    return summary
+
+
+def _run_traced(banner, directory, shard, experiments, seed, workers):
+    """Shard results of a per-pull run traced into `directory`."""
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    create_trace(
+        directory, experiments,
+        banner=banner.spec.name, seed=seed, workers=workers or os.cpu_count() or 1,
+    )
+    shards = run_sharded(shard, experiments, seed, workers, "python", positioned=True)
+    finish_trace(directory)
+    return shards
+
+
+def _metered_shard(banner, engine, new_summary, record, count, rng):
+    """summary_shard() that also returns the Metrics of the shard."""
+    metrics = Metrics(banner.table.rates)
+    summary = new_summary()
+
+    def add(block):
+        with metrics.phase("record"):
+            metrics.add("experiments", len(block.pulls))
+            metrics.add("pulls", int(np.sum(block.pulls)))
+            record(summary, block)
+
+    with metrics.phase("shard"):
+        if engine == "batch":
+            run_banner_batch(banner, count, rng, add, metrics)
+        else:
+            experiment = LOOPS[engine]
+            for start in range(0, count, BLOCK_SIZE):
+                size = min(BLOCK_SIZE, count - start)
+                with metrics.phase(engine):
+                    block = [experiment(banner, rng, metrics=metrics) for _ in range(size)]
+                with metrics.phase("columns"):
+                    block = columns(block, banner.spec.target)
+                add(block)
+    return summary, metrics
+
+
+def run_metered(banner, engine, path, new_summary, record, experiments, seed=None, workers=None):
+    """Sharded run as in run_banner_summary(), metered into a metrics file at `path`.
+
+    Returns the shard summaries in order. Metered runs are never cached;
+    the "run" timing is the wall time of the whole run, process start-up
+    included.
+    """
+    engine = normalize_engine(engine)
+    if engine == "exact":
+        raise ValueError("the exact engine returns distributions; use solve_banner()")
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    metrics = Metrics(banner.table.rates)
+    shard = partial(_metered_shard, banner, engine, new_summary, record)
+    stream = "numpy" if engine == "batch" else "python"
+    with metrics.phase("run"):
+        shards = run_sharded(shard, experiments, seed, workers, stream)
+    for _, shard_metrics in shards:
+        metrics.merge(shard_metrics)
+    save_metrics(
+        path, metrics,
+        banner=banner.spec.name, engine=engine, experiments=experiments, seed=seed,
+        workers=workers or os.cpu_count() or 1,
+    )
+    return [summary for summary, _ in shards]
+
+
+def summary_shard(banner, engine, new_summary, record, count, rng):
+    """One shard of run_banner_summary(): `count` experiments recorded into a new summary."""
+    summary = new_summary()
+    if engine == "batch":
+        run_banner_batch(banner, count, rng, partial(record, summary))
+        return summary
+    experiment = LOOPS[engine]
+    for start in range(0, count, BLOCK_SIZE):
+        block = [experiment(banner, rng) for _ in range(min(BLOCK_SIZE, count - start))]
+        record(summary, columns(block, banner.spec.target))
+    return summary
+
+
+def run_banner_summary(
+    banner, engine, new_summary, record, experiments, seed=None, workers=None,
+    tolerances=None, cache=None, store=None, trace=None, metrics=None,
+):
+    """Sharded run streamed into summaries, without keeping per-experiment results.
+
+    Each shard builds `new_summary()` and calls `record(summary, columns)`
+    with Experiment columns of a block of finished experiments. With
+    `tolerances`, the summary needs a "pulls" IntHistogram and
+    `experiments` is the first round of a convergence run. `cache` is
+    used for seeded runs only, keyed on the code of both functions too.
+    A `store` directory also keeps every experiment's results on disk,
+    a `trace` directory records every pull and a `metrics` path meters
+    the run, as in run_banner().
+    """
+    engine = normalize_engine(engine)
+    if (store or trace or metrics) and tolerances:
+        raise ValueError("stores, traces and metrics need a fixed number of experiments")
+    if sum(map(bool, (store, trace, metrics))) > 1:
+        raise ValueError("a run writes one of a result store, a trace or metrics")
+    if store:
+        shard = partial(_store_shard, banner, engine, store, new_summary, record)
+        return merge_summaries(_run_store(banner, engine, store, shard, experiments, seed, workers))
+    if metrics:
+        summaries = run_metered(banner, engine, metrics, new_summary, record, experiments, seed, workers)
+        return merge_summaries(summaries)
+    if trace:
+        shard = partial(_traced_summary_shard, banner, trace, new_summary, record)
+        return merge_summaries(_run_traced(banner, trace, shard, experiments, seed, workers))
+    parts = _cache_parts("summary", banner, engine, experiments, seed, workers, tolerances) + (
+        function_key(new_summary), function_key(record),
+    )
+    run = partial(
+        _run_banner_summary, banner, engine, new_summary, record, experiments, seed, workers, tolerances
+    )
+    return cached(cache if seed is not None else None, parts, run)
+
+
+def _run_banner_summary(banner, engine, new_summary, record, experiments, seed, workers, tolerances):
+    shard = partial(summary_shard, banner, engine, new_summary, record)
+    stream = "numpy" if engine == "batch" else "python"
+    if tolerances:
+        def run_round(count, seed):
+            summary = merge_summaries(run_sharded(shard, count, seed, workers, stream))
+            return summary, summary["pulls"]
+
+        return merge_summaries(run_converged(run_round, tolerances, experiments, seed))
+    return merge_summaries(run_sharded(shard, experiments, seed, workers, stream))
+
+
+# --------------------
+# Pulls for every copy count
+# --------------------
+def copies_report(copy_pulls, percentiles=COPY_PERCENTILES):
+    """Printable table of pulls needed for 1, 2, ... target copies.
+
+    `copy_pulls` is the (experiments, target) copy_pulls column, or a
+    JointHistogram keyed by copy count (1-based) of the pulls.
+    """
+    if isinstance(copy_pulls, JointHistogram):
+        copies = range(1, len(copy_pulls.counts))
+        rows = [
+            (copy, copy_pulls.mean(copy), [copy_pulls.percentile(copy, q) for q in percentiles])
+            for copy in copies
+            if copy_pulls.counts[copy]
+        ]
+    else:
+        table = np.percentile(copy_pulls, percentiles, axis=0).T
+        rows = [
+            (copy, mean, row)
+            for copy, mean, row in zip(range(1, copy_pulls.shape[1] + 1), copy_pulls.mean(axis=0), table)
+        ]
+    header = f"{'copies':>6} {'mean':>9}" + "".join(f" {f'p{q}':>6}" for q in percentiles)
+    lines = [header]
+    for copy, mean, row in rows:
+        lines.append(f"{copy:>6} {mean:>9.2f}" + "".join(f" {value:>6.0f}" for value in row))
+    return lines
+
+
+# --------------------
+# Convergence runs
+# --------------------
+def intervals(pulls, tolerances, confidence=CONFIDENCE):
+    """{statistic: (estimate, low, high)} for each key of `tolerances`.
+
+    `pulls` is an IntHistogram of total pulls; a key is "mean" or a
+    percentile such as 95.
+    """
+    result = {}
+    for statistic in tolerances:
+        if statistic == "mean":
+            result[statistic] = (pulls.mean(), *pulls.mean_interval(confidence))
+        else:
+            result[statistic] = (pulls.percentile(statistic), *pulls.percentile_interval(statistic, confidence))
+    return result
+
+
+def interval_report(pulls, tolerances, confidence=CONFIDENCE):
+    """Printable lines with each converged statistic and its interval.
+
+    `pulls` is an IntHistogram or an array of total pulls.
+    """
+    if not isinstance(pulls, IntHistogram):
+        histogram = IntHistogram()
+        histogram.add_many(pulls)
+        pulls = histogram
+    lines = []
+    for statistic, (estimate, low, high) in intervals(pulls, tolerances, confidence).items():
+        label = "Mean" if statistic == "mean" else f"{statistic}th percentile"
+        lines.append(
+            f"{label} pulls: {estimate:.2f} [{low:.2f}, {high:.2f}] "
+            f"({confidence:.0%} CI, half-width {(high - low) / 2:.2f}, target {tolerances[statistic]})"
+        )
+    return lines
+
+
+def _needed(pulls, tolerances, confidence):
+    """Experiments the widest interval needs, from its 1/sqrt(n) scaling."""
+    needed = 0
+    for statistic, (_, low, high) in intervals(pulls, tolerances, confidence).items():
+        half_width = (high - low) / 2
+        if half_width > tolerances[statistic]:
+            needed = max(needed, math.ceil(pulls.count * (half_width / tolerances[statistic]) ** 2))
+    return needed
+
+
+def run_converged(
+    run_round, tolerances, experiments, seed=None,
+    confidence=CONFIDENCE, max_experiments=MAX_EXPERIMENTS,
+):
+    """Rounds of `run_round(count, seed) -> (result, pulls)` until converged.
+
+    `pulls` (total pulls per experiment, or an IntHistogram of them) is
+    pooled over the rounds until every interval in `tolerances` has at
+    most that half-width, e.g. {"mean": 1.0, 95: 0.5}. The first round
+    runs `experiments` with `seed`, so a run that converges at once is
+    the plain run. Later rounds run about as many experiments as the
+    widest interval still needs, at most doubling the total each round,
+    with seed [seed, round]. Returns the list of round results.
+    """
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    pooled = IntHistogram()
+    results = []
+    count = experiments
+    while count:
+        result, pulls = run_round(count, seed if not results else [seed, len(results)])
+        if isinstance(pulls, IntHistogram):
+            pooled.merge(pulls)
+        else:
+            pooled.add_many(pulls)
+        results.append(result)
+        needed = _needed(pooled, tolerances, confidence)
+        done = pooled.count
+        count = max(0, min(max(needed - done, experiments), done, max_experiments - done)) if needed else 0
+    return results
+
+
+def solve_banner(banner):
+    """Exact distributions for banners the solvers cover.
+
+    Banners without first, free or bonus rate-ups and tickets get an
+    ExactResult. Those with them but without a carried guarantee, a
+    fresh first 50/50 or bonus rate-ups (the endfield and arknights
+    character banners) get a TimedResult. Others raise ValueError.
+    """
+    spec = banner.spec
+    if spec.bonus_rate_ups:
+        raise ValueError(f"no exact solver for the {spec.name} banner rules")
+    if spec.first_rate_up_at is not None or spec.free_rate_up_every or spec.tickets:
+        if spec.carry_guarantee or spec.first_hit_fresh:
+            raise ValueError(f"no exact solver for the {spec.name} banner rules")
+        return solve_timed_banner(
+            banner.table, spec.target, spec.rate_up_chance, spec.first_rate_up_at,
+            spec.first_rate_up_forced, spec.free_rate_up_every, spec.hard_pity_first,
+            spec.tickets, banner.secondary,
+        )
+    return solve_character_banner(
+        banner.table, spec.target, spec.rate_up_chance, spec.carry_guarantee, spec.first_hit_fresh
+    )
@@ -0,0 +1,154 @@
+"""Account-lifetime simulation: pity and guarantee carried across banners.
+
+Every player is a lane holding only the state that survives a banner:
+pity, the carried rate-up guarantee and whether a rolled hit was ever
+made. Banners of a schedule are played one after another by all lanes
+at once, each with a pull budget and a number of copies the player
+stops at. Within a banner every lane jumps straight to its next hit
+(an inverse-CDF draw conditioned on its current pity, as
+hazard.draw_gap() does), so a banner costs a few vectorized steps, not
+one per pull.
+
+Memory is the per-player state plus one small set of counts per banner
+(copies obtained and pity carried out); the schedule is consumed in
+order and never materialized per player.
+"""
+from collections import namedtuple
+from functools import partial
+
+import numpy as np
+
+from gachasim.runner import run_sharded
+
+BannerOutcome = namedtuple(
+    "BannerOutcome", ["budget", "target", "players", "copies", "carried_pity", "guaranteed", "pulls_spent"]
+)
+BannerOutcome.__doc__ = """Counts over all players for one banner of the schedule.
+
+copies        copies[k] = players who ended the banner with k copies
+carried_pity  carried_pity[p] = players leaving the banner at pity p
+guaranteed    players leaving with a carried rate-up guarantee
+pulls_spent   total pulls spent on the banner
+"""
+
+
+def success_rate(outcome):
+    return outcome.copies[outcome.target] / outcome.players
+
+
+def _check(banner):
+    spec = banner.spec
+    if spec.first_rate_up_at is not None or spec.free_rate_up_every or spec.bonus_rate_ups:
+        raise ValueError(f"no lifetime mode for the {spec.name} banner rules")
+
+
+def _draw_gaps(cdf, pity, rng):
+    """Pulls to each lane's next hit given its pity (vectorized draw_gap)."""
+    start = cdf[pity]
+    u = start + rng.random(len(pity)) * (1.0 - start)
+    return np.searchsorted(cdf, u, side="right") - pity
+
+
+def run_lifetime_batch(banner, schedule, players, rng=None):
+    """Play `schedule`, a sequence of (budget, target) banners, for `players`.
+
+    Returns one BannerOutcome per banner.
+    """
+    _check(banner)
+    if rng is None:
+        rng = np.random.default_rng()
+    spec = banner.spec
+    table = banner.table
+    chance = spec.rate_up_chance
+    carry = spec.carry_guarantee
+    hard_pity = table.hard_pity
+    cdf = table.gap_cdf
+
+    pity = np.zeros(players, dtype=np.int16)
+    guarantee = np.zeros(players, dtype=bool)
+    rolled_before = np.zeros(players, dtype=bool)
+
+    outcomes = []
+    for budget, target in schedule:
+        copies = np.zeros(players, dtype=np.int16)
+        spent = np.zeros(players, dtype=np.int32)
+        active = np.arange(players)
+        while len(active):
+            lane_pity = pity[active].astype(np.int64)
+            gaps = _draw_gaps(cdf, lane_pity, rng)
+            left = budget - spent[active]
+
+            # --- Budget runs out before the next hit: pity carries over ---
+            short = gaps > left
+            stopped = active[short]
+            pity[stopped] += left[short].astype(np.int16)
+            spent[stopped] = budget
+
+            hits = active[~short]
+            hard = lane_pity[~short] + gaps[~short] >= hard_pity
+            spent[hits] += gaps[~short].astype(np.int32)
+            pity[hits] = 0
+
+            # --- Rate-up or off-banner, as in kernel.run_experiment() ---
+            u = rng.random(len(hits))
+            carried = guarantee[hits]
+            won = np.zeros(len(hits), dtype=bool)
+            decided = np.zeros(len(hits), dtype=bool)
+            if spec.first_hit_fresh:
+                fresh = ~hard & ~rolled_before[hits]
+                won[fresh] = u[fresh] < chance  # a win keeps the carried guarantee
+                carried |= fresh & ~won & carry
+                decided |= fresh
+            if carry:
+                guaranteed = ~decided & carried
+                won |= guaranteed
+                decided |= guaranteed
+                carried &= ~guaranteed
+            rest = ~decided
+            rest_won = rest & (u < chance)
+            won |= rest_won
+            if carry:
+                carried |= rest & ~rest_won
+            guarantee[hits] = carried
+            rolled_before[hits[~hard]] = True
+            copies[hits[won]] += 1
+
+            still = hits[(copies[hits] < target) & (spent[hits] < budget)]
+            active = still
+
+        outcomes.append(BannerOutcome(
+            budget,
+            target,
+            players,
+            np.bincount(copies, minlength=target + 1),
+            np.bincount(pity, minlength=hard_pity),
+            int(np.count_nonzero(guarantee)),
+            int(spent.sum()),
+        ))
+    return outcomes
+
+
+def merge_outcomes(shards):
+    """Add up per-shard outcome lists banner by banner."""
+    merged = []
+    for outcomes in zip(*shards):
+        first = outcomes[0]
+        merged.append(first._replace(
+            players=sum(outcome.players for outcome in outcomes),
+            copies=sum(outcome.copies for outcome in outcomes),
+            carried_pity=sum(outcome.carried_pity for outcome in outcomes),
+            guaranteed=sum(outcome.guaranteed for outcome in outcomes),
+            pulls_spent=sum(outcome.pulls_spent for outcome in outcomes),
+        ))
+    return merged
+
+
+def _lifetime_shard(banner, schedule, count, rng):
+    return run_lifetime_batch(banner, schedule, count, rng)
+
+
+def run_lifetime(banner, schedule, players, seed=None, workers=None):
+    """Sharded run_lifetime_batch(); players are split across workers."""
+    _check(banner)
+    shard = partial(_lifetime_shard, banner, tuple(schedule))
+    return merge_outcomes(run_sharded(shard, players, seed, workers, stream="numpy"))
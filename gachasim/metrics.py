@@ -0,0 +1,159 @@
+"""Rule counters and phase timings of a run, as structured metrics.
+
+    python -m gachasim.metrics metrics.json
+
+A metered run (run_banner(..., metrics="metrics.json"), any sampling
+engine) counts every top-rarity pull by its gachasim.trace code and pity:
+the rule that decided it (roll, fresh, carried, next-hit, forced, free,
+certain), whether it was the rate-up and whether it came from hard pity,
+plus bonus rate-ups. Hits that were rolled are split into soft pity (a
+chance above the curve's first-pull rate) and base rate by their pity.
+Shards also time their phases: the per-pull and skip-ahead loops, column
+building and recording for every engine, and the steps of each pull
+index in the batch engine.
+
+The metrics are written as JSON:
+
+    counters      experiments, pulls, top_hits, rate_ups, bonus_rate_ups,
+                  hard_pity, soft_pity, base_rate
+    rules         per rule: top-rarity pulls it decided and rate-ups won
+    hits_by_pity  top-rarity pulls by pity
+    timings       per phase: seconds and calls, summed over shards
+                  ("run" is the wall time of the whole run)
+
+Engines take `metrics=None` by default and then only check it once per
+top-rarity hit (once per pull index in the batch engine), so unmetered
+runs are not slowed down.
+"""
+import argparse
+import json
+from contextlib import contextmanager
+from time import perf_counter
+
+import numpy as np
+
+from gachasim.trace import BONUS, FORCED, FREE, HARD_PITY, RATE_UP, RULE_SHIFT, RULES, TOP
+
+VERSION = 1
+
+
+class Metrics:
+    """Hit counts and phase timings of a shard or run; merge() adds another's."""
+
+    def __init__(self, rates):
+        self.rates = tuple(rates)  # the top-rarity curve, indexed by pity
+        self.hits = np.zeros((256, len(self.rates)), dtype=np.int64)  # [code, pity]
+        self.counters = {}
+        self.timings = {}
+        self._mark = perf_counter()
+
+    def add(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def time(self, name, seconds, calls=1):
+        entry = self.timings.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += calls
+
+    @contextmanager
+    def phase(self, name):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.time(name, perf_counter() - start)
+
+    def mark(self, name=None):
+        """Charge the time since the previous mark() to phase `name` (None: only restart)."""
+        now = perf_counter()
+        if name is not None:
+            self.time(name, now - self._mark)
+        self._mark = now
+
+    def merge(self, other):
+        self.hits += other.hits
+        for name, value in other.counters.items():
+            self.add(name, value)
+        for name, (seconds, calls) in other.timings.items():
+            self.time(name, seconds, calls)
+
+    def as_dict(self):
+        """Counters, rules, hits_by_pity and timings, as written to JSON."""
+        codes = np.arange(256)
+        top = (codes & 0b11) == TOP
+        won = top & ((codes & RATE_UP) != 0)
+        hard = top & ((codes & HARD_PITY) != 0)
+        rule = (codes >> RULE_SHIFT) & 0b111
+        rolled = top & ~hard & (rule != FREE) & (rule != FORCED)
+        rates = np.asarray(self.rates)
+        soft = rates > rates[1] if len(rates) > 1 else np.zeros(len(rates), dtype=bool)
+        by_code = self.hits.sum(axis=1)
+        rolled_hits = self.hits[rolled].sum(axis=0)
+        counters = dict(
+            self.counters,
+            top_hits=int(by_code[top].sum()),
+            rate_ups=int(by_code[won].sum()),
+            bonus_rate_ups=int(self.hits[BONUS].sum()),
+            hard_pity=int(by_code[hard].sum()),
+            soft_pity=int(rolled_hits[soft].sum()),
+            base_rate=int(rolled_hits[~soft].sum()),
+        )
+        return {
+            "counters": counters,
+            "rules": {
+                name: {
+                    "pulls": int(by_code[top & (rule == code)].sum()),
+                    "rate_ups": int(by_code[won & (rule == code)].sum()),
+                }
+                for code, name in enumerate(RULES)
+            },
+            "hits_by_pity": [int(count) for count in self.hits[top].sum(axis=0)],
+            "timings": {
+                name: {"seconds": seconds, "calls": calls} for name, (seconds, calls) in self.timings.items()
+            },
+        }
+
+
+def save_metrics(path, metrics, **meta):
+    """Write `metrics` as JSON; extra keyword arguments describe the run."""
+    with open(path, "w") as file:
+        json.dump(dict(meta, version=VERSION, **metrics.as_dict()), file, indent=1)
+
+
+def load_metrics(path):
+    with open(path) as file:
+        data = json.load(file)
+    if data.get("version") != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} metrics file")
+    return data
+
+
+def report_lines(data):
+    """Printable counters, rule firings and phase timings of loaded metrics."""
+    counters = data["counters"]
+    lines = [f"{name:<16} {value:>14}" for name, value in counters.items()]
+    top_hits = counters["top_hits"] or 1
+    lines.append(f"{'rule':<16} {'pulls':>14} {'share':>8} {'rate-ups':>14}")
+    for name, rule in data["rules"].items():
+        if rule["pulls"]:
+            share = rule["pulls"] / top_hits
+            lines.append(f"{name:<16} {rule['pulls']:>14} {share:>8.2%} {rule['rate_ups']:>14}")
+    lines.append(f"{'phase':<16} {'seconds':>14} {'calls':>8}")
+    for name, timing in sorted(data["timings"].items(), key=lambda item: -item[1]["seconds"]):
+        lines.append(f"{name:<16} {timing['seconds']:>14.3f} {timing['calls']:>8}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m gachasim.metrics", description=__doc__.split("\n")[0])
+    parser.add_argument("files", nargs="+", help="metrics files written by metered runs")
+    args = parser.parse_args(argv)
+
+    for path in args.files:
+        data = load_metrics(path)
+        print(f"{path}: {data.get('banner')} ({data.get('engine')})")
+        print("\n".join(report_lines(data)))
+
+
+if __name__ == "__main__":
+    main()
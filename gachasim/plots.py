@@ -0,0 +1,115 @@
+"""Line charts of aggregated histograms, shown on screen or saved headless.
+
+Scripts describe their figures as LineChart values built from bincounts
+or PMFs, never from per-experiment lists, so a chart is cheap to pickle
+and to hand to another process. matplotlib is imported only when a chart
+is actually drawn; file output selects the non-interactive Agg backend
+first, so it works without a display (cron, CI, ssh).
+"""
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+OUTPUTS = ("show", "png", "svg")
+
+LineChart = namedtuple(
+    "LineChart", ["name", "title", "xlabel", "ylabel", "x", "y", "style", "markers"]
+)
+LineChart.__doc__ = """One line plot.
+
+name       file stem used when saving
+x, y       the line; y is a bincount, a binned count or a PMF
+style      keyword arguments for plt.plot (color, linewidth, label)
+markers    (x, axvline keyword arguments) pairs for milestone lines
+"""
+
+
+def line_chart(name, title, xlabel, ylabel, y, x=None, markers=(), **style):
+    """LineChart of `y`, plotted against 0..len(y)-1 unless `x` is given."""
+    y = np.asarray(y)
+    if x is None:
+        x = np.arange(len(y))
+    return LineChart(name, title, xlabel, ylabel, np.asarray(x), y, style, tuple(markers))
+
+
+def binned(counts, width, start=0):
+    """Sum a bincount into `width`-wide bins from `start`; returns (x, y)."""
+    counts = np.asarray(counts)[start:]
+    bins = -(-len(counts) // width)
+    padded = np.zeros(bins * width, dtype=counts.dtype)
+    padded[: len(counts)] = counts
+    return start + width * np.arange(bins), padded.reshape(bins, width).sum(axis=1)
+
+
+# --------------------
+# Drawing
+# --------------------
+def _draw(plt, chart):
+    figure = plt.figure(figsize=(10, 6))
+    plt.plot(chart.x, chart.y, **chart.style)
+    for x, style in chart.markers:
+        plt.axvline(x, **style)
+    plt.xlabel(chart.xlabel)
+    plt.ylabel(chart.ylabel)
+    plt.title(chart.title)
+    if "label" in chart.style or any("label" in style for _, style in chart.markers):
+        plt.legend()
+    plt.grid(True)
+    return figure
+
+
+def show(charts):
+    """Draw each chart in a blocking interactive window, one after another."""
+    import matplotlib.pyplot as plt
+
+    for chart in charts:
+        _draw(plt, chart)
+        plt.show()
+
+
+def _save(chart, path):
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    figure = _draw(plt, chart)
+    figure.savefig(path)
+    plt.close(figure)
+    return path
+
+
+def save(charts, directory, fmt="png", workers=None):
+    """Render charts to `directory`/<name>.<fmt> in parallel; returns the paths.
+
+    `workers=None` uses one process per CPU core (at most one per chart);
+    a single worker renders in-process.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = [os.path.join(directory, f"{chart.name}.{fmt}") for chart in charts]
+    workers = min(workers or os.cpu_count() or 1, len(charts))
+    if workers <= 1:
+        return [_save(chart, path) for chart, path in zip(charts, paths)]
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(_save, charts, paths))
+
+
+def render(charts, output, directory="plots", workers=None):
+    """Show or save `charts` as selected by a script's PLOTS setting.
+
+    `output` is "show", "png", "svg" or None (no plots, matplotlib is
+    never imported).
+    """
+    if output is None:
+        return []
+    if output not in OUTPUTS:
+        raise ValueError(f"unknown plot output {output!r}; expected one of {OUTPUTS} or None")
+    if output == "show":
+        show(charts)
+        return []
+    paths = save(charts, directory, output, workers)
+    for path in paths:
+        print(f"Saved {path}")
+    return paths
@@ -0,0 +1,152 @@
+"""O(1) budget queries against precomputed CDF indexes.
+
+    python -m gachasim.query indexes/hoyo-character.cdf 300 2
+    python -m gachasim.query --serve indexes/ --port 8765
+    curl 'localhost:8765/hoyo-character?budget=300&copies=2'
+
+An index file, built by gachasim.index, is a fixed header followed by a
+dense row-major float64 table: cell (budget, copies) is P(at least
+`copies` rate-ups within `budget` pulls). A lookup is one struct read
+at a computed offset of the memory-mapped file. This module only uses
+the standard library, so a query process never imports numpy or the
+simulation engines.
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+MAGIC = b"GACHACDF"
+VERSION = 1
+SUFFIX = ".cdf"
+# magic, version, budgets (rows), copies (columns), reserved, experiments (0 = exact), banner name
+HEADER = struct.Struct("<8sIIIIQ64s")
+CELL = struct.Struct("<d")
+
+
+class BudgetIndex:
+    """Memory-mapped CDF table of one banner.
+
+    Budgets past the last row use the last row; the table ends where
+    every copy count is reached with probability 1 (or, for simulated
+    tables, at the largest pull count observed).
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.budgets, self.copies, _, self.experiments, name = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a version {VERSION} budget index")
+        self.name = name.rstrip(b"\0").decode()
+
+    def probability(self, budget, copies):
+        """P(at least `copies` rate-ups within `budget` pulls)."""
+        if not 1 <= copies <= self.copies:
+            raise ValueError(f"copies must be within 1..{self.copies}")
+        if budget < 0:
+            raise ValueError("budget must not be negative")
+        row = min(budget, self.budgets - 1)
+        return CELL.unpack_from(self._map, HEADER.size + CELL.size * (row * self.copies + copies - 1))[0]
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_indexes(directory):
+    """{banner name: BudgetIndex} for every index file in `directory`."""
+    indexes = {}
+    for entry in sorted(os.listdir(directory)):
+        if entry.endswith(SUFFIX):
+            index = BudgetIndex(os.path.join(directory, entry))
+            indexes[index.name] = index
+    return indexes
+
+
+# --------------------
+# Local HTTP service
+# --------------------
+class QueryHandler(BaseHTTPRequestHandler):
+    """GET /<banner>?budget=B&copies=K, or GET / for the banner list."""
+
+    indexes = {}
+
+    def _reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        name = url.path.strip("/")
+        if not name:
+            self._reply(200, {
+                name: {"budgets": index.budgets, "copies": index.copies, "experiments": index.experiments}
+                for name, index in self.indexes.items()
+            })
+            return
+        index = self.indexes.get(name)
+        if index is None:
+            self._reply(404, {"error": f"no index for {name!r}"})
+            return
+        try:
+            query = parse_qs(url.query)
+            budget = int(query["budget"][0])
+            copies = int(query.get("copies", ["1"])[0])
+            probability = index.probability(budget, copies)
+        except (KeyError, ValueError) as error:
+            self._reply(400, {"error": str(error)})
+            return
+        self._reply(200, {"banner": name, "budget": budget, "copies": copies, "probability": probability})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(directory, host="127.0.0.1", port=8765):
+    """Answer queries for every index in `directory` until interrupted."""
+    handler = type("Handler", (QueryHandler,), {"indexes": open_indexes(directory)})
+    with ThreadingHTTPServer((host, port), handler) as server:
+        print(f"Serving {', '.join(handler.indexes)} on http://{host}:{server.server_port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m gachasim.query", description=__doc__.split("\n")[0]
+    )
+    parser.add_argument("index", nargs="?", help="index file to query")
+    parser.add_argument("budget", nargs="?", type=int)
+    parser.add_argument("copies", nargs="?", type=int, default=1)
+    parser.add_argument("--serve", metavar="DIRECTORY", help="serve every index in DIRECTORY over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args.serve, args.host, args.port)
+        return
+    if args.index is None or args.budget is None:
+        parser.error("give an index file and a budget, or --serve DIRECTORY")
+    with BudgetIndex(args.index) as index:
+        print(f"{index.probability(args.budget, args.copies):.6f}")
+
+
+if __name__ == "__main__":
+    main()
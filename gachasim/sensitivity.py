@@ -0,0 +1,76 @@
+"""Parameter sensitivity of exact banner distributions.
+
+A script exposes its banner as a function of its constants, e.g.
+make_banner(base_rate=..., soft_pity_start=...) returning a BannerSpec.
+Each constant is moved by one step either way and the banner solved
+exactly (kernel.solve_banner()), so the central difference of every
+statistic is free of sampling noise: no runs are repeated and no seeds
+need to line up. Integer constants (pity thresholds, guarantee pulls)
+simply take integer steps. An "effect" replaces a constant outright, such
+as removing a guarantee, and reports the change against the defaults.
+"""
+import inspect
+from collections import namedtuple
+
+import numpy as np
+
+from gachasim.exact import pmf_mean, pmf_quantile
+from gachasim.kernel import compile_banner, solve_banner
+
+PERCENTILES = (5, 50, 95)
+
+Sensitivity = namedtuple("Sensitivity", ["label", "changes"])
+Sensitivity.__doc__ = """Change of every statistic() entry for one parameter move.
+
+label    "name +step" for a central difference per step, or "name = value"
+         for an effect
+changes  array aligned with statistic_names()
+"""
+
+
+def statistic_names(percentiles=PERCENTILES):
+    return ["mean"] + [f"p{q}" for q in percentiles] + ["first mean"]
+
+
+def statistics(spec, percentiles=PERCENTILES):
+    """Exact mean and percentiles of total pulls, and mean first rate-up pull."""
+    result = solve_banner(compile_banner(spec))
+    pulls = result.pulls_pmf
+    return np.array(
+        [pmf_mean(pulls)]
+        + [pmf_quantile(pulls, q) for q in percentiles]
+        + [pmf_mean(result.first_on_rate_pmf)]
+    )
+
+
+def sensitivities(make_spec, steps, effects=None, percentiles=PERCENTILES):
+    """(statistics at the defaults, [Sensitivity, ...]).
+
+    `steps` maps make_spec() keyword arguments to step sizes around their
+    defaults; `effects` maps them to replacement values.
+    """
+    defaults = {
+        name: parameter.default
+        for name, parameter in inspect.signature(make_spec).parameters.items()
+    }
+    base = statistics(make_spec(), percentiles)
+    rows = []
+    for name, step in steps.items():
+        value = defaults[name]
+        above = statistics(make_spec(**{name: value + step}), percentiles)
+        below = statistics(make_spec(**{name: value - step}), percentiles)
+        rows.append(Sensitivity(f"{name} +{step:g}", (above - below) / 2))
+    for name, value in (effects or {}).items():
+        rows.append(Sensitivity(f"{name} = {value}", statistics(make_spec(**{name: value}), percentiles) - base))
+    return base, rows
+
+
+def sensitivity_report(base, rows, percentiles=PERCENTILES):
+    """Printable table of the statistics and their changes."""
+    names = statistic_names(percentiles)
+    width = max([len("defaults")] + [len(row.label) for row in rows])
+    lines = [f"{'':<{width}}" + "".join(f" {name:>10}" for name in names)]
+    lines.append(f"{'defaults':<{width}}" + "".join(f" {value:>10.2f}" for value in base))
+    for row in rows:
+        lines.append(f"{row.label:<{width}}" + "".join(f" {change:>+10.2f}" for change in row.changes))
+    return lines
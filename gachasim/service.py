@@ -0,0 +1,420 @@
+"""Local asynchronous job service on a persistent worker pool.
+
+    python -m gachasim.service --port 8766 --workers 4
+    curl -d '{"game": "hoyo-character", "seed": 1, "experiments": 2000000}' localhost:8766/jobs
+    curl localhost:8766/jobs/1              # status and the latest aggregate
+    curl -N localhost:8766/jobs/1/stream    # one JSON line per partial aggregate until done
+    curl -N -d '{"game": "wuwa-weapon"}' 'localhost:8766/jobs?stream=1'
+    curl localhost:8766/metrics
+
+Jobs are gachasim.cli jobs: objects with the keys of cli.JOB_KEYS, unset
+keys taking the script's constants, answered with the same output. A
+simulated job is split into shards of about CHUNK_EXPERIMENTS[engine]
+experiments (or into `workers` shards when the job gives it), shard i
+drawing stream i of the seed, so its output is identical to
+`python -m gachasim` with that many workers. Shards run on one process
+pool that lives as long as the service; each job keeps at most one shard
+per worker in flight, so concurrent jobs share the pool. Shard summaries
+are merged as they finish and every merge is published as a partial
+aggregate.
+
+A job identical to one still running (same key as gachasim.cli's output
+cache) joins it instead of running again, and seeded or exact jobs are
+answered from and saved to the output cache. GET /metrics reports job
+counters, throughput and latency quantiles.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import signal
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from itertools import count
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from gachasim.bench import SCRIPTS
+from gachasim.cli import (
+    _new_summary, _record, banner_fields, cache_path, check_job, deterministic, job_key, job_spec,
+    load_output, resolve_job, run_job, save_output, summary_output,
+)
+from gachasim.kernel import compile_banner, normalize_engine, summary_shard
+from gachasim.runner import STREAMS, shard_sizes
+from gachasim.stats import LogSketch, merge_summaries
+
+CHUNK_EXPERIMENTS = {"per-pull": 10000, "skip": 25000, "batch": 200000}  # shards of at most a few seconds
+KEEP_FINISHED = 1000  # finished jobs kept for GET /jobs/<id>
+THROUGHPUT_WINDOW = 60.0  # seconds of recent shards behind the recent throughput
+QUANTILES = (50, 90, 99)
+
+_banners = {}
+
+
+def _shard(game, fields, engine, experiments, seed, index):
+    """(experiments, summary, seconds) of shard `index` of a job, in a pool process."""
+    start = time.perf_counter()
+    key = (game, json.dumps(fields, sort_keys=True))
+    if key not in _banners:
+        _banners[key] = compile_banner(job_spec(game, fields))
+    rng = STREAMS["numpy" if engine == "batch" else "python"](seed, index)
+    summary = summary_shard(_banners[key], engine, _new_summary, _record, experiments, rng)
+    return experiments, summary, time.perf_counter() - start
+
+
+# --------------------
+# Jobs
+# --------------------
+class Job:
+    """One job; its changes are published to every stream of it."""
+
+    def __init__(self, id, key, header):
+        self.id = id
+        self.key = key
+        self.header = header
+        self.status = "queued"
+        self.completed = 0
+        self.output = None
+        self.error = None
+        self.cached = False
+        self.joined = 0
+        self.submitted = time.monotonic()
+        self.finished = None
+        self.version = 0
+        self._changed = asyncio.Condition()
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed")
+
+    def snapshot(self):
+        end = self.finished if self.done else time.monotonic()
+        return {
+            "id": self.id,
+            "status": self.status,
+            "completed": self.completed,
+            "experiments": self.header["experiments"],
+            "cached": self.cached,
+            "joined": self.joined,
+            "seconds": end - self.submitted,
+            "output": self.output,
+            "error": self.error,
+        }
+
+    async def publish(self, **changes):
+        async with self._changed:
+            for name, value in changes.items():
+                setattr(self, name, value)
+            if self.done and self.finished is None:
+                self.finished = time.monotonic()
+            self.version += 1
+            self._changed.notify_all()
+
+    async def updates(self):
+        """The current snapshot, then one per change until the job is done.
+
+        A slow reader skips intermediate aggregates, never the last one.
+        """
+        seen = None
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self.version != seen)
+                seen = self.version
+                snapshot = self.snapshot()
+            yield snapshot
+            if snapshot["status"] in ("done", "failed"):
+                return
+
+
+class ServiceMetrics:
+    """Job counters, throughput and latency quantiles of a running service."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.counters = dict.fromkeys(
+            ("submitted", "joined", "cached", "completed", "failed", "shards", "experiments"), 0
+        )
+        self.latency = LogSketch()  # submission to done, per job run
+        self.first_aggregate = LogSketch()  # submission to the first partial aggregate
+        self.shard_seconds = LogSketch()
+        self._recent = deque()  # (finish time, experiments) of recent shards
+
+    def add(self, name, value=1):
+        self.counters[name] += value
+
+    def shard(self, experiments, seconds):
+        now = time.monotonic()
+        self.add("shards")
+        self.add("experiments", experiments)
+        self.shard_seconds.add(seconds)
+        self._recent.append((now, experiments))
+        while self._recent[0][0] < now - THROUGHPUT_WINDOW:
+            self._recent.popleft()
+
+    def as_dict(self, running, pending_shards):
+        now = time.monotonic()
+        uptime = now - self.started
+        recent = sum(experiments for finished, experiments in self._recent if finished >= now - THROUGHPUT_WINDOW)
+        return {
+            "uptime": uptime,
+            "jobs": dict(self.counters, running=running, pending_shards=pending_shards),
+            "throughput": {
+                "experiments_per_second": self.counters["experiments"] / uptime if uptime else 0.0,
+                "recent_experiments_per_second": recent / min(uptime, THROUGHPUT_WINDOW) if uptime else 0.0,
+            },
+            "latency": _quantiles(self.latency),
+            "first_aggregate": _quantiles(self.first_aggregate),
+            "shard_seconds": _quantiles(self.shard_seconds),
+        }
+
+
+def _quantiles(sketch):
+    return dict(
+        count=sketch.count,
+        **{f"p{q}": sketch.percentile(q) if sketch.count else None for q in QUANTILES},
+    )
+
+
+class JobService:
+    """Runs jobs on a persistent pool of `workers` processes."""
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        # spawned, not forked: a forked worker would inherit the listening socket
+        # and keep the port open after the service exits
+        self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        self.jobs = OrderedDict()
+        self.running = {}  # job key -> in-flight Job
+        self.pending_shards = 0
+        self.metrics = ServiceMetrics()
+        self._ids = count(1)
+        self._tasks = set()
+
+    def submit(self, request):
+        """(Job, joined): a new job, or the in-flight job it duplicates.
+
+        Raises ValueError (or TypeError, KeyError, OverflowError for fields
+        of the wrong type) for an invalid job.
+        """
+        check_job(request)
+        header = resolve_job(request)
+        header["engine"] = normalize_engine(header["engine"])
+        request = dict(request, engine=header["engine"])
+        if header["engine"] != "exact":
+            header["workers"] = request["workers"] if request.get("workers") is not None else -(
+                -header["experiments"] // CHUNK_EXPERIMENTS[header["engine"]]
+            )
+            request["workers"] = header["workers"]
+        self.metrics.add("submitted")
+        key = job_key(request)
+        if key in self.running:
+            job = self.running[key]
+            job.joined += 1
+            self.metrics.add("joined")
+            return job, True
+
+        job = Job(str(next(self._ids)), key, header)
+        self.jobs[job.id] = job
+        path = cache_path(request) if deterministic(header) else None
+        output = load_output(path) if path else None
+        if output is not None:
+            self.metrics.add("cached")
+            job.status, job.output, job.cached = "done", output, True
+            job.completed = header["experiments"] or 0
+            job.finished = time.monotonic()
+        else:
+            self.running[key] = job
+            task = asyncio.get_running_loop().create_task(self._run(job, request, path))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        self._trim()
+        return job, False
+
+    def _trim(self):
+        finished = [id for id, job in self.jobs.items() if job.done]
+        for id in finished[: max(len(finished) - KEEP_FINISHED, 0)]:
+            del self.jobs[id]
+
+    async def _run(self, job, request, path):
+        loop = asyncio.get_running_loop()
+        try:
+            await job.publish(status="running")
+            if job.header["engine"] == "exact":
+                output = await loop.run_in_executor(self.pool, run_job, request)
+            else:
+                output = await self._simulate(job, request)
+            if path:
+                save_output(path, output)
+            self.metrics.add("completed")
+            await job.publish(status="done", output=output)
+        except Exception as error:  # reported to the job's readers, never raised into the loop
+            self.metrics.add("failed")
+            await job.publish(status="failed", error=f"{type(error).__name__}: {error}")
+        finally:
+            del self.running[job.key]
+            self.metrics.latency.add(time.monotonic() - job.submitted)
+
+    async def _simulate(self, job, request):
+        loop = asyncio.get_running_loop()
+        header = job.header
+        seed = header["seed"] if header["seed"] is not None else np.random.SeedSequence().entropy
+        header = dict(header, seed=seed)
+        fields = banner_fields(request)
+        shards = deque(
+            (experiments, index)
+            for index, experiments in enumerate(shard_sizes(header["experiments"], header["workers"]))
+            if experiments
+        )
+        in_flight = set()
+        summary = None
+        completed = 0
+        try:
+            while shards or in_flight:
+                while shards and len(in_flight) < self.workers:
+                    experiments, index = shards.popleft()
+                    in_flight.add(loop.run_in_executor(
+                        self.pool, _shard, header["game"], fields, header["engine"], experiments, seed, index
+                    ))
+                    self.pending_shards += 1
+                finished, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                self.pending_shards -= len(finished)
+                for future in finished:
+                    experiments, part, seconds = future.result()
+                    summary = part if summary is None else merge_summaries([summary, part])
+                    completed += experiments
+                    self.metrics.shard(experiments, seconds)
+                if not job.completed:
+                    self.metrics.first_aggregate.add(time.monotonic() - job.submitted)
+                output = dict(header, **summary_output(summary, header["target"]))
+                if shards or in_flight:
+                    await job.publish(completed=completed, output=output)
+        finally:
+            # a failed shard fails the job: its other shards stop taking workers
+            for future in in_flight:
+                future.cancel()
+            self.pending_shards -= len(in_flight)
+        job.completed = completed
+        return output
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    # --------------------
+    # HTTP
+    # --------------------
+    async def handle(self, reader, writer):
+        """One HTTP/1.1 request per connection."""
+        try:
+            method, target, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            await self._route(method, urlsplit(target), body, writer)
+        except (ValueError, asyncio.IncompleteReadError):
+            await _reply(writer, 400, {"error": "malformed request"})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, url, body, writer):
+        parts = url.path.strip("/").split("/")
+        if method == "GET" and parts == [""]:
+            await _reply(writer, 200, {
+                "games": list(SCRIPTS), "jobs": {id: job.status for id, job in self.jobs.items()},
+            })
+        elif method == "GET" and parts == ["metrics"]:
+            await _reply(writer, 200, self.metrics.as_dict(len(self.running), self.pending_shards))
+        elif method == "POST" and parts == ["jobs"]:
+            try:
+                request = json.loads(body)
+                if not isinstance(request, dict):
+                    raise ValueError("a job is a JSON object")
+                job, joined = self.submit(request)
+            except (ValueError, TypeError, KeyError, OverflowError) as error:
+                await _reply(writer, 400, {"error": str(error)})
+                return
+            if parse_qs(url.query).get("stream"):
+                await _stream(writer, job)
+            else:
+                await _reply(writer, 200 if job.done else 202, dict(job.snapshot(), joined_now=joined))
+        elif method == "GET" and len(parts) in (2, 3) and parts[0] == "jobs" and parts[2:] in ([], ["stream"]):
+            job = self.jobs.get(parts[1])
+            if job is None:
+                await _reply(writer, 404, {"error": f"no job {parts[1]!r}"})
+            elif parts[2:]:
+                await _stream(writer, job)
+            else:
+                await _reply(writer, 200, job.snapshot())
+        else:
+            await _reply(writer, 404, {"error": f"no route {method} {url.path}"})
+
+
+async def _reply(writer, status, body):
+    payload = json.dumps(body).encode()
+    writer.write(
+        f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload
+    )
+    await writer.drain()
+
+
+async def _stream(writer, job):
+    """Every update of `job` as a JSON line, in a chunked response."""
+    writer.write(
+        b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+        b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n"
+    )
+    async for snapshot in job.updates():
+        line = json.dumps(snapshot).encode() + b"\n"
+        writer.write(b"%x\r\n%s\r\n" % (len(line), line))
+        await writer.drain()
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+
+async def _serve(host, port, workers):
+    service = JobService(workers)
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f"Serving {len(SCRIPTS)} banners on http://{host}:{port} with {service.workers} workers", flush=True)
+    serving = asyncio.ensure_future(server.serve_forever())
+    with contextlib.suppress(NotImplementedError):  # no signal handlers on Windows
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, serving.cancel)
+    try:
+        async with server:
+            await serving
+    except asyncio.CancelledError:
+        pass
+    finally:
+        service.close()
+
+
+def serve(host="127.0.0.1", port=8766, workers=None):
+    """Run the service until interrupted."""
+    try:
+        asyncio.run(_serve(host, port, workers))
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m gachasim.service", description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--workers", type=int, help="pool processes (default: one per CPU core)")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.workers)
+
+
+if __name__ == "__main__":
+    main()
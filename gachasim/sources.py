@@ -0,0 +1,27 @@
+"""Digest of the package's source code, for keys of cached results.
+
+Results cached by gachasim.cache and by the command line stay valid
+only while the code that produced them is unchanged, so both key them
+on source_key(). Only the standard library is imported, so the command
+line can key a job without loading numpy.
+"""
+import glob
+import hashlib
+import os
+from functools import lru_cache
+
+PACKAGE = os.path.dirname(os.path.abspath(__file__))
+
+
+def update_digest(digest, paths):
+    """Feed the bytes of every file in `paths` to a hashlib digest."""
+    for path in paths:
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    return digest
+
+
+@lru_cache(maxsize=None)
+def source_key():
+    """SHA-256 of the source of every gachasim module, read once per process."""
+    return update_digest(hashlib.sha256(), sorted(glob.glob(os.path.join(PACKAGE, "*.py")))).hexdigest()
@@ -0,0 +1,115 @@
+"""Declarative banner rules.
+
+A BannerSpec is plain data: the top-rarity pity curve as a tuple of
+chances, the rate-up split and every special rule a banner has. Specs
+are compiled once by gachasim.kernel.compile_banner(), which gives every
+banner the per-pull, skip-ahead, batch and (where the rules allow) exact
+engines. This module deliberately has no numpy dependency, so a spec can
+be built and inspected without loading any engine.
+"""
+import json
+from collections import namedtuple
+
+MAX_PITY = 1000  # search limit for curves without an explicit hard pity
+CURVE_VERSION = 1  # format of fitted curve files (gachasim.fit)
+
+BannerSpec = namedtuple(
+    "BannerSpec",
+    [
+        "name",
+        "curve",
+        "target",
+        "rate_up_chance",
+        "carry_guarantee",
+        "first_hit_fresh",
+        "first_rate_up_at",
+        "first_rate_up_forced",
+        "free_rate_up_every",
+        "bonus_rate_ups",
+        "hard_pity_first",
+        "tickets",
+    ],
+    defaults=(0.5, False, False, None, True, None, (), True, None),
+)
+BannerSpec.__doc__ = """Rules of one banner, run until `target` rate-ups.
+
+curve                 top-rarity chance by pity, from pity_curve()
+rate_up_chance        chance that a top-rarity hit is the rate-up
+carry_guarantee       losing the rate-up guarantees the next hit
+first_hit_fresh       the first rolled (not hard pity) hit is a fresh
+                      roll that ignores, and keeps, a carried guarantee
+first_rate_up_at      pull from which the first rate-up is guaranteed
+first_rate_up_forced  True: that pull is itself the rate-up if none was
+                      won yet (Endfield). False: the first hit from that
+                      pull on is the rate-up, once (Arknights)
+free_rate_up_every    every N-th pull is a free rate-up instead of a roll
+bonus_rate_ups        pulls that add a rate-up on top of their own roll
+hard_pity_first       hard pity takes its pull before forced rate-ups
+tickets               TicketIncome, or None when tickets are not tracked
+"""
+
+TicketIncome = namedtuple("TicketIncome", ["top", "secondary", "common", "secondary_curve"])
+TicketIncome.__doc__ = """Currency earned per pull by rarity.
+
+Forced first rate-ups pay `top`, free rate-ups pay nothing. A pull that
+misses the top rarity is a secondary-rarity hit with the chance given by
+`secondary_curve` (pity_curve() of the secondary pity), else common.
+"""
+
+
+def certain_pity(chance):
+    """The first pity whose `chance(pity)` reaches 1.0, searched up to MAX_PITY."""
+    hard_pity = next((pity for pity in range(1, MAX_PITY + 1) if chance(pity) >= 1.0), None)
+    if hard_pity is None:
+        raise ValueError(f"chance never reaches 1.0 within {MAX_PITY} pulls")
+    return hard_pity
+
+
+def pity_curve(chance, hard_pity=None):
+    """Tabulate `chance(pity)` as a tuple indexed by pity (index 0 unused).
+
+    The chance is forced to 1.0 at `hard_pity`. Without one, the curve
+    ends at the first pity whose chance reaches 1.0.
+    """
+    if hard_pity is None:
+        hard_pity = certain_pity(chance)
+    rates = [min(1.0, max(0.0, chance(pity))) for pity in range(1, hard_pity)]
+    return (0.0, *rates, 1.0)
+
+
+def load_curve(path):
+    """The curve of a fitted curve file from gachasim.fit, as pity_curve() gives it."""
+    with open(path) as file:
+        fitted = json.load(file)
+    if fitted.get("version") != CURVE_VERSION:
+        raise ValueError(f"{path} is not a version {CURVE_VERSION} curve file")
+    return tuple(fitted["curve"])
+
+Experiment = namedtuple(
+    "Experiment",
+    [
+        "pulls",
+        "first_rate_up",
+        "lost_first",
+        "off_banner",
+        "hit_guarantee",
+        "tickets",
+        "tickets_at_first_rate_up",
+        "tickets_at_guarantee",
+        "copy_pulls",
+    ],
+)
+Experiment.__doc__ = """Outcome of one run, or columns of many (one array per field).
+
+pulls                     pulls to reach the target
+first_rate_up             pull of the first rate-up
+lost_first                the first rolled hit was off-banner
+off_banner                off-banner hits before the first rate-up
+hit_guarantee             the first rate-up came from first_rate_up_at
+tickets                   tickets at the end (0 when untracked)
+tickets_at_first_rate_up  tickets right after the first rate-up
+tickets_at_guarantee      tickets just before pull first_rate_up_at
+copy_pulls                pull at which rate-up copy 1, 2, ... target was
+                          reached; a tuple, or an (experiments, target)
+                          array of columns
+"""
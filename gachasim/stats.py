@@ -0,0 +1,374 @@
+"""Constant-memory streaming statistics.
+
+Accumulators never keep per-experiment values, so memory depends on the
+range of the data rather than on EXPERIMENTS. They all hold integer
+counts or sums, so merging results from workers or separate runs is
+exact and order-independent.
+
+A summary is a dict of named accumulators; merge_summaries() combines
+summaries with the same keys, and summary_arrays() / summary_from_arrays()
+turn one into flat NumPy arrays and back (see gachasim.cache).
+"""
+import math
+from statistics import NormalDist
+
+import numpy as np
+
+
+def z_score(confidence):
+    """Two-sided normal critical value, 1.96 for a 0.95 confidence."""
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def _grow(array, size):
+    grown = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+    grown[: len(array)] = array
+    return grown
+
+
+# --------------------
+# Integer-indexed histogram
+# --------------------
+class IntHistogram:
+    """Exact distribution of non-negative integers such as pull counts.
+
+    Percentiles match np.percentile (linear interpolation) on the raw
+    values, and median() matches statistics.median.
+    """
+
+    def __init__(self):
+        self.counts = np.zeros(64, dtype=np.int64)
+
+    def add(self, value):
+        if value >= len(self.counts):
+            self.counts = _grow(self.counts, value + 1)
+        self.counts[value] += 1
+
+    def add_many(self, values):
+        counts = np.bincount(np.asarray(values, dtype=np.int64))
+        if len(counts) > len(self.counts):
+            self.counts = _grow(self.counts, len(counts))
+        self.counts[: len(counts)] += counts
+
+    def merge(self, other):
+        if len(other.counts) > len(self.counts):
+            self.counts = _grow(self.counts, len(other.counts))
+        self.counts[: len(other.counts)] += other.counts
+
+    def to_arrays(self):
+        return {"counts": self.counts}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        histogram = cls()
+        histogram.counts = arrays["counts"].astype(np.int64)
+        return histogram
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def min(self):
+        return int(np.flatnonzero(self.counts)[0])
+
+    def max(self):
+        return int(np.flatnonzero(self.counts)[-1])
+
+    def mean(self):
+        return int(np.dot(np.arange(len(self.counts)), self.counts)) / self.count
+
+    def variance(self):
+        values = np.arange(len(self.counts))
+        return float(np.dot((values - self.mean()) ** 2, self.counts)) / (self.count - 1)
+
+    def mean_interval(self, confidence=0.95):
+        """Normal-approximation confidence interval (low, high) of the mean."""
+        mean = self.mean()
+        half_width = z_score(confidence) * math.sqrt(self.variance() / self.count)
+        return mean - half_width, mean + half_width
+
+    def percentile_interval(self, q, confidence=0.95):
+        """Distribution-free confidence interval (low, high) of a percentile.
+
+        The bounds are the order statistics whose ranks bracket q% of the
+        values by z standard deviations of the binomial rank count.
+        """
+        count = self.count
+        p = q / 100
+        spread = z_score(confidence) * math.sqrt(count * p * (1 - p))
+        cumulative = np.cumsum(self.counts)
+        low = max(0, math.floor(count * p - spread))
+        high = min(count - 1, math.ceil(count * p + spread))
+        return self._order_statistic(low, cumulative), self._order_statistic(high, cumulative)
+
+    def frequency(self, value):
+        return int(self.counts[value]) if value < len(self.counts) else 0
+
+    def count_in(self, low, high=None):
+        """Number of values in [low, high]; `high=None` means no upper bound."""
+        stop = None if high is None else high + 1
+        return int(self.counts[low:stop].sum())
+
+    def _order_statistic(self, rank, cumulative):
+        return int(np.searchsorted(cumulative, rank, side="right"))
+
+    def percentile(self, q):
+        cumulative = np.cumsum(self.counts)
+        position = q / 100 * (cumulative[-1] - 1)
+        low = math.floor(position)
+        below = self._order_statistic(low, cumulative)
+        above = self._order_statistic(math.ceil(position), cumulative)
+        return below + (above - below) * (position - low)
+
+    def median(self):
+        return self.percentile(50)
+
+    def trimmed(self):
+        """Counts up to the largest value, as np.bincount would return them."""
+        return self.counts[: self.max() + 1]
+
+
+# --------------------
+# Means
+# --------------------
+class Mean:
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+
+    def add_many(self, values):
+        self.count += len(values)
+        self.total += int(np.sum(values, dtype=np.int64))
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+
+    def to_arrays(self):
+        return {"count": np.int64(self.count), "total": np.int64(self.total)}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        mean = cls()
+        mean.count = int(arrays["count"])
+        mean.total = int(arrays["total"])
+        return mean
+
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+
+class JointHistogram:
+    """Joint distribution of an integer key and an integer value.
+
+    Typical use is total pulls (key) against arsenal tickets (value).
+    Values are binned `bin_width` wide, but per-key counts and sums are
+    kept exactly, so conditional means such as "tickets at exactly N
+    pulls" are exact for any bin width.
+    """
+
+    def __init__(self, bin_width=1):
+        self.bin_width = bin_width
+        self.bins = np.zeros((64, 64), dtype=np.int64)
+        self.counts = np.zeros(64, dtype=np.int64)
+        self.totals = np.zeros(64, dtype=np.int64)
+
+    def _fit(self, key, column):
+        rows, columns = self.bins.shape
+        if key >= rows or column >= columns:
+            shape = (
+                max(key + 1, 2 * rows) if key >= rows else rows,
+                max(column + 1, 2 * columns) if column >= columns else columns,
+            )
+            grown = np.zeros(shape, dtype=np.int64)
+            grown[:rows, :columns] = self.bins
+            self.bins = grown
+        if key >= len(self.counts):
+            self.counts = _grow(self.counts, key + 1)
+            self.totals = _grow(self.totals, key + 1)
+
+    def add(self, key, value):
+        column = value // self.bin_width
+        self._fit(key, column)
+        self.bins[key, column] += 1
+        self.counts[key] += 1
+        self.totals[key] += value
+
+    def add_many(self, keys, values):
+        if not len(keys):
+            return
+        keys = np.asarray(keys, dtype=np.int64)
+        values = np.asarray(values, dtype=np.int64)
+        columns = values // self.bin_width
+        self._fit(int(keys.max()), int(columns.max()))
+        np.add.at(self.bins, (keys, columns), 1)
+        np.add.at(self.counts, keys, 1)
+        np.add.at(self.totals, keys, values)
+
+    def merge(self, other):
+        if other.bin_width != self.bin_width:
+            raise ValueError("cannot merge histograms with different bin widths")
+        rows, columns = other.bins.shape
+        self._fit(rows - 1, columns - 1)
+        self.bins[:rows, :columns] += other.bins
+        self.counts[: len(other.counts)] += other.counts
+        self.totals[: len(other.totals)] += other.totals
+
+    def to_arrays(self):
+        keys, columns = np.nonzero(self.bins)  # the grid is mostly empty
+        return {
+            "bin_width": np.int64(self.bin_width),
+            "shape": np.array(self.bins.shape),
+            "keys": keys,
+            "columns": columns,
+            "bins": self.bins[keys, columns],
+            "counts": self.counts,
+            "totals": self.totals,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        histogram = cls(int(arrays["bin_width"]))
+        histogram.bins = np.zeros(tuple(arrays["shape"]), dtype=np.int64)
+        histogram.bins[arrays["keys"], arrays["columns"]] = arrays["bins"]
+        histogram.counts = arrays["counts"].astype(np.int64)
+        histogram.totals = arrays["totals"].astype(np.int64)
+        return histogram
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def mean(self, key):
+        """Mean value for `key`, or nan when no value has that key."""
+        if key >= len(self.counts) or not self.counts[key]:
+            return math.nan
+        return int(self.totals[key]) / int(self.counts[key])
+
+    def percentile(self, key, q):
+        """Conditional percentile of the value for `key`, to the bin width."""
+        row = self.bins[key] if key < len(self.bins) else np.zeros(1, dtype=np.int64)
+        if not row.any():
+            return math.nan
+        rank = q / 100 * (row.sum() - 1)
+        column = int(np.searchsorted(np.cumsum(row), rank, side="right"))
+        return column * self.bin_width
+
+
+# --------------------
+# Mergeable quantile sketch
+# --------------------
+class LogSketch:
+    """Quantile sketch for positive values with a wide range.
+
+    Values fall into logarithmic buckets, so any quantile is returned
+    within `relative_accuracy` of the true value using memory that grows
+    with log(max / min) only. Zeros are counted separately. Sketches with
+    the same accuracy merge exactly.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zeros = 0
+
+    def add(self, value):
+        if value <= 0:
+            self.zeros += 1
+            return
+        index = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def add_many(self, values):
+        values = np.asarray(values, dtype=float)
+        positive = values[values > 0]
+        self.zeros += len(values) - len(positive)
+        indexes, counts = np.unique(
+            np.ceil(np.log(positive) / self.log_gamma).astype(np.int64),
+            return_counts=True,
+        )
+        for index, count in zip(indexes.tolist(), counts.tolist()):
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("cannot merge sketches with different accuracy")
+        self.zeros += other.zeros
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def to_arrays(self):
+        return {
+            "relative_accuracy": np.float64(self.relative_accuracy),
+            "zeros": np.int64(self.zeros),
+            "indexes": np.array(list(self.buckets), dtype=np.int64),
+            "counts": np.array(list(self.buckets.values()), dtype=np.int64),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        sketch = cls(float(arrays["relative_accuracy"]))
+        sketch.zeros = int(arrays["zeros"])
+        sketch.buckets = dict(zip(arrays["indexes"].tolist(), arrays["counts"].tolist()))
+        return sketch
+
+    @property
+    def count(self):
+        return self.zeros + sum(self.buckets.values())
+
+    def percentile(self, q):
+        if not self.count:
+            raise ValueError("empty sketch")
+        rank = q / 100 * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                break
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+
+# --------------------
+# Summaries
+# --------------------
+def merge_summaries(summaries):
+    """Merge a sequence of summaries (dicts of accumulators) into the first."""
+    summaries = iter(summaries)
+    merged = next(summaries)
+    for summary in summaries:
+        for name, accumulator in summary.items():
+            merged[name].merge(accumulator)
+    return merged
+
+
+ACCUMULATORS = {cls.__name__: cls for cls in (IntHistogram, Mean, JointHistogram, LogSketch)}
+
+
+def summary_arrays(summary):
+    """Flat {"name/field": array} form of a summary, for np.savez."""
+    arrays = {}
+    for name, accumulator in summary.items():
+        arrays[f"{name}/type"] = np.array(type(accumulator).__name__)
+        for field, array in accumulator.to_arrays().items():
+            arrays[f"{name}/{field}"] = array
+    return arrays
+
+
+def summary_from_arrays(arrays):
+    """Summary rebuilt from summary_arrays() output (in key order)."""
+    fields = {}
+    for key in arrays:
+        name, _, field = key.partition("/")
+        fields.setdefault(name, {})[field] = arrays[key]
+    return {
+        name: ACCUMULATORS[str(state.pop("type"))].from_arrays(state)
+        for name, state in fields.items()
+    }
@@ -0,0 +1,123 @@
+"""Columnar, memory-mapped store of per-experiment results.
+
+A store is a directory with one .npy file per Experiment field and a
+small store.json describing the run:
+
+    results/
+        store.json          banner, engine, seed, experiments, complete
+        pulls.npy           uint32 [experiments]
+        first_rate_up.npy   uint16 [experiments]
+        lost_first.npy      bool   [experiments]
+        ...
+        copy_pulls.npy      uint32 [experiments, target]
+
+The files are allocated at full size up front and filled in place as
+experiments finish, each shard writing its own contiguous range, so a
+run never holds more than one block of results in memory. open_store()
+(or numpy.load(path, mmap_mode="r") on a single column) maps the
+columns without reading them; slicing a column only touches the pages
+it covers.
+"""
+import json
+import os
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from gachasim.spec import Experiment
+
+VERSION = 1
+META = "store.json"
+COLUMNS = {
+    "pulls": np.uint32,
+    "first_rate_up": np.uint16,
+    "lost_first": np.bool_,
+    "off_banner": np.uint16,
+    "hit_guarantee": np.bool_,
+    "tickets": np.uint32,
+    "tickets_at_first_rate_up": np.uint32,
+    "tickets_at_guarantee": np.uint32,
+    "copy_pulls": np.uint32,
+}
+
+
+def _column_path(directory, field):
+    return os.path.join(directory, f"{field}.npy")
+
+
+def _write_meta(directory, meta):
+    with open(os.path.join(directory, META), "w") as file:
+        json.dump(meta, file, indent=2)
+
+
+def read_meta(directory):
+    """The store.json of a store, as a dict."""
+    with open(os.path.join(directory, META)) as file:
+        return json.load(file)
+
+
+def create_store(directory, experiments, target, **meta):
+    """Allocate the column files for `experiments` results.
+
+    Extra keyword arguments (banner, engine, seed, ...) are kept in
+    store.json. The store is marked incomplete until finish_store().
+    """
+    os.makedirs(directory, exist_ok=True)
+    for field, dtype in COLUMNS.items():
+        shape = (experiments, target) if field == "copy_pulls" else (experiments,)
+        open_memmap(_column_path(directory, field), mode="w+", dtype=dtype, shape=shape).flush()
+    _write_meta(directory, dict(
+        meta, version=VERSION, experiments=experiments, target=target, complete=False
+    ))
+
+
+def finish_store(directory):
+    meta = read_meta(directory)
+    meta["complete"] = True
+    _write_meta(directory, meta)
+
+
+class StoreWriter:
+    """Writes Experiment column blocks into rows start, start + 1, ...
+
+    Each block is checked against its column type before it is written;
+    a value that does not fit raises OverflowError.
+    """
+
+    def __init__(self, directory, start=0):
+        self.position = start
+        self.columns = [
+            open_memmap(_column_path(directory, field), mode="r+") for field in Experiment._fields
+        ]
+
+    def write(self, columns):
+        count = len(columns.pulls)
+        end = self.position + count
+        for field, stored, column in zip(Experiment._fields, self.columns, columns):
+            column = np.asarray(column)
+            if count and stored.dtype != np.bool_ and (
+                column.min() < 0 or column.max() > np.iinfo(stored.dtype).max
+            ):
+                raise OverflowError(f"{field} does not fit the store's {stored.dtype} column")
+            stored[self.position : end] = column
+        self.position = end
+
+    def close(self):
+        for column in self.columns:
+            column.flush()
+        self.columns = []
+
+
+def open_store(directory, mode="r"):
+    """Experiment of memory-mapped columns of a store.
+
+    Raises ValueError for a store whose run did not finish.
+    """
+    meta = read_meta(directory)
+    if meta.get("version") != VERSION:
+        raise ValueError(f"{directory} is not a version {VERSION} result store")
+    if not meta["complete"]:
+        raise ValueError(f"{directory} holds an unfinished run")
+    return Experiment(*(
+        np.load(_column_path(directory, field), mmap_mode=mode) for field in Experiment._fields
+    ))
@@ -0,0 +1,273 @@
+"""Per-pull event traces for replay and auditing.
+
+    python -m gachasim.trace traces/
+    python -m gachasim.trace traces/ --replay 17
+
+A traced run (run_banner(..., trace=directory), per-pull engine) keeps
+one byte per pull of every experiment, its bits packed as:
+
+    bits 0-1  rarity: COMMON (or untracked), SECONDARY, TOP
+    bit  2    RATE_UP: the top-rarity unit of this pull was the rate-up
+    bit  3    HARD_PITY: the hit came from hard pity
+    bits 4-6  rule that decided rate-up or off-banner: ROLL, FRESH,
+              CARRIED, NEXT_HIT, FORCED, FREE, CERTAIN
+    bit  7    BONUS: bonus rate-ups were added after this pull
+
+Each shard appends its experiments' codes to <start>.events and their
+pull counts to <start>.lengths as it goes (start being the index of its
+first experiment), so a trace of 10^6 experiments is never held in
+memory. TraceReader memory-maps the parts back and answers queries over
+all experiments with array operations, e.g. the experiments whose first
+rate-up came from a free pull:
+
+    reader = TraceReader("traces")
+    free = reader.first(lambda codes: rule(codes) == FREE)
+    first_rate_up = reader.first(rate_up)
+    np.flatnonzero((free > 0) & (free == first_rate_up))
+"""
+import argparse
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+VERSION = 1
+META = "trace.json"
+FLUSH_BYTES = 1 << 20  # event bytes a shard buffers before appending them
+CHUNK_EVENTS = 1 << 26  # events scanned at a time by queries
+
+COMMON, SECONDARY, TOP = 0, 1, 2
+RATE_UP = 1 << 2
+HARD_PITY = 1 << 3
+RULE_SHIFT = 4
+ROLL, FRESH, CARRIED, NEXT_HIT, FORCED, FREE, CERTAIN = range(7)
+RULES = ("roll", "fresh", "carried", "next-hit", "forced", "free", "certain")
+BONUS = 1 << 7
+
+Event = namedtuple("Event", ["pull", "rarity", "rate_up", "hard_pity", "rule", "bonus"])
+
+
+def record_event(trace, pull, code):
+    """OR `code` into pull `pull` (1-based) of a bytearray trace.
+
+    Pulls not recorded yet are padded with 0 (a common pull), so the
+    engine only records pulls where something happened.
+    """
+    if len(trace) < pull:
+        trace.extend(bytes(pull - len(trace)))
+    trace[pull - 1] |= code
+
+
+# --------------------
+# Fields of a code array
+# --------------------
+def rarity(codes):
+    return codes & 0b11
+
+
+def rate_up(codes):
+    return (codes & RATE_UP) != 0
+
+
+def hard_pity(codes):
+    return (codes & HARD_PITY) != 0
+
+
+def rule(codes):
+    """Decision rule of top-rarity pulls (ROLL for every other pull)."""
+    return (codes >> RULE_SHIFT) & 0b111
+
+
+def bonus(codes):
+    return (codes & BONUS) != 0
+
+
+def decode(codes):
+    """Event per pull of one experiment's codes."""
+    return [
+        Event(pull, ("common", "secondary", "top")[code & 0b11], bool(code & RATE_UP),
+              bool(code & HARD_PITY), RULES[(code >> RULE_SHIFT) & 0b111], bool(code & BONUS))
+        for pull, code in enumerate(codes.tolist(), 1)
+    ]
+
+
+# --------------------
+# Writing
+# --------------------
+def create_trace(directory, experiments, **meta):
+    """Start a trace of `experiments`; extra keyword arguments go to trace.json."""
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith((".events", ".lengths")):
+            os.remove(os.path.join(directory, name))
+    _write_meta(directory, dict(meta, version=VERSION, experiments=experiments, complete=False))
+
+
+def finish_trace(directory):
+    meta = read_meta(directory)
+    meta["complete"] = True
+    _write_meta(directory, meta)
+
+
+def _write_meta(directory, meta):
+    with open(os.path.join(directory, META), "w") as file:
+        json.dump(meta, file, indent=2)
+
+
+def read_meta(directory):
+    with open(os.path.join(directory, META)) as file:
+        return json.load(file)
+
+
+class TraceWriter:
+    """Appends experiment traces of the shard starting at experiment `start`."""
+
+    def __init__(self, directory, start=0):
+        base = os.path.join(directory, f"{start:012d}")
+        self._events = open(base + ".events", "wb")
+        self._lengths = open(base + ".lengths", "wb")
+        self._buffer = bytearray()
+        self._pending = []
+
+    def add(self, trace, pulls):
+        """Add one experiment's bytearray trace, padded to `pulls`."""
+        self._buffer += trace
+        self._buffer += bytes(pulls - len(trace))
+        self._pending.append(pulls)
+        if len(self._buffer) >= FLUSH_BYTES:
+            self.flush()
+
+    def flush(self):
+        self._events.write(self._buffer)
+        np.asarray(self._pending, dtype=np.uint32).tofile(self._lengths)
+        self._buffer = bytearray()
+        self._pending = []
+
+    def close(self):
+        self.flush()
+        self._events.close()
+        self._lengths.close()
+
+
+# --------------------
+# Reading and queries
+# --------------------
+class TraceReader:
+    """Memory-mapped view of a finished trace directory."""
+
+    def __init__(self, directory):
+        self.meta = read_meta(directory)
+        if self.meta.get("version") != VERSION:
+            raise ValueError(f"{directory} is not a version {VERSION} trace")
+        if not self.meta["complete"]:
+            raise ValueError(f"{directory} holds an unfinished trace")
+        self._parts = []
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".lengths"):
+                base = os.path.join(directory, name[: -len(".lengths")])
+                lengths = np.fromfile(base + ".lengths", dtype=np.uint32)
+                offsets = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+                events = (
+                    np.memmap(base + ".events", dtype=np.uint8, mode="r")
+                    if offsets[-1] else np.zeros(0, dtype=np.uint8)
+                )
+                self._parts.append((offsets, events))
+        self.lengths = np.concatenate(
+            [np.diff(offsets) for offsets, _ in self._parts] or [np.zeros(0, dtype=np.int64)]
+        )
+        self._starts = np.concatenate([[0], np.cumsum([len(offsets) - 1 for offsets, _ in self._parts])])
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __getitem__(self, index):
+        """Codes of experiment `index`, one per pull."""
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        part = np.searchsorted(self._starts, index, side="right") - 1
+        offsets, events = self._parts[part]
+        local = index - self._starts[part]
+        return np.array(events[offsets[local] : offsets[local + 1]])
+
+    def replay(self, index):
+        """Event per pull of experiment `index`."""
+        return decode(self[index])
+
+    def _chunks(self):
+        """(first experiment, offsets from 0, codes) over experiment-aligned chunks."""
+        for start, (offsets, events) in zip(self._starts, self._parts):
+            first = 0
+            while first < len(offsets) - 1:
+                last = max(
+                    int(np.searchsorted(offsets, offsets[first] + CHUNK_EVENTS, side="right")) - 1,
+                    first + 1,
+                )
+                last = min(last, len(offsets) - 1)
+                yield (
+                    start + first,
+                    offsets[first : last + 1] - offsets[first],
+                    np.asarray(events[offsets[first] : offsets[last]]),
+                )
+                first = last
+
+    def _matches(self, predicate):
+        """(experiment, position within it) of every pull where `predicate(codes)` holds."""
+        for first, offsets, codes in self._chunks():
+            positions = np.flatnonzero(predicate(codes))
+            experiments = np.searchsorted(offsets, positions, side="right") - 1
+            yield first, experiments, positions - offsets[experiments], len(offsets) - 1
+
+    def first(self, predicate):
+        """Per experiment, the first pull (1-based) where `predicate(codes)` holds, else 0."""
+        result = np.zeros(len(self), dtype=np.int64)
+        for first, experiments, positions, _ in self._matches(predicate):
+            found, index = np.unique(experiments, return_index=True)
+            result[first + found] = positions[index] + 1
+        return result
+
+    def count(self, predicate):
+        """Per experiment, the number of pulls where `predicate(codes)` holds."""
+        result = np.zeros(len(self), dtype=np.int64)
+        for first, experiments, _, size in self._matches(predicate):
+            result[first : first + size] = np.bincount(experiments, minlength=size)
+        return result
+
+
+def summary_lines(reader):
+    """Printable counts of every rule firing on top-rarity pulls."""
+    lines = [f"Experiments: {len(reader)}, pulls: {int(reader.lengths.sum())}"]
+    lines.append(f"{'rule':<10} {'pulls':>12} {'rate-ups':>12} {'experiments':>12}")
+    for code, name in enumerate(RULES):
+        fired = reader.count(lambda codes: (rarity(codes) == TOP) & (rule(codes) == code))
+        won = reader.count(lambda codes: rate_up(codes) & (rule(codes) == code))
+        lines.append(f"{name:<10} {int(fired.sum()):>12} {int(won.sum()):>12} {np.count_nonzero(fired):>12}")
+    hard = reader.count(hard_pity)
+    lines.append(f"{'hard pity':<10} {int(hard.sum()):>12} {'':>12} {np.count_nonzero(hard):>12}")
+    extra = reader.count(bonus)
+    lines.append(f"{'bonus':<10} {int(extra.sum()):>12} {'':>12} {np.count_nonzero(extra):>12}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m gachasim.trace", description=__doc__.split("\n")[0])
+    parser.add_argument("directory", help="trace directory written by a traced run")
+    parser.add_argument("--replay", type=int, metavar="EXPERIMENT", help="print every pull of one experiment")
+    args = parser.parse_args(argv)
+
+    reader = TraceReader(args.directory)
+    if args.replay is None:
+        print("\n".join(summary_lines(reader)))
+        return
+    for event in reader.replay(args.replay):
+        if event.rarity != "common" or event.bonus:
+            flags = [event.rarity]
+            if event.rarity == "top":
+                flags += ["rate-up" if event.rate_up else "off-banner", event.rule]
+            flags += ["hard pity"] * event.hard_pity + ["bonus"] * event.bonus
+            print(f"{event.pull:>5} {' '.join(flags)}")
+    print(f"{len(reader[args.replay]):>5} pulls")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
-import random
 import numpy as np
-import matplotlib.pyplot as plt
+
+from gachasim.exact import pmf_max, pmf_mean, pmf_min, pmf_percentile
+from gachasim.kernel import compile_banner, copies_report, interval_report, run_banner, solve_banner
+from gachasim.lifetime import run_lifetime, success_rate
+from gachasim.plots import line_chart, render
+from gachasim.spec import BannerSpec, pity_curve
 
 BASE_RATE = 0.006
 SOFT_PITY_START = 74
@@ -8,6 +12,18 @@ HARD_PITY = 90
 
 TARGET_ON_RATES = 7
 EXPERIMENTS = 10000
+SEED = None  # set an int for reproducible results
+WORKERS = None  # None = one worker per CPU core
+ENGINE = "per-pull"  # "per-pull", "skip" (skip-ahead), "batch" (vectorized) or "exact"
+TOLERANCES = None  # e.g. {"mean": 1.0, 95: 0.5}: run until these 95% CI half-widths
+CACHE = True  # reuse the results of an identical seeded run (see gachasim.cache)
+STORE = None  # a directory: write per-experiment results to a memory-mapped store (see gachasim.store)
+TRACE = None  # a directory: record every pull (per-pull engine) for replay (see gachasim.trace)
+METRICS = None  # a .json file: count rule firings and time run phases into it (see gachasim.metrics)
+PLOTS = "show"  # "show", "png" / "svg" (saved to PLOT_DIR) or None
+PLOT_DIR = "plots"
+LIFETIME_SCHEDULE = None  # lifetime mode: (pull budget, target copies) per banner, e.g. [(80, 1)] * 300
+LIFETIME_PLAYERS = 1_000_000  # players simulated at once in lifetime mode
 
 def five_star_chance(pity):
     if pity < SOFT_PITY_START:
@@ -16,65 +32,90 @@ def five_star_chance(pity):
     increase_per_pull = (1.0 - BASE_RATE) / ramp_steps
     return min(1.0, BASE_RATE + (pity - SOFT_PITY_START + 1) * increase_per_pull)
 
-def run_experiment():
-    pulls = 0
-    pity = 0
-    on_rate_count = 0
-    guarantee_on_rate = False
-    first_on_rate_pull = None
-    first_5050_lost = False
-    first_5star_obtained = False
-
-    while on_rate_count < TARGET_ON_RATES:
-        pulls += 1
-        pity += 1
-
-        if pity >= HARD_PITY:  # Hard pity
-            pity = 0
-            if guarantee_on_rate or random.random() < 0.5:
-                on_rate_count += 1
-                if first_on_rate_pull is None:
-                    first_on_rate_pull = pulls
-                guarantee_on_rate = False
-            else:
-                guarantee_on_rate = True
-            continue
-
-        if random.random() < five_star_chance(pity):
-            pity = 0
-            if not first_5star_obtained:
-                first_5star_obtained = True
-                if random.random() >= 0.5:
-                    first_5050_lost = True
-                    guarantee_on_rate = True
-                else:
-                    on_rate_count += 1
-                    first_on_rate_pull = pulls
-            else:
-                if guarantee_on_rate or random.random() < 0.5:
-                    on_rate_count += 1
-                    if first_on_rate_pull is None:
-                        first_on_rate_pull = pulls
-                    guarantee_on_rate = False
-                else:
-                    guarantee_on_rate = True
-
-    return pulls, first_on_rate_pull, first_5050_lost
+BANNER = BannerSpec(
+    "hoyo-character",
+    pity_curve(five_star_chance, HARD_PITY),
+    TARGET_ON_RATES,
+    rate_up_chance=0.5,
+    carry_guarantee=True,
+    first_hit_fresh=True,
+)
+KERNEL = compile_banner(BANNER)
+
+def main_exact():
+    result = solve_banner(KERNEL)
+    pulls_pmf = result.pulls_pmf
+    first_pmf = result.first_on_rate_pmf
+
+    print("========== EXACT RESULTS ==========")
+    print(f"Minimum pulls: {pmf_min(pulls_pmf)}")
+    print(f"Maximum pulls: {pmf_max(pulls_pmf)}")
+    print(f"Average pulls: {pmf_mean(pulls_pmf):.2f}")
+    print(f"5th percentile pulls: {pmf_percentile(pulls_pmf,5)}")
+    print(f"95th percentile pulls: {pmf_percentile(pulls_pmf,95)}")
+    print(f"Average pulls to first on-rate: {pmf_mean(first_pmf):.2f}")
+    print(f"5th percentile first rate-up: {pmf_percentile(first_pmf,5)}")
+    print(f"95th percentile first rate-up: {pmf_percentile(first_pmf,95)}")
+    print(f"Probability of losing the first 50/50: {result.lost_first_5050:.4f}")
+
+    render([
+        line_chart(
+            "hoyo-character-exact-pulls", "(HOYO) Total Pulls Needed for 7 Character On-Rates (Exact)",
+            "Pulls Required", "Probability", pulls_pmf, linewidth=2, color="green",
+        ),
+        line_chart(
+            "hoyo-character-exact-first-rate-up", "(HOYO) Total Pulls Needed for First Character On-Rate (Exact)",
+            "Pulls to First Rate-Up", "Probability", first_pmf, linewidth=2, color="orange",
+        ),
+    ], PLOTS, PLOT_DIR, WORKERS)
+
+def simulate():
+    """Run EXPERIMENTS with ENGINE; returns an Experiment of result columns."""
+    return run_banner(KERNEL, ENGINE, EXPERIMENTS, SEED, WORKERS, TOLERANCES, CACHE, STORE, TRACE, METRICS)
+
+def main_lifetime():
+    outcomes = run_lifetime(KERNEL, LIFETIME_SCHEDULE, LIFETIME_PLAYERS, SEED, WORKERS)
+
+    print("========== LIFETIME RESULTS ==========")
+    print(f"Players: {LIFETIME_PLAYERS}, banners: {len(outcomes)} (pity and guarantee carry over)")
+    print(f"{'banner':>6} {'budget':>6} {'target':>6} {'success':>8} {'pulls':>8} {'carried pity':>12} {'guaranteed':>10}")
+    for number, outcome in enumerate(outcomes, 1):
+        carried_pity = np.dot(np.arange(len(outcome.carried_pity)), outcome.carried_pity) / outcome.players
+        print(
+            f"{number:>6} {outcome.budget:>6} {outcome.target:>6} {success_rate(outcome):>8.2%} "
+            f"{outcome.pulls_spent / outcome.players:>8.2f} {carried_pity:>12.2f} "
+            f"{outcome.guaranteed / outcome.players:>10.2%}"
+        )
+
+    render([
+        line_chart(
+            "hoyo-character-lifetime-success", "(HOYO) Success Rate per Banner with Carried Pity",
+            "Banner", "Success Rate", [success_rate(outcome) for outcome in outcomes],
+            x=np.arange(1, len(outcomes) + 1), linewidth=2, color="green",
+        ),
+        line_chart(
+            "hoyo-character-lifetime-carried-pity", "(HOYO) Pity Carried Out of the Last Banner",
+            "Pity", "Players", outcomes[-1].carried_pity, linewidth=2, color="green",
+        ),
+    ], PLOTS, PLOT_DIR, WORKERS)
 
 def main():
-    results = []
-    first_on_rate_pulls = []
-    first_5050_count = 0
+    if LIFETIME_SCHEDULE:
+        main_lifetime()
+        return
+    if ENGINE == "exact":
+        main_exact()
+        return
 
-    for _ in range(EXPERIMENTS):
-        pulls_needed, first_pull, lost_first_5050 = run_experiment()
-        results.append(pulls_needed)
-        first_on_rate_pulls.append(first_pull)
-        if lost_first_5050:
-            first_5050_count += 1
+    columns = simulate()
+    results = columns.pulls
+    first_on_rate_pulls = columns.first_rate_up
+    first_5050_count = np.count_nonzero(columns.lost_first)
 
     print("========== RESULTS ==========")
-    print(f"Experiments run: {EXPERIMENTS}")
+    print(f"Experiments run: {len(results)}")
+    if TOLERANCES:
+        print("\n".join(interval_report(results, TOLERANCES)))
     print(f"Minimum pulls: {min(results)}")
     print(f"Maximum pulls: {max(results)}")
     print(f"Average pulls: {np.mean(results):.2f}")
@@ -85,31 +126,22 @@ def main():
     print(f"95th percentile first rate-up: {np.percentile(first_on_rate_pulls,95):.0f}")
     print(f"Number of experiments that lost the first 50/50: {first_5050_count}")
 
-    # --------------------
-    # Smooth integer-based line: total pulls
-    # --------------------
-    counts = np.bincount(results)
-    x = np.arange(len(counts))
-    plt.figure(figsize=(10,6))
-    plt.plot(x, counts, linewidth=2, color='green')
-    plt.xlabel("Pulls Required")
-    plt.ylabel("Frequency")
-    plt.title("(HOYO) Total Pulls Needed for 7 Character On-Rates")
-    plt.grid(True)
-    plt.show()
+    print("\nPulls to reach each rate-up copy count:")
+    print("\n".join(copies_report(columns.copy_pulls)))
 
     # --------------------
-    # Smooth integer-based line: first on-rate
+    # Smooth integer-based lines: total pulls and first on-rate
     # --------------------
-    counts_first = np.bincount(first_on_rate_pulls)
-    x_first = np.arange(len(counts_first))
-    plt.figure(figsize=(10,6))
-    plt.plot(x_first, counts_first, linewidth=2, color='orange')
-    plt.xlabel("Pulls to First Rate-Up")
-    plt.ylabel("Frequency")
-    plt.title("(HOYO) Total Pulls Needed for First Character On-Rate")
-    plt.grid(True)
-    plt.show()
+    render([
+        line_chart(
+            "hoyo-character-pulls", "(HOYO) Total Pulls Needed for 7 Character On-Rates",
+            "Pulls Required", "Frequency", np.bincount(results), linewidth=2, color="green",
+        ),
+        line_chart(
+            "hoyo-character-first-rate-up", "(HOYO) Total Pulls Needed for First Character On-Rate",
+            "Pulls to First Rate-Up", "Frequency", np.bincount(first_on_rate_pulls), linewidth=2, color="orange",
+        ),
+    ], PLOTS, PLOT_DIR, WORKERS)
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,9 @@
-import random
 import numpy as np
-import matplotlib.pyplot as plt
+
+from gachasim.exact import pmf_max, pmf_mean, pmf_min, pmf_percentile
+from gachasim.kernel import compile_banner, copies_report, interval_report, run_banner, solve_banner
+from gachasim.plots import line_chart, render
+from gachasim.spec import BannerSpec, pity_curve
 
 BASE_RATE = 0.006
 SOFT_PITY_START = 65
@@ -8,6 +11,16 @@ HARD_PITY = 80
 
 TARGET_RATE_UPS = 5
 EXPERIMENTS = 10000  # smoother stats
+ENGINE = "batch"  # "per-pull", "skip" (skip-ahead), "batch" (vectorized) or "exact"
+TOLERANCES = None  # e.g. {"mean": 1.0, 95: 0.5}: run until these 95% CI half-widths
+CACHE = True  # reuse the results of an identical seeded run (see gachasim.cache)
+STORE = None  # a directory: write per-experiment results to a memory-mapped store (see gachasim.store)
+TRACE = None  # a directory: record every pull (per-pull engine) for replay (see gachasim.trace)
+METRICS = None  # a .json file: count rule firings and time run phases into it (see gachasim.metrics)
+PLOTS = "show"  # "show", "png" / "svg" (saved to PLOT_DIR) or None
+PLOT_DIR = "plots"
+SEED = None  # set an int for reproducible results
+WORKERS = None  # None = one worker per CPU core
 RATE_UP_CHANCE = 0.75  # 75% rate-up, 25% off-banner
 
 def five_star_chance(pity):
@@ -18,54 +31,59 @@ def five_star_chance(pity):
     increase_per_pull = (1.0 - BASE_RATE) / ramp_steps
     return min(1.0, BASE_RATE + (pity - SOFT_PITY_START + 1) * increase_per_pull)
 
-def run_experiment():
-    pulls = 0
-    pity = 0
-    rate_up_count = 0
-    first_rate_up_pull = None
-    guarantee_rate_up = False
-
-    while rate_up_count < TARGET_RATE_UPS:
-        pulls += 1
-        pity += 1
-
-        # Hard pity
-        if pity >= HARD_PITY:
-            pity = 0
-            if guarantee_rate_up or random.random() < RATE_UP_CHANCE:
-                rate_up_count += 1
-                if first_rate_up_pull is None:
-                    first_rate_up_pull = pulls
-                guarantee_rate_up = False
-            else:
-                guarantee_rate_up = True
-            continue
-
-        # Normal pull
-        if random.random() < five_star_chance(pity):
-            pity = 0
-            if guarantee_rate_up or random.random() < RATE_UP_CHANCE:
-                rate_up_count += 1
-                if first_rate_up_pull is None:
-                    first_rate_up_pull = pulls
-                guarantee_rate_up = False
-            else:
-                guarantee_rate_up = True
-
-    return pulls, first_rate_up_pull
+BANNER = BannerSpec(
+    "hsr-weapon",
+    pity_curve(five_star_chance, HARD_PITY),
+    TARGET_RATE_UPS,
+    rate_up_chance=RATE_UP_CHANCE,
+    carry_guarantee=True,
+)
+KERNEL = compile_banner(BANNER)
+
+def main_exact():
+    result = solve_banner(KERNEL)
+    pulls_pmf = result.pulls_pmf
+    first_pmf = result.first_on_rate_pmf
+
+    print("========== EXACT RESULTS ==========")
+    print(f"Best Luck Scenario (minimum pulls): {pmf_min(pulls_pmf)}")
+    print(f"Worst Luck Scenario (maximum pulls): {pmf_max(pulls_pmf)}")
+    print(f"Average pulls needed for {TARGET_RATE_UPS} rate-ups: {pmf_mean(pulls_pmf):.2f}")
+    print(f"5th percentile pulls (rate-ups): {pmf_percentile(pulls_pmf, 5)}")
+    print(f"95th percentile pulls (rate-ups): {pmf_percentile(pulls_pmf, 95)}")
+    print()
+    print(f"Average pulls for FIRST rate-up: {pmf_mean(first_pmf):.2f}")
+    print(f"5th percentile first rate-up: {pmf_percentile(first_pmf, 5)}")
+    print(f"95th percentile first rate-up: {pmf_percentile(first_pmf, 95)}")
+
+    render([
+        line_chart(
+            "hsr-weapon-exact-pulls",
+            f"Distribution of Pulls Needed for {TARGET_RATE_UPS} Rate-Ups (75% rate-up, Exact)",
+            "Total Pulls", "Probability", pulls_pmf, linewidth=2,
+        ),
+        line_chart(
+            "hsr-weapon-exact-first-rate-up",
+            "Distribution of Pulls Needed for First Rate-Up (75% rate-up, Exact)",
+            "Pulls to First Rate-Up", "Probability", first_pmf, linewidth=2,
+        ),
+    ], PLOTS, PLOT_DIR, WORKERS)
+
+def simulate():
+    """Run EXPERIMENTS with ENGINE; returns an Experiment of result columns."""
+    return run_banner(KERNEL, ENGINE, EXPERIMENTS, SEED, WORKERS, TOLERANCES, CACHE, STORE, TRACE, METRICS)
 
 def main():
-    total_pulls_list = []
-    first_rate_up_list = []
+    if ENGINE == "exact":
+        main_exact()
+        return
 
-    for _ in range(EXPERIMENTS):
-        total_pulls, first_pull = run_experiment()
-        total_pulls_list.append(total_pulls)
-        first_rate_up_list.append(first_pull)
+    columns = simulate()
+    total_pulls_list, first_rate_up_list = columns.pulls, columns.first_rate_up
 
     # ---------- Statistics ----------
-    min_pulls = min(total_pulls_list)
-    max_pulls = max(total_pulls_list)
+    min_pulls = np.min(total_pulls_list)
+    max_pulls = np.max(total_pulls_list)
     avg_pulls = np.mean(total_pulls_list)
     perc_5 = np.percentile(total_pulls_list, 5)
     perc_95 = np.percentile(total_pulls_list, 95)
@@ -75,7 +93,9 @@ def main():
     perc_95_first = np.percentile(first_rate_up_list, 95)
 
     print("========== RESULTS ==========")
-    print(f"Experiments run: {EXPERIMENTS}")
+    print(f"Experiments run: {len(total_pulls_list)}")
+    if TOLERANCES:
+        print("\n".join(interval_report(total_pulls_list, TOLERANCES)))
     print(f"Best Luck Scenario (minimum pulls): {min_pulls}")
     print(f"Worst Luck Scenario (maximum pulls): {max_pulls}")
     print(f"Average pulls needed for {TARGET_RATE_UPS} rate-ups: {avg_pulls:.2f}")
@@ -86,26 +106,22 @@ def main():
     print(f"5th percentile first rate-up: {perc_5_first}")
     print(f"95th percentile first rate-up: {perc_95_first}")
 
+    print("\nPulls to reach each rate-up copy count:")
+    print("\n".join(copies_report(columns.copy_pulls)))
+
     # ---------- Smooth line distributions ----------
-    bins = np.arange(0, max(total_pulls_list)+2, 1)
-    counts, _ = np.histogram(total_pulls_list, bins=bins)
-    plt.figure(figsize=(10,6))
-    plt.plot(bins[:-1], counts, linewidth=2)
-    plt.xlabel("Total Pulls")
-    plt.ylabel("Frequency")
-    plt.title(f"Distribution of Pulls Needed for {TARGET_RATE_UPS} Rate-Ups (75% rate-up)")
-    plt.grid(True)
-    plt.show()
-
-    bins_first = np.arange(0, max(first_rate_up_list)+2, 1)
-    counts_first, _ = np.histogram(first_rate_up_list, bins=bins_first)
-    plt.figure(figsize=(10,6))
-    plt.plot(bins_first[:-1], counts_first, linewidth=2)
-    plt.xlabel("Pulls to First Rate-Up")
-    plt.ylabel("Frequency")
-    plt.title("Distribution of Pulls Needed for First Rate-Up (75% rate-up)")
-    plt.grid(True)
-    plt.show()
+    render([
+        line_chart(
+            "hsr-weapon-pulls",
+            f"Distribution of Pulls Needed for {TARGET_RATE_UPS} Rate-Ups (75% rate-up)",
+            "Total Pulls", "Frequency", np.bincount(total_pulls_list), linewidth=2,
+        ),
+        line_chart(
+            "hsr-weapon-first-rate-up",
+            "Distribution of Pulls Needed for First Rate-Up (75% rate-up)",
+            "Pulls to First Rate-Up", "Frequency", np.bincount(first_rate_up_list), linewidth=2,
+        ),
+    ], PLOTS, PLOT_DIR, WORKERS)
 
 if __name__ == "__main__":
     main()
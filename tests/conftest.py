@@ -0,0 +1,9 @@
+from functools import lru_cache
+
+from gachasim.bench import load_script
+
+
+@lru_cache(maxsize=None)
+def script(name):
+    """The simulator script `<name>-simulator.py`, imported once per session."""
+    return load_script(name)
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from conftest import script
+from gachasim import kernel
+from gachasim.cache import ResultCache, cache_key
+
+
+@pytest.fixture
+def counted(monkeypatch):
+    """Calls of kernel._run_banner, i.e. runs the cache did not serve."""
+    calls = []
+    run = kernel._run_banner
+
+    def counting(*args):
+        calls.append(args)
+        return run(*args)
+
+    monkeypatch.setattr(kernel, "_run_banner", counting)
+    return calls
+
+
+def run(cache, seed=1, banner=None):
+    return kernel.run_banner(banner or script("wuwa-weapon").KERNEL, "batch", 2000, seed, 1, cache=cache)
+
+
+def test_seeded_run_is_served_from_the_cache(tmp_path, counted):
+    cache = ResultCache(str(tmp_path))
+    first = run(cache)
+    second = run(cache)
+    assert len(counted) == 1
+    for column, cached in zip(first, second):
+        assert np.array_equal(column, cached)
+
+
+def test_unseeded_runs_are_not_cached(tmp_path, counted):
+    cache = ResultCache(str(tmp_path))
+    run(cache, seed=None)
+    run(cache, seed=None)
+    assert len(counted) == 2
+    assert not cache.entries()
+
+
+def test_changed_spec_or_source_is_a_miss(tmp_path, monkeypatch, counted):
+    cache = ResultCache(str(tmp_path))
+    run(cache)
+    banner = kernel.compile_banner(script("wuwa-weapon").BANNER._replace(target=2))
+    run(cache, banner=banner)
+    assert len(counted) == 2
+    monkeypatch.setattr(kernel, "source_key", lambda: "edited engines")
+    run(cache)
+    assert len(counted) == 3
+
+
+def test_eviction_keeps_the_most_recent_entries(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=0)
+    cache.put(cache_key("first"), {"pulls": _histogram()})
+    assert not cache.entries()
+    cache.max_bytes = 10**6
+    for name in ("first", "second"):
+        cache.put(cache_key(name), {"pulls": _histogram()})
+    assert len(cache.entries()) == 2
+    assert cache.get(cache_key("second"))["pulls"].count == 3
+
+
+def _histogram():
+    from gachasim.stats import IntHistogram
+
+    histogram = IntHistogram()
+    histogram.add_many([1, 2, 3])
+    return histogram
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from gachasim import cli
+
+
+def run_main(capsys, *argv):
+    """(exit code, printed JSON) of the command line."""
+    try:
+        cli.main([*argv, "--no-cache"])
+        code = 0
+    except SystemExit as exit:
+        code = exit.code
+    return code, json.loads(capsys.readouterr().out)
+
+
+@pytest.mark.parametrize("argv, message", [
+    (["-n", "-5", "--seed", "1"], "experiments must be a positive integer"),
+    (["-n", "0"], "experiments must be a positive integer"),
+    (["--workers", "0"], "workers must be a positive integer"),
+    (["--set", "target='x'"], "not supported"),
+    (["--set", "pulls=3"], "unknown BannerSpec fields"),
+])
+def test_bad_job_prints_a_json_error(capsys, argv, message):
+    code, output = run_main(capsys, "hoyo-character", *argv)
+    assert code == 1
+    assert message in output["error"]
+
+
+@pytest.mark.parametrize("job", [
+    {"game": "nope"},
+    {"game": "hoyo-character", "experiments": "abc"},
+    {"game": "hoyo-character", "experiments": True},
+    {"game": "hoyo-character", "set": [1]},
+    {"game": "hoyo-character", "colour": "red"},
+])
+def test_check_job_rejects(job):
+    with pytest.raises((ValueError, TypeError)):
+        cli.resolve_job(job)
+
+
+def test_jobs_file_keeps_going_after_a_failing_job(tmp_path, capsys):
+    jobs = tmp_path / "jobs.jsonl"
+    jobs.write_text(
+        '{"game": "wuwa-weapon", "experiments": -1}\n'
+        '# a comment\n'
+        '{"game": "wuwa-weapon", "target": 2, "experiments": 500, "seed": 1, "workers": 1}\n'
+    )
+    cli.main(["--jobs", str(jobs), "--no-cache"])
+    failed, done = (json.loads(line) for line in capsys.readouterr().out.splitlines())
+    assert "error" in failed
+    assert done["experiments"] == 500
+    assert [copy["copies"] for copy in done["copies"]] == [1, 2]
+
+
+def test_simulated_and_exact_outputs_share_a_schema(capsys):
+    _, simulated = run_main(capsys, "wuwa-weapon", "--target", "2", "-n", "2000", "--seed", "1", "--workers", "1")
+    _, exact = run_main(capsys, "wuwa-weapon", "--target", "2", "--engine", "exact")
+    for key in ("pulls", "first_rate_up"):
+        assert simulated[key].keys() == exact[key].keys()
+    assert [copy.keys() for copy in simulated["copies"]] == [copy.keys() for copy in exact["copies"]]
+    # copy `target` is reached on the last pull, so its statistics are the pulls'
+    assert {key: value for key, value in simulated["copies"][-1].items() if key != "copies"} == simulated["pulls"]
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from conftest import script
+from gachasim.bench import SCRIPTS
+from gachasim.kernel import compile_banner, run_banner
+
+EXPERIMENTS = {"per-pull": 2000, "skip": 4000, "batch": 20000}
+Z = 5  # standard errors two seeded estimates may differ by
+
+
+def run(banner, engine, seed=11):
+    return run_banner(banner, engine, EXPERIMENTS[engine], seed, 1)
+
+
+def assert_same_mean(a, b, label):
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    error = np.sqrt(a.var(ddof=1) / len(a) + b.var(ddof=1) / len(b))
+    assert abs(a.mean() - b.mean()) <= Z * error + 1e-9, f"{label}: {a.mean():.2f} vs {b.mean():.2f}"
+
+
+def check_invariants(columns, spec):
+    copy_pulls = columns.copy_pulls
+    assert np.array_equal(copy_pulls[:, -1], columns.pulls)
+    assert (np.diff(copy_pulls, axis=1) >= 0).all()
+    assert ((columns.first_rate_up >= 1) & (columns.first_rate_up <= columns.pulls)).all()
+    if not spec.bonus_rate_ups:
+        assert np.array_equal(copy_pulls[:, 0], columns.first_rate_up)
+    if spec.first_rate_up_at is not None and spec.first_rate_up_forced and not spec.bonus_rate_ups:
+        assert (columns.first_rate_up <= spec.first_rate_up_at).all()
+    if not spec.tickets:
+        assert not columns.tickets.any()
+
+
+@pytest.mark.parametrize("name", SCRIPTS)
+def test_engines_agree(name):
+    banner = script(name).KERNEL
+    results = {engine: run(banner, engine) for engine in EXPERIMENTS}
+    for engine, columns in results.items():
+        check_invariants(columns, banner.spec)
+    reference = results["per-pull"]
+    for engine in ("skip", "batch"):
+        for field in ("pulls", "first_rate_up", "off_banner", "lost_first", "hit_guarantee", "tickets"):
+            assert_same_mean(getattr(results[engine], field), getattr(reference, field), f"{engine} {field}")
+        for copy in range(banner.spec.target):
+            assert_same_mean(
+                results[engine].copy_pulls[:, copy], reference.copy_pulls[:, copy], f"{engine} copy {copy + 1}"
+            )
+
+
+@pytest.mark.parametrize("engine", EXPERIMENTS)
+def test_seeded_runs_repeat(engine):
+    banner = script("endfield-character").KERNEL
+    first, second = run(banner, engine, seed=5), run(banner, engine, seed=5)
+    for field, column in zip(first._fields, first):
+        assert np.array_equal(column, getattr(second, field)), field
+    assert not np.array_equal(first.pulls, run(banner, engine, seed=6).pulls)
+
+
+@pytest.mark.parametrize("engine", EXPERIMENTS)
+def test_bonus_copy_before_the_forced_first_rate_up(engine):
+    # a bonus rate-up on pull 20 always comes before the forced one on
+    # pull 80, so the forced pull must never fire
+    spec = script("endfield-weapon").BANNER._replace(bonus_rate_ups=(20,), target=2)
+    columns = run(compile_banner(spec), engine)
+    check_invariants(columns, spec)
+    assert not columns.hit_guarantee.any()
+    assert (columns.copy_pulls[:, 0] <= 20).all()
+
+
+@pytest.mark.parametrize("engine", EXPERIMENTS)
+def test_forced_first_rate_up_fires_without_a_bonus(engine):
+    spec = script("endfield-weapon").BANNER._replace(bonus_rate_ups=(), target=1)
+    columns = run(compile_banner(spec), engine)
+    check_invariants(columns, spec)
+    forced = columns.hit_guarantee.astype(bool)
+    assert forced.any()
+    assert (columns.first_rate_up[forced] == spec.first_rate_up_at).all()
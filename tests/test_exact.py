@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from conftest import script
+from gachasim.exact import pmf_mean
+from gachasim.kernel import compile_banner, run_banner, solve_banner
+
+EXACT = [
+    "hoyo-character", "wuwa-character", "genshin-weapon", "hsr-weapon", "wuwa-weapon",
+    "arknights-character", "endfield-character",
+]
+EXPERIMENTS = 20000
+Z = 5  # standard errors a sampled mean may differ from the exact one by
+KS = 1.95  # Kolmogorov-Smirnov critical value at the 0.1% level, times sqrt(n)
+
+
+def assert_matches(sample, pmf, label):
+    values = np.arange(len(pmf))
+    mean = pmf_mean(pmf)
+    error = np.sqrt(np.dot((values - mean) ** 2, pmf) / len(sample))
+    assert abs(sample.mean() - mean) <= Z * error, f"{label} mean: {sample.mean():.2f} vs {mean:.2f}"
+    sampled = np.cumsum(np.bincount(sample, minlength=len(pmf))[: len(pmf)]) / len(sample)
+    distance = np.abs(sampled - np.cumsum(pmf)).max()
+    assert distance <= KS / np.sqrt(len(sample)), f"{label} CDF off by {distance:.4f}"
+
+
+@pytest.fixture(scope="module", params=EXACT)
+def solved(request):
+    banner = script(request.param).KERNEL
+    return banner, solve_banner(banner), run_banner(banner, "batch", EXPERIMENTS, 21, 1)
+
+
+def test_pmfs_are_distributions(solved):
+    _, result, _ = solved
+    for pmf in (result.pulls_pmf, result.first_on_rate_pmf):
+        assert (pmf >= 0).all()
+        assert pmf.sum() == pytest.approx(1.0, abs=1e-9)
+
+
+def test_sampled_runs_match_the_exact_distributions(solved):
+    _, result, columns = solved
+    assert_matches(columns.pulls, result.pulls_pmf, "pulls")
+    assert_matches(columns.first_rate_up, result.first_on_rate_pmf, "first rate-up")
+    lost = result.lost_first_5050
+    assert abs(columns.lost_first.mean() - lost) <= Z * np.sqrt(lost * (1 - lost) / EXPERIMENTS) + 1e-9
+
+
+@pytest.mark.parametrize("name", ["hoyo-character", "arknights-character"])
+def test_sampled_copies_match_smaller_targets(name):
+    banner = script(name).KERNEL
+    columns = run_banner(banner, "batch", EXPERIMENTS, 21, 1)
+    for copy in range(1, banner.spec.target):
+        pmf = solve_banner(compile_banner(banner.spec._replace(target=copy))).pulls_pmf
+        assert_matches(columns.copy_pulls[:, copy - 1], pmf, f"copy {copy}")
+
+
+def test_sampled_tickets_match_the_exact_expectation():
+    banner = script("endfield-character").KERNEL
+    result = solve_banner(banner)
+    columns = run_banner(banner, "batch", EXPERIMENTS, 21, 1)
+    reached = result.pulls_pmf > 0
+    expected = np.dot(result.pulls_pmf[reached], result.tickets_at_pulls[reached])
+    error = columns.tickets.std() / np.sqrt(EXPERIMENTS)
+    assert abs(columns.tickets.mean() - expected) <= Z * error
+
+
+def test_exact_solver_rejects_bonus_rate_ups():
+    with pytest.raises(ValueError, match="no exact solver"):
+        solve_banner(script("endfield-weapon").KERNEL)
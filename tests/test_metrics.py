@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from conftest import script
+from gachasim.kernel import run_banner
+from gachasim.metrics import load_metrics
+
+ENGINES = ("per-pull", "skip", "batch")
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("name", ["endfield-weapon", "endfield-character", "hoyo-character"])
+def test_metered_run_counts_every_copy(tmp_path, name, engine):
+    banner = script(name).KERNEL
+    path = str(tmp_path / "metrics.json")
+    metered = run_banner(banner, engine, 3000, 8, 2, metrics=path)
+    plain = run_banner(banner, engine, 3000, 8, 2)
+    for field, column in zip(plain._fields, plain):
+        assert np.array_equal(getattr(metered, field), column), field
+
+    data = load_metrics(path)
+    counters = data["counters"]
+    assert counters["experiments"] == 3000
+    assert counters["pulls"] == plain.pulls.sum()
+    assert counters["rate_ups"] + counters["bonus_rate_ups"] == 3000 * banner.spec.target
+    assert sum(rule["pulls"] for rule in data["rules"].values()) == counters["top_hits"]
+    assert sum(data["hits_by_pity"]) == counters["top_hits"]
+    assert counters["hard_pity"] + counters["soft_pity"] + counters["base_rate"] <= counters["top_hits"]
+    assert data["rules"]["forced"]["pulls"] == plain.hit_guarantee.sum()
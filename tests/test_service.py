@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+import pytest
+
+from gachasim import cli
+from gachasim.service import JobService
+
+TIMEOUT = 60.0
+
+
+@pytest.fixture(autouse=True)
+def output_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "CACHE_DIR", str(tmp_path / "cli"))
+
+
+async def request(port, method, path, body=None, raw=None):
+    """(status, JSON body) of one HTTP request to the service."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = b"" if body is None else json.dumps(body).encode()
+    writer.write(raw or f"{method} {path} HTTP/1.1\r\nContent-Length: {len(payload)}\r\n\r\n".encode() + payload)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, content = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(content)
+
+
+async def finished(port, id):
+    """Snapshot of job `id` once it is done or failed."""
+    for _ in range(int(TIMEOUT / 0.1)):
+        _, job = await request(port, "GET", f"/jobs/{id}")
+        if job["status"] in ("done", "failed"):
+            return job
+        await asyncio.sleep(0.1)
+    raise TimeoutError(f"job {id} did not finish")
+
+
+def with_service(test):
+    """Run `test(service, port)` against a service on a free port."""
+    async def run():
+        service = JobService(2)
+        server = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+        try:
+            async with server:
+                await asyncio.wait_for(test(service, server.sockets[0].getsockname()[1]), TIMEOUT)
+        finally:
+            service.close()
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("body", [
+    [1],
+    {"game": "nope"},
+    {"game": "hoyo-character", "colour": "red"},
+    {"game": "hoyo-character", "experiments": "abc"},
+    {"game": "hoyo-character", "experiments": -5},
+    {"game": "hoyo-character", "workers": 0},
+    {"game": "hoyo-character", "set": [1]},
+    {"game": "hoyo-character", "set": {"pulls": 1}},
+])
+def test_invalid_jobs_are_refused(body):
+    async def test(service, port):
+        status, reply = await request(port, "POST", "/jobs", body)
+        assert status == 400 and reply["error"]
+        assert not service.jobs
+
+    with_service(test)
+
+
+def test_malformed_requests_and_unknown_routes():
+    async def test(service, port):
+        assert (await request(port, None, None, raw=b"POST /jobs HTTP/1.1\r\n\r\n{"))[0] == 400
+        assert (await request(port, None, None, raw=b"nonsense\r\n\r\n"))[0] == 400
+        assert (await request(port, "GET", "/jobs/7"))[0] == 404
+        assert (await request(port, "DELETE", "/jobs"))[0] == 404
+
+    with_service(test)
+
+
+def test_failing_shards_fail_the_job_and_free_the_pool():
+    async def test(service, port):
+        job = {"game": "hoyo-character", "set": {"target": "x"}, "experiments": 8000, "workers": 8}
+        status, reply = await request(port, "POST", "/jobs", job)
+        assert status == 202
+        failed = await finished(port, reply["id"])
+        assert failed["status"] == "failed" and "TypeError" in failed["error"]
+        _, metrics = await request(port, "GET", "/metrics")
+        assert metrics["jobs"]["failed"] == 1
+        assert metrics["jobs"]["running"] == 0
+        assert metrics["jobs"]["pending_shards"] == 0
+
+    with_service(test)
+
+
+def test_jobs_match_the_command_line_and_join_duplicates():
+    async def test(service, port):
+        job = {"game": "wuwa-weapon", "target": 2, "experiments": 20000, "seed": 3, "workers": 2, "engine": "skip"}
+        (_, first), (_, second) = await asyncio.gather(
+            request(port, "POST", "/jobs", job), request(port, "POST", "/jobs", job)
+        )
+        assert first["id"] == second["id"]
+        assert first["joined_now"] != second["joined_now"]
+        done = await finished(port, first["id"])
+        assert done["status"] == "done"
+        expected = cli.run_job(job, cache=False)
+        assert {key: done["output"][key] for key in expected} == expected
+
+        status, cached = await request(port, "POST", "/jobs", job)
+        assert status == 200 and cached["cached"]
+        assert cached["output"] == done["output"]
+
+    with_service(test)
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from conftest import script
+from gachasim.kernel import run_banner, run_banner_summary
+from gachasim.spec import Experiment
+from gachasim.store import StoreWriter, create_store, open_store
+
+
+@pytest.mark.parametrize("engine", ["per-pull", "batch"])
+def test_summary_store_keeps_tickets(tmp_path, engine):
+    endfield = script("endfield-character")
+    store = tmp_path / "store"
+    summary = run_banner_summary(
+        endfield.KERNEL, engine, endfield.new_summary, endfield.record, 2000, seed=3, workers=1, store=str(store)
+    )
+    plain = run_banner_summary(endfield.KERNEL, engine, endfield.new_summary, endfield.record, 2000, seed=3, workers=1)
+    columns = open_store(str(store))
+    assert (columns.tickets > 0).all()
+    assert (columns.tickets_at_first_rate_up > 0).any()
+    assert (columns.tickets_at_guarantee[columns.hit_guarantee] > 0).all()
+    assert np.array_equal(summary["pulls"].counts, plain["pulls"].counts)
+    assert np.array_equal(np.bincount(columns.pulls), summary["pulls"].trimmed())
+
+
+def test_store_holds_the_in_memory_rows(tmp_path):
+    hoyo = script("hoyo-character")
+    stored = run_banner(hoyo.KERNEL, "batch", 3000, seed=7, workers=2, store=str(tmp_path / "store"))
+    in_memory = run_banner(hoyo.KERNEL, "batch", 3000, seed=7, workers=2)
+    for field in Experiment._fields:
+        assert np.array_equal(getattr(stored, field), getattr(in_memory, field)), field
+
+
+def test_store_rejects_values_that_do_not_fit(tmp_path):
+    create_store(str(tmp_path), 1, 1)
+    row = Experiment(*([np.array([1])] * (len(Experiment._fields) - 1)), np.array([[1]]))
+    writer = StoreWriter(str(tmp_path))
+    with pytest.raises(OverflowError, match="first_rate_up"):
+        writer.write(row._replace(first_rate_up=np.array([2**16])))
+    with pytest.raises(OverflowError, match="tickets"):
+        writer.write(row._replace(tickets=np.array([-1])))
+    writer.write(row)
+    writer.close()
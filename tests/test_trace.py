@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from conftest import script
+from gachasim import trace
+from gachasim.kernel import run_banner, run_banner_summary
+from gachasim.trace import (
+    BONUS, FORCED, FREE, HARD_PITY, RATE_UP, RULE_SHIFT, TOP, TraceReader, bonus, decode, rarity,
+    rate_up, record_event, rule,
+)
+
+
+def top_rule(code):
+    return lambda codes: (rarity(codes) == TOP) & (rule(codes) == code)
+
+
+def test_events_round_trip():
+    codes = bytearray()
+    record_event(codes, 3, TOP | RATE_UP | HARD_PITY | FORCED << RULE_SHIFT)
+    record_event(codes, 3, BONUS)
+    events = decode(np.frombuffer(bytes(codes), dtype=np.uint8))
+    assert [event.rarity for event in events] == ["common", "common", "top"]
+    assert events[2] == trace.Event(3, "top", True, True, "forced", True)
+
+
+@pytest.mark.parametrize("name", ["endfield-character", "endfield-weapon", "arknights-character"])
+def test_traced_run_replays_its_results(tmp_path, name):
+    banner = script(name).KERNEL
+    traced = run_banner(banner, "per-pull", 1500, 4, 2, trace=str(tmp_path))
+    plain = run_banner(banner, "per-pull", 1500, 4, 2)
+    for field, column in zip(plain._fields, plain):
+        assert np.array_equal(getattr(traced, field), column), field
+
+    reader = TraceReader(str(tmp_path))
+    assert len(reader) == 1500
+    assert np.array_equal(reader.lengths, plain.pulls)
+    assert np.array_equal(reader.first(rate_up), plain.first_rate_up)
+    assert np.array_equal(reader.count(top_rule(FORCED)) > 0, plain.hit_guarantee.astype(bool))
+    # every shipped bonus pull adds one copy
+    assert ((reader.count(rate_up) + reader.count(bonus)) == banner.spec.target).all()
+    if banner.spec.free_rate_up_every:
+        free = reader.first(top_rule(FREE))
+        assert (free[free > 0] % banner.spec.free_rate_up_every == 0).all()
+    index = int(np.argmax(plain.pulls))
+    events = reader.replay(index)
+    assert len(events) == plain.pulls[index]
+    assert sum(event.rate_up for event in events) >= 1
+
+
+def test_queries_do_not_depend_on_chunking(tmp_path, monkeypatch):
+    run_banner(script("hoyo-character").KERNEL, "per-pull", 500, 9, 2, trace=str(tmp_path))
+    reader = TraceReader(str(tmp_path))
+    first, count = reader.first(rate_up), reader.count(rate_up)
+    monkeypatch.setattr(trace, "CHUNK_EVENTS", 1000)
+    assert np.array_equal(reader.first(rate_up), first)
+    assert np.array_equal(reader.count(rate_up), count)
+
+
+def test_traced_summary_matches_the_plain_one(tmp_path):
+    endfield = script("endfield-character")
+    args = (endfield.KERNEL, "per-pull", endfield.new_summary, endfield.record, 1000, 2, 1)
+    traced = run_banner_summary(*args, trace=str(tmp_path))
+    plain = run_banner_summary(*args)
+    assert np.array_equal(traced["pulls"].counts, plain["pulls"].counts)
+    assert np.array_equal(np.bincount(TraceReader(str(tmp_path)).lengths), plain["pulls"].trimmed())
+
+
+def test_unfinished_trace_is_refused(tmp_path):
+    trace.create_trace(str(tmp_path), 10)
+    with pytest.raises(ValueError, match="unfinished"):
+        TraceReader(str(tmp_path))